@@ -1,10 +1,12 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 import datetime
+import json
 import logging
-from app.db.session import get_db
+from app.db.session import get_db, SessionLocal
 from app.db.models import User, Conversation, Message
 from app.api.auth import get_current_active_user
 from app.chat_management.chat_service import get_chat_service
@@ -19,6 +21,8 @@ class ChatRequest(BaseModel):
     message: str
     conversation_id: Optional[str] = None
     include_history: bool = True  # Whether to include conversation history context
+    reflection_mode: Optional[Literal["llm_json", "llm_index", "reranker", "none"]] = None  # 反思模式，为空时使用服务端配置
+    search_profile: Optional[str] = None  # 稠密检索档位(见MILVUS_SEARCH_PROFILES)，为空时由服务端按查询选择
 
 # 聊天响应模型
 class ChatResponse(BaseModel):
@@ -89,7 +93,9 @@ async def generate_chat(
             db_session=db,
             user_id=current_user.id,
             user_context=user_context,
-            include_history=request.include_history
+            include_history=request.include_history,
+            reflection_mode=request.reflection_mode,
+            search_profile=request.search_profile
         )
         
         return ChatResponse(
@@ -104,6 +110,61 @@ async def generate_chat(
             detail=str(e)
         )
 
+def _build_user_context(current_user: User) -> Optional[dict]:
+    """根据用户公司信息构建用户上下文"""
+    if not current_user.company_info:
+        return None
+    return {
+        "company": {
+            "company_name": current_user.company_info.company_name,
+            "industry": current_user.company_info.industry,
+            "address": current_user.company_info.address,
+            "financing_stage": current_user.company_info.financing_stage,
+            "business_scope": current_user.company_info.business_scope,
+            "additional_info": current_user.company_info.additional_info
+        }
+    }
+
+def _sse_event(payload: dict) -> str:
+    """格式化为SSE数据帧"""
+    return f"data: {json.dumps(payload, ensure_ascii=False, default=str)}\n\n"
+
+@router.post("/generate_chat_stream")
+async def generate_chat_stream(
+    request: ChatRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """流式处理聊天请求（SSE），生成结束后保存到会话历史"""
+    user_id = current_user.id
+    user_context = _build_user_context(current_user)
+
+    async def event_stream():
+        # 流式响应的生命周期长于请求依赖，单独创建数据库会话
+        db = SessionLocal()
+        try:
+            async for event in chat_service.process_chat_stream(
+                query=request.message,
+                conversation_id=request.conversation_id,
+                db_session=db,
+                user_id=user_id,
+                user_context=user_context,
+                include_history=request.include_history,
+                reflection_mode=request.reflection_mode,
+                search_profile=request.search_profile
+            ):
+                yield _sse_event(event)
+        except Exception as e:
+            logger.error(f"流式处理聊天请求时发生错误: {str(e)}")
+            yield _sse_event({"type": "error", "detail": str(e)})
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # 登陆后，获取所有对话 
 @router.get("/conversations", response_model=List[ConversationModel])
 async def get_conversations(
@@ -1,16 +1,17 @@
 import logging
 import os
 import sys
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple, AsyncIterator
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
 from backend.app.models.llm import get_llm_service, LLMService
 from app.core.config import settings
+from app.core.registry import get_default_llm_service
 from app.db.models import Conversation, Message
 from sqlalchemy.orm import Session
 
 # 导入chat_workflow
-from backend.app.chat_management.chat_workflow import process_with_workflow
+from backend.app.chat_management.chat_workflow import process_with_workflow, stream_with_workflow
 
 # 配置日志格式
 logging.basicConfig(
@@ -40,7 +41,7 @@ class ChatService:
         """
         logger.info("====================== 初始化 ChatService ======================")
         # 创建或使用提供的LLM服务
-        self.llm_service = llm_service or get_llm_service()
+        self.llm_service = llm_service or get_default_llm_service()
         logger.info(f"LLM服务初始化完成: {type(self.llm_service).__name__}")
         logger.info("使用LangGraph工作流模式")
         logger.info("ChatService初始化完成")
@@ -52,7 +53,9 @@ class ChatService:
         db_session: Session,
         user_id: int = None,
         user_context: Optional[Dict[str, Any]] = None,
-        include_history: bool = True
+        include_history: bool = True,
+        reflection_mode: Optional[str] = None,
+        search_profile: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         处理聊天请求，包括数据库操作
@@ -64,6 +67,8 @@ class ChatService:
             user_id: 用户ID
             user_context: 用户上下文
             include_history: 是否包含历史记录
+            reflection_mode: 反思模式，为None时使用配置REFLECTION_MODE
+            search_profile: 稠密检索档位，为None时按查询选择
             
         Returns:
             包含回答的字典
@@ -74,6 +79,128 @@ class ChatService:
         logger.info(f"用户ID: {user_id}")
         logger.info(f"包含历史: {include_history}")
         
+        conversation, conversation_id, is_new_conversation, chat_history = self._prepare_conversation(
+            query=query,
+            conversation_id=conversation_id,
+            db_session=db_session,
+            user_id=user_id,
+            include_history=include_history
+        )
+        
+        # 处理消息
+        try:
+            logger.info(f"开始调用process_message处理消息...")
+            result = await self.process_message(
+                query=query,
+                session_id=conversation_id,
+                chat_history=chat_history,
+                user_context=user_context,
+                reflection_mode=reflection_mode,
+                search_profile=search_profile
+            )
+            logger.info(f"消息处理完成，回答长度: {len(result.get('answer', ''))}")
+        except Exception as e:
+            logger.error(f"处理消息时出错: {str(e)}", exc_info=True)
+            raise
+        
+        # 保存助手回复
+        self._save_assistant_message(
+            query=query,
+            answer=result["answer"],
+            conversation=conversation,
+            conversation_id=conversation_id,
+            db_session=db_session,
+            is_new_conversation=is_new_conversation
+        )
+        
+        # 构建响应
+        logger.info(f"处理聊天请求完成")
+        return {
+            "answer": result["answer"],
+            "sources": result.get("sources", []),
+            "conversation_id": conversation_id,
+            "needs_more_info": result.get("needs_more_info", False),
+            "intent_result": result.get("intent_result", {})
+        }
+    
+    async def process_chat_stream(
+        self,
+        query: str,
+        conversation_id: str,
+        db_session: Session,
+        user_id: int = None,
+        user_context: Optional[Dict[str, Any]] = None,
+        include_history: bool = True,
+        reflection_mode: Optional[str] = None,
+        search_profile: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式处理聊天请求，生成完成后保存助手回复
+        
+        Args:
+            同process_chat
+            
+        Yields:
+            {"type": "conversation", "conversation_id": 会话ID}，首个事件
+            工作流产出的intent/delta事件
+            {"type": "done", "answer": 完整回答, "sources": [...], "conversation_id": 会话ID}
+        """
+        logger.info(f"====================== 开始流式处理聊天请求 ======================")
+        logger.info(f"用户查询: {query}")
+        logger.info(f"会话ID: {conversation_id}")
+        
+        conversation, conversation_id, is_new_conversation, chat_history = self._prepare_conversation(
+            query=query,
+            conversation_id=conversation_id,
+            db_session=db_session,
+            user_id=user_id,
+            include_history=include_history
+        )
+        yield {"type": "conversation", "conversation_id": conversation_id}
+        
+        async for event in stream_with_workflow(
+            user_input=query,
+            chat_history=chat_history,
+            user_context=user_context,
+            reflection_mode=reflection_mode,
+            search_profile=search_profile
+        ):
+            if event["type"] != "done":
+                yield event
+                continue
+            
+            answer = event.get("answer") or "抱歉，我无法生成回答。请重新提问。"
+            # 流结束后再持久化助手回复
+            self._save_assistant_message(
+                query=query,
+                answer=answer,
+                conversation=conversation,
+                conversation_id=conversation_id,
+                db_session=db_session,
+                is_new_conversation=is_new_conversation
+            )
+            logger.info(f"流式处理聊天请求完成，回答长度: {len(answer)}")
+            yield {
+                "type": "done",
+                "answer": answer,
+                "sources": event.get("sources", []),
+                "conversation_id": conversation_id
+            }
+    
+    def _prepare_conversation(
+        self,
+        query: str,
+        conversation_id: str,
+        db_session: Session,
+        user_id: int = None,
+        include_history: bool = True
+    ) -> Tuple[Conversation, str, bool, Optional[List[Dict[str, str]]]]:
+        """
+        获取或创建会话，读取聊天历史并保存用户消息
+        
+        Returns:
+            (会话对象, 会话ID, 是否为新会话, 聊天历史)
+        """
         # 如果是新会话ID (temp)，创建新对话
         conversation = None
         is_new_conversation = False
@@ -141,27 +268,24 @@ class ChatService:
         except Exception as e:
             logger.error(f"保存用户消息时出错: {str(e)}", exc_info=True)
         
-        # 处理消息
-        try:
-            logger.info(f"开始调用process_message处理消息...")
-            result = await self.process_message(
-                query=query,
-                session_id=conversation_id,
-                chat_history=chat_history,
-                user_context=user_context
-            )
-            logger.info(f"消息处理完成，回答长度: {len(result.get('answer', ''))}")
-        except Exception as e:
-            logger.error(f"处理消息时出错: {str(e)}", exc_info=True)
-            raise
-        
-        # 保存助手回复
+        return conversation, conversation_id, is_new_conversation, chat_history
+    
+    def _save_assistant_message(
+        self,
+        query: str,
+        answer: str,
+        conversation: Conversation,
+        conversation_id: str,
+        db_session: Session,
+        is_new_conversation: bool
+    ):
+        """保存助手回复，新会话同时设置标题"""
         try:
             logger.info(f"保存助手回复...")
             assistant_message = Message(
                 conversation_id=conversation_id,
                 role="assistant",
-                content=result["answer"]
+                content=answer
             )
             db_session.add(assistant_message)
             
@@ -177,23 +301,15 @@ class ChatService:
             logger.info(f"助手回复保存成功，ID: {assistant_message.id}")
         except Exception as e:
             logger.error(f"保存助手回复时出错: {str(e)}", exc_info=True)
-        
-        # 构建响应
-        logger.info(f"处理聊天请求完成")
-        return {
-            "answer": result["answer"],
-            "sources": result.get("sources", []),
-            "conversation_id": conversation_id,
-            "needs_more_info": result.get("needs_more_info", False),
-            "intent_result": result.get("intent_result", {})
-        }
     
     async def process_message(
         self, 
         query: str,
         session_id: str = None,
         chat_history: Optional[List[Dict[str, str]]] = None,
-        user_context: Optional[Dict[str, Any]] = None
+        user_context: Optional[Dict[str, Any]] = None,
+        reflection_mode: Optional[str] = None,
+        search_profile: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         使用LangGraph工作流处理用户消息
@@ -203,6 +319,8 @@ class ChatService:
             session_id: 会话ID
             chat_history: 聊天历史
             user_context: 用户上下文
+            reflection_mode: 反思模式
+            search_profile: 稠密检索档位
             
         Returns:
             包含回答的字典
@@ -221,7 +339,9 @@ class ChatService:
             workflow_result = await process_with_workflow(
                 user_input=query,
                 chat_history=chat_history,
-                user_context=user_context
+                user_context=user_context,
+                reflection_mode=reflection_mode,
+                search_profile=search_profile
             )
             
             logger.info(f"工作流处理完成")
@@ -2,12 +2,15 @@ import os
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
 from typing_extensions import TypedDict
-from typing import List, Dict, Any, Optional, Literal, Annotated
+from typing import List, Dict, Any, Optional, Literal, Annotated, AsyncIterator
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from rag.RAGChain import RAGChain
 from models.llm import LLMService
+from app.core.config import settings
+from app.core.registry import get_default_llm_service, get_intent_classifier
+from app.chat_management.intent_classifier import IntentClassifier, CONTEXT_FREE_INTENTS
 from app.chat_management.prompt_template import intent_recognizer_prompt, llm_response_prompt
 import asyncio
 
@@ -23,7 +26,7 @@ def format_messages_for_llm(current_input: str = "", messages: Optional[List[Bas
     formatted.append(f"Human: {current_input}")
     
     return "\n".join(formatted)
-llm_service = LLMService()
+llm_service = get_default_llm_service()
 rag_chain = RAGChain()
 
 class InputState(TypedDict):
@@ -43,19 +46,39 @@ class OverallState(TypedDict):
     intent: Optional[Literal["DIFFERENT_QUESTION", "RELEVANT_QUESTION", "ADDITIONAL_COMMENT", "CASUAL_CHAT"]]
     messages: Annotated[List[BaseMessage], add_messages]
     loop_count: int
+    reflection_mode: Optional[str]  # 反思模式，为None时使用配置REFLECTION_MODE
+    search_profile: Optional[str]  # 稠密检索档位，为None时由RAGChain按查询选择
+
 
 async def classify_chat_topic(state: OverallState) -> OverallState:
     """
     分类聊天话题意图
     如果用户输入的对话历史小于3条，则使用用户输入作为上下文，如果用户输入的对话历史大于3条，则取三条对话历史作为上下文
-    使用LLM意图识别器生成意图，判断用户在通用场景下的意图转变
+    先使用本地嵌入分类器识别意图，置信度低于INTENT_CONFIDENCE_THRESHOLD或与次优意图的差距低于INTENT_MIN_MARGIN时，
+    再使用LLM意图识别器生成意图，判断用户在通用场景下的意图转变
     """
     print('开始意图识别')
 
     if len(state["messages"]) < 3:
         context = format_messages_for_llm(state["user_input"])
+        allowed_intents = CONTEXT_FREE_INTENTS
     else:
         context = format_messages_for_llm(state["user_input"],state["messages"][-2:])
+        allowed_intents = None
+
+    if settings.INTENT_CLASSIFIER_ENABLED:
+        try:
+            intent, confidence, margin = await get_intent_classifier().apredict(context, allowed_intents)
+            if IntentClassifier.accepts(confidence, margin):
+                print(f'意图识别结果(本地分类器，置信度{confidence:.2f}，差距{margin:.3f})：{intent}')
+                return {
+                    **state,
+                    "messages": [HumanMessage(content=context)],
+                    "intent": intent
+                }
+            print(f'本地分类器置信度{confidence:.2f}或差距{margin:.3f}过低({intent})，使用LLM意图识别')
+        except Exception as e:
+            print(f'本地意图分类失败，使用LLM意图识别: {str(e)}')
     
     # 直接使用用户输入进行意图识别
     response = await llm_service.generate(intent_recognizer_prompt(context))
@@ -96,7 +119,7 @@ async def generate_response_rag_context(state: OverallState) -> OverallState:
     else:
         context = format_messages_for_llm(state["user_input"],state["messages"][-2:])
 
-    response = await rag_chain.rag_chain(context, rewrite_query=False)
+    response = await rag_chain.rag_chain(context, reflection_mode=state.get("reflection_mode"), search_profile=state.get("search_profile"))
     answer = response.get("answer", "")
     sources = response.get("sources", [])
     print(f'RAG生成响应结果：{answer}')
@@ -111,7 +134,7 @@ async def generate_response_rag_contextfree(state: OverallState) -> OverallState
     """使用RAG生成响应（无上下文）"""
     print('开始RAG生成响应')
     user_input = format_messages_for_llm(state["user_input"])
-    response = await rag_chain.rag_chain(user_input)
+    response = await rag_chain.rag_chain(user_input, reflection_mode=state.get("reflection_mode"), search_profile=state.get("search_profile"))
     answer = response.get("answer", "")
     sources = response.get("sources", [])
     print(f'RAG生成响应结果：{answer}')
@@ -176,6 +199,10 @@ chat_workflow_graph = builder.compile()
 
 async def process_with_workflow(
     user_input: str,
+    chat_history: Optional[List[Dict[str, str]]] = None,
+    user_context: Optional[Dict[str, Any]] = None,
+    reflection_mode: Optional[str] = None,
+    search_profile: Optional[str] = None
 ) -> Dict[str, Any]:
     initial_state = {
         # InputState字段
@@ -185,8 +212,10 @@ async def process_with_workflow(
         "intent": None,
         "sources": None,
         # 原有字段
-        "messages": [],
-        "loop_count": 0
+        "messages": _history_to_messages(chat_history),
+        "loop_count": 0,
+        "reflection_mode": reflection_mode,
+        "search_profile": search_profile
     }
     try:
         result = await chat_workflow_graph.ainvoke(initial_state)
@@ -196,6 +225,75 @@ async def process_with_workflow(
         return {
             "answer": "处理消息时发生错误",
         }
+def _history_to_messages(chat_history: Optional[List[Dict[str, str]]]) -> List[BaseMessage]:
+    """将数据库中的聊天历史转换为LangChain消息"""
+    messages = []
+    for msg in chat_history or []:
+        if msg.get("role") == "user":
+            messages.append(HumanMessage(content=msg.get("content", "")))
+        elif msg.get("role") == "assistant":
+            messages.append(AIMessage(content=msg.get("content", "")))
+    return messages
+
+async def stream_with_workflow(
+    user_input: str,
+    chat_history: Optional[List[Dict[str, str]]] = None,
+    user_context: Optional[Dict[str, Any]] = None,
+    reflection_mode: Optional[str] = None,
+    search_profile: Optional[str] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    流式版本的工作流，与chat_workflow_graph的路由保持一致
+    先完成意图识别，再按意图流式产出生成结果
+
+    Yields:
+        {"type": "intent", "intent": 意图}
+        {"type": "delta", "content": 增量文本}
+        {"type": "done", "answer": 完整回答, "sources": 法律依据列表}
+    """
+    history = _history_to_messages(chat_history)
+    state = {
+        "user_input": user_input,
+        "answer": None,
+        "intent": None,
+        "sources": None,
+        "messages": history,
+        "loop_count": 0,
+        "reflection_mode": reflection_mode,
+        "search_profile": search_profile
+    }
+    state = await classify_chat_topic(state)
+    intent = state["intent"]
+    yield {"type": "intent", "intent": intent}
+
+    if len(history) < 3:
+        context = format_messages_for_llm(user_input)
+    else:
+        context = format_messages_for_llm(user_input, history[-2:])
+
+    if intent in ("DIFFERENT_QUESTION", "RELEVANT_QUESTION"):
+        query = context if intent == "RELEVANT_QUESTION" else format_messages_for_llm(user_input)
+        async for event in rag_chain.rag_chain_stream(query, reflection_mode=reflection_mode, search_profile=search_profile):
+            if event["type"] == "done":
+                yield {"type": "done", "answer": event["answer"], "sources": event.get("retrieved_docs", [])}
+            else:
+                yield event
+        return
+
+    if intent != "ADDITIONAL_COMMENT":
+        context = format_messages_for_llm(user_input)
+    answer_parts = []
+    try:
+        async for delta in llm_service.generate_stream(llm_response_prompt(context)):
+            answer_parts.append(delta)
+            yield {"type": "delta", "content": delta}
+    except Exception as e:
+        print(f'流式生成响应时发生错误: {str(e)}')
+        if not answer_parts:
+            answer_parts.append("处理消息时发生错误")
+            yield {"type": "delta", "content": answer_parts[0]}
+    yield {"type": "done", "answer": "".join(answer_parts), "sources": []}
+
 async def interactive_chat():
     while True:
         user_input = input('\n您：').strip()
@@ -0,0 +1,144 @@
+'''
+基于嵌入向量的意图分类器
+
+复用已加载的BGE嵌入模型，对标注样例按意图求中心向量（nearest-centroid），
+分类时只需一次查询向量化和四次点积，置信度足够高且与次优意图拉开差距时无需调用LLM意图识别。
+
+中心向量可由scripts/train_intent_classifier.py预先计算并保存到INTENT_CENTROIDS_PATH，
+文件不存在或与当前嵌入模型不匹配时，首次使用时由intent_examples中的样例现场计算。
+
+使用方式:
+classifier = get_intent_classifier()
+label, confidence, margin = await classifier.apredict(context, allowed_labels)
+if classifier.accepts(confidence, margin): ...
+'''
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+import asyncio
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.core.config import settings
+from app.chat_management.intent_examples import INTENT_EXAMPLES
+
+logger = logging.getLogger(__name__)
+
+# 没有对话上下文时，只可能是新问题或闲聊
+CONTEXT_FREE_INTENTS = ("DIFFERENT_QUESTION", "CASUAL_CHAT")
+
+
+class IntentClassifier:
+    """最近中心向量意图分类器"""
+
+    def __init__(self, embedding_model=None, centroids_path: Optional[str] = None, temperature: Optional[float] = None):
+        """
+        初始化意图分类器
+
+        Args:
+            embedding_model: BGEEmbedding实例，为None时使用共享的嵌入模型
+            centroids_path: 预计算的中心向量文件(.npz)，为None时使用配置INTENT_CENTROIDS_PATH
+            temperature: 将余弦相似度转换为概率时的softmax温度，越小置信度越尖锐
+        """
+        if embedding_model is None:
+            from app.core.registry import get_embedding_model
+            embedding_model = get_embedding_model()
+        self.embedding = embedding_model
+        self.centroids_path = centroids_path or settings.INTENT_CENTROIDS_PATH
+        self.temperature = temperature or settings.INTENT_TEMPERATURE
+        self.labels: List[str] = []
+        self.centroids: Optional[np.ndarray] = None  # [n_labels, dim]，已归一化
+        self._lock = threading.Lock()
+
+    def fit(self, examples: Dict[str, Sequence[str]]) -> "IntentClassifier":
+        """
+        根据标注样例计算各意图的中心向量
+
+        Args:
+            examples: 意图到样例文本列表的映射
+        """
+        labels = list(examples.keys())
+        centroids = []
+        for label in labels:
+            vectors = self.embedding.encode(list(examples[label]), normalize=True)
+            centroid = np.asarray(vectors, dtype=np.float32).mean(axis=0)
+            centroids.append(centroid / np.linalg.norm(centroid))
+        self.labels = labels
+        self.centroids = np.stack(centroids)
+        logger.info(f"意图中心向量计算完成，意图数: {len(labels)}，样例数: {sum(len(v) for v in examples.values())}")
+        return self
+
+    def save(self, path: Optional[str] = None):
+        """保存中心向量，附带嵌入模型路径用于加载时校验"""
+        path = path or self.centroids_path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(path, labels=np.array(self.labels), centroids=self.centroids, model_path=np.array(self.embedding.model_path))
+        logger.info(f"意图中心向量已保存: {path}")
+
+    def load(self, path: Optional[str] = None) -> bool:
+        """
+        加载预计算的中心向量
+
+        Returns:
+            是否加载成功；文件不存在或由其他嵌入模型计算时返回False
+        """
+        path = path or self.centroids_path
+        if not os.path.exists(path):
+            return False
+        data = np.load(path)
+        if str(data["model_path"]) != self.embedding.model_path:
+            logger.warning(f"意图中心向量由其他嵌入模型计算({data['model_path']})，忽略: {path}")
+            return False
+        self.labels = [str(label) for label in data["labels"]]
+        self.centroids = data["centroids"].astype(np.float32)
+        logger.info(f"意图中心向量加载成功: {path}")
+        return True
+
+    def _ensure_ready(self):
+        """首次使用时加载或计算中心向量"""
+        if self.centroids is not None:
+            return
+        with self._lock:
+            if self.centroids is None and not self.load():
+                self.fit(INTENT_EXAMPLES)
+
+    def predict_embedding(self, query_embedding: np.ndarray,
+                          allowed_labels: Optional[Sequence[str]] = None) -> Tuple[str, float, float]:
+        """
+        根据查询向量分类
+
+        Args:
+            query_embedding: 已归一化的查询向量
+            allowed_labels: 候选意图，为None时在全部意图中选择
+
+        Returns:
+            (意图, 置信度, 差距)，置信度为候选意图上softmax(相似度 / 温度)的最大值，
+            差距为最相似与次相似意图的余弦相似度之差（只有一个候选时为1.0）
+        """
+        self._ensure_ready()
+        indices = [i for i, label in enumerate(self.labels) if allowed_labels is None or label in allowed_labels]
+        similarities = self.centroids[indices] @ np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        logits = similarities / self.temperature
+        probs = np.exp(logits - logits.max())
+        probs /= probs.sum()
+        best = int(np.argmax(probs))
+        top_two = np.sort(similarities)[-2:]
+        margin = float(top_two[-1] - top_two[0]) if len(top_two) > 1 else 1.0
+        return self.labels[indices[best]], float(probs[best]), margin
+
+    @staticmethod
+    def accepts(confidence: float, margin: float) -> bool:
+        """本地分类结果是否可以直接使用，否则回退到LLM意图识别"""
+        return confidence >= settings.INTENT_CONFIDENCE_THRESHOLD and margin >= settings.INTENT_MIN_MARGIN
+
+    def predict(self, context: str, allowed_labels: Optional[Sequence[str]] = None) -> Tuple[str, float, float]:
+        """同步分类，供训练/评估脚本使用"""
+        return self.predict_embedding(self.embedding.encode(context, normalize=True), allowed_labels)
+
+    async def apredict(self, context: str, allowed_labels: Optional[Sequence[str]] = None) -> Tuple[str, float, float]:
+        """异步分类，向量化走推理执行器，不阻塞事件循环"""
+        if self.centroids is None:
+            await asyncio.to_thread(self._ensure_ready)
+        query_embedding = await self.embedding.aencode(context)
+        return self.predict_embedding(query_embedding, allowed_labels)
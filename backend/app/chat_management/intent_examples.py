@@ -0,0 +1,64 @@
+'''
+意图识别标注样例
+
+供IntentClassifier计算各意图的中心向量，也是scripts/train_intent_classifier.py的默认训练/评估数据。
+样例格式与chat_workflow.format_messages_for_llm的输出保持一致：
+无上下文时只有当前输入一行，有上下文时为最近一轮对话加当前输入。
+'''
+
+INTENT_EXAMPLES = {
+    "DIFFERENT_QUESTION": [
+        "Human: 注册公司需要什么材料？",
+        "Human: 有限责任公司的股东最多可以有多少人？",
+        "Human: 公司法第二十九条是怎么规定的？",
+        "Human: 员工试用期最长可以约定多久？",
+        "Human: 商标注册需要多长时间？",
+        "Human: 小规模纳税人增值税怎么计算？",
+        "Human: 签订劳动合同时需要注意哪些条款？",
+        "Human: 公司解散后债务由谁承担？",
+        "Human: 关于股权质押登记流程，需要准备哪些材料？\nAssistant: 需提交质押合同、股权证明文件、股东会决议等材料。\nHuman: 公司咖啡机采购合同怎么审查？",
+        "Human: 跨境数据传输需要做合规评估吗？\nAssistant: 向境外提供个人信息需要通过国家网信部门组织的安全评估。\nHuman: 员工离职后竞业限制补偿怎么算？",
+        "Human: 我们收到税务稽查通知了，怎么办？\nAssistant: 请整理相关材料，并成立小组应对相关事宜。\nHuman: 另外问一下，专利被侵权了应该怎么起诉？",
+        "Human: 公司章程可以约定同股不同权吗？\nAssistant: 有限责任公司可以在章程中约定不按出资比例行使表决权。\nHuman: 高新技术企业认定需要满足什么条件？",
+    ],
+    "RELEVANT_QUESTION": [
+        "Human: 跨境数据传输需要做合规评估吗？\nAssistant: 向境外提供个人信息需要通过国家网信部门组织的安全评估。\nHuman: 安全评估有哪些内容？",
+        "Human: 注册公司需要什么材料？\nAssistant: 需要公司章程、股东身份证明、住所证明等材料。\nHuman: 那注册资本最低要多少？",
+        "Human: 员工试用期最长可以约定多久？\nAssistant: 劳动合同期限三年以上的，试用期不得超过六个月。\nHuman: 试用期内辞退员工需要赔偿吗？",
+        "Human: 股东未按期缴纳出资要承担什么责任？\nAssistant: 除应当足额缴纳外，还应当对给公司造成的损失承担赔偿责任。\nHuman: 其他股东需要承担连带责任吗？",
+        "Human: 商标注册需要多长时间？\nAssistant: 一般需要一年左右，包括形式审查、实质审查和公告期。\nHuman: 公告期内被提出异议怎么办？",
+        "Human: 公司可以给员工发股票期权吗？\nAssistant: 可以，需要通过股东会决议并制定股权激励计划。\nHuman: 员工行权时需要缴纳个人所得税吗？",
+        "Human: 合同违约金约定多少合适？\nAssistant: 违约金过分高于造成的损失的，当事人可以请求人民法院予以适当减少。\nHuman: 怎么算过分高于损失？",
+        "Human: 我们收到税务稽查通知了，怎么办？\nAssistant: 请整理相关材料，并成立小组应对相关事宜。\nHuman: 如果查出少缴税款会有什么处罚？",
+        "Human: 公司解散后债务由谁承担？\nAssistant: 公司以其全部财产对公司的债务承担责任，清算后仍不足的依法处理。\nHuman: 那股东个人需要承担吗？",
+        "Human: 竞业限制协议有效期最长多久？\nAssistant: 竞业限制期限不得超过二年。\nHuman: 公司不支付补偿金的话协议还有效吗？",
+        "Human: 软件著作权怎么登记？\nAssistant: 向中国版权保护中心提交申请表、源程序和文档等材料。\nHuman: 登记之后保护期是多久？",
+        "Human: 公司章程可以约定同股不同权吗？\nAssistant: 有限责任公司可以在章程中约定不按出资比例行使表决权。\nHuman: 股份有限公司也可以这样约定吗？",
+    ],
+    "ADDITIONAL_COMMENT": [
+        "Human: 我们收到税务稽查通知了，怎么办？\nAssistant: 请整理相关材料，并成立小组应对相关事宜。\nHuman: 好的",
+        "Human: 注册公司需要什么材料？\nAssistant: 需要公司章程、股东身份证明、住所证明等材料。\nHuman: 明白了，谢谢",
+        "Human: 员工试用期最长可以约定多久？\nAssistant: 劳动合同期限三年以上的，试用期不得超过六个月。\nHuman: 原来如此，我们之前约定得太长了",
+        "Human: 商标注册需要多长时间？\nAssistant: 一般需要一年左右，包括形式审查、实质审查和公告期。\nHuman: 这么久啊",
+        "Human: 合同违约金约定多少合适？\nAssistant: 违约金过分高于造成的损失的，当事人可以请求人民法院予以适当减少。\nHuman: 嗯嗯，我记下了",
+        "Human: 股东未按期缴纳出资要承担什么责任？\nAssistant: 除应当足额缴纳外，还应当对给公司造成的损失承担赔偿责任。\nHuman: 好的，我去和其他股东沟通一下",
+        "Human: 竞业限制协议有效期最长多久？\nAssistant: 竞业限制期限不得超过二年。\nHuman: 了解",
+        "Human: 软件著作权怎么登记？\nAssistant: 向中国版权保护中心提交申请表、源程序和文档等材料。\nHuman: 收到，非常有帮助",
+        "Human: 公司解散后债务由谁承担？\nAssistant: 公司以其全部财产对公司的债务承担责任。\nHuman: 你说得对，我们会先做好清算",
+        "Human: 跨境数据传输需要做合规评估吗？\nAssistant: 向境外提供个人信息需要通过国家网信部门组织的安全评估。\nHuman: 看来我们得抓紧准备了",
+    ],
+    "CASUAL_CHAT": [
+        "Human: 你好",
+        "Human: 你叫什么名字？",
+        "Human: 今天天气怎么样？",
+        "Human: 给我讲个笑话吧",
+        "Human: 你是机器人吗？",
+        "Human: 早上好",
+        "Human: 你能做什么？",
+        "Human: 推荐一部好看的电影",
+        "Human: 你好\nAssistant: 你好，有什么可以帮你的吗？\nHuman: 你叫什么名字？",
+        "Human: 注册公司需要什么材料？\nAssistant: 需要公司章程、股东身份证明、住所证明等材料。\nHuman: 对了，附近有什么好吃的餐厅？",
+        "Human: 员工试用期最长可以约定多久？\nAssistant: 劳动合同期限三年以上的，试用期不得超过六个月。\nHuman: 你平时喜欢听什么歌？",
+        "Human: 谢谢你\nAssistant: 不客气，还有其他问题吗？\nHuman: 你今天过得怎么样？",
+    ],
+}
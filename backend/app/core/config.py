@@ -1,6 +1,6 @@
 # app/core/config.py
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 import os
 # 确定项目根目录
@@ -24,6 +24,23 @@ class Settings(BaseSettings):
     MILVUS_HOST: str
     MILVUS_PORT: str
     MILVUS_COLLECTION: str = "legal_documents"
+    MILVUS_PRELOAD: bool = True  # 启动时预加载检索集合，加载完成前/ready返回503
+    MILVUS_HNSW_M: int = 16  # HNSW图中每个节点的最大边数
+    MILVUS_HNSW_EF_CONSTRUCTION: int = 200  # HNSW构建时的搜索宽度
+    # 检索档位 -> HNSW搜索时的ef，ef越大召回率越高、延迟越高；实际ef不小于返回数量limit
+    MILVUS_SEARCH_PROFILES: Dict[str, int] = {"fast": 32, "balanced": 100, "accurate": 256}
+    MILVUS_SEARCH_PROFILE: str = "balanced"  # 默认检索档位
+    MILVUS_CITATION_SEARCH_PROFILE: str = "fast"  # 查询明确引用法条编号时的档位，关键词检索已能精确命中
+    # 新建集合的向量索引类型，已有集合的索引类型在检索时从Milvus读取：
+    # HNSW(默认，内存占用最大) / IVF_SQ8(标量量化，约1/4) / IVF_PQ(乘积量化) / BIN_FLAT(符号二值化，约1/32)
+    MILVUS_INDEX_TYPE: str = "HNSW"
+    MILVUS_IVF_NLIST: int = 1024  # IVF聚类中心数
+    MILVUS_PQ_M: int = 64  # PQ子向量数，需整除向量维度
+    MILVUS_PQ_NBITS: int = 8  # PQ每个子向量的编码位数
+    # 检索档位 -> IVF索引搜索时的nprobe，档位名与MILVUS_SEARCH_PROFILES一致
+    MILVUS_IVF_SEARCH_PROFILES: Dict[str, int] = {"fast": 8, "balanced": 32, "accurate": 128}
+    MILVUS_RESCORE_FACTOR: int = 4  # 有损索引(IVF_PQ/BIN_FLAT)先取limit*倍数个候选，再用浮点向量重排
+    EMBEDDING_STORE_DIR: str = "data/embedding_store"  # 重排用的浮点向量存储目录，每个集合一个子目录
 
     # Redis配置
     REDIS_HOST: str
@@ -38,6 +55,12 @@ class Settings(BaseSettings):
     SILICONFLOW_API_URL: str
     SILICONFLOW_MODEL: str
     
+    # LLM HTTP连接池配置
+    LLM_HTTP2: bool = True  # 是否启用HTTP/2（需要安装h2）
+    LLM_MAX_CONNECTIONS: int = 100  # 连接池最大连接数
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20  # 最大保活连接数
+    LLM_KEEPALIVE_EXPIRY: float = 60.0  # 空闲连接保活时间，秒
+
     # 意图识别模型
     INTENT_MODEL: Optional[str] = None
 
@@ -47,12 +70,90 @@ class Settings(BaseSettings):
     # 向量嵌入模型设置
     EMBEDDING_DIMENSION: int 
     EMBEDDING_MODEL_PATH: str
+    EMBEDDING_TOKEN_BUDGET: int = 16384  # 按长度排序分批向量化时每批的token预算
+    # 降维：入库时把向量投影到EMBEDDING_REDUCED_DIM维后再写入Milvus，0为不降维；
+    # 检索时按集合加载EMBEDDING_PROJECTION_DIR中的投影，降维集合检索后用浮点向量存储(EMBEDDING_STORE_DIR)中的全维向量重排
+    EMBEDDING_REDUCED_DIM: int = 0
+    EMBEDDING_REDUCTION_METHOD: str = "pca"  # "pca": 在语料上拟合；"truncate": 取前N维，仅适用于Matryoshka模型
+    EMBEDDING_PROJECTION_DIR: str = "model_bins/embedding_projection"  # 入库时拟合的投影矩阵，每个集合一个<集合名>.npz
     RERANKER_MODEL_PATH: str
     
     # 重排序配置
     USE_RERANKER: bool = True  # 是否默认使用重排序器
     RERANKER_CANDIDATES: int = 10  # 重排序候选数量
 
+    # 推理后端配置
+    INFERENCE_BACKEND: str = "torch"  # 可选值: "torch", "onnx"
+    ONNX_MODEL_DIR: str = "model_bins/onnx"  # ONNX模型目录（相对于backend目录），按embedding/reranker分子目录，模型旁记录导出时的源模型路径
+    ONNX_QUANTIZE: bool = False  # 是否使用int8动态量化模型
+    ONNX_INTRA_OP_THREADS: int = 0  # onnxruntime算子内线程数，0为默认
+
+    # 模型推理执行器配置
+    INFERENCE_MAX_WORKERS: int = 1  # 推理线程数
+    INFERENCE_QUEUE_SIZE: int = 64  # 最大排队推理请求数
+
+    # 查询向量缓存配置
+    EMBEDDING_CACHE_ENABLED: bool = True  # 是否缓存查询向量
+    EMBEDDING_CACHE_SIZE: int = 10000  # 进程内缓存最大条目数
+    EMBEDDING_CACHE_TTL: int = 86400  # 缓存有效期，秒，0为不过期
+    EMBEDDING_CACHE_DTYPE: str = "float16"  # 缓存存储精度: "float16", "float32"
+    EMBEDDING_CACHE_USE_REDIS: bool = False  # 是否启用Redis二级缓存
+
+    # HyDE配置
+    HYDE_TIMEOUT: float = 2.5  # 从检索开始计算的截止时间（秒），超时后不等待HyDE结果
+    HYDE_RRF_ALPHA: float = 0.6  # 原始查询候选与HyDE稠密检索结果融合时原始查询的权重
+    HYDE_CACHE_SIZE: int = 2000  # 伪文档缓存最大条目数，有效期为CACHE_EXPIRATION
+    HYDE_SKIP_ARTICLE_CITATION: bool = True  # 查询中明确引用法条编号时跳过HyDE
+    HYDE_SKIP_DENSE_SCORE: float = 0.85  # 原始查询稠密检索最高余弦相似度达到该值时跳过HyDE，0为不启用
+
+    # 意图识别配置
+    INTENT_CLASSIFIER_ENABLED: bool = True  # 是否先使用本地嵌入分类器识别意图
+    INTENT_CONFIDENCE_THRESHOLD: float = 0.6  # 本地分类置信度低于该值时回退到LLM意图识别
+    # 最相似与次相似意图的余弦相似度之差低于该值时回退到LLM意图识别；
+    # 温度0.05下两类之间0.6的置信度只对应0.02的相似度差，法律问题容易被误判为闲聊而跳过检索
+    INTENT_MIN_MARGIN: float = 0.05
+    INTENT_TEMPERATURE: float = 0.05  # 相似度转换为置信度的softmax温度
+    INTENT_CENTROIDS_PATH: str = "model_bins/intent_centroids.npz"  # 预计算的意图中心向量
+
+    # 检索文档上下文配置（与对话历史长度CONTEXT_LENGTH无关）
+    CONTEXT_MAX_TOKENS: int = 3000  # 提示词中检索法条的总token预算
+    CONTEXT_DOC_MAX_TOKENS: int = 512  # 单条法条内容的token上限
+    CONTEXT_TOKENIZER_PATH: str = ""  # 统计token使用的分词器路径，为空时从嵌入模型路径加载独立的分词器实例
+
+    # 相邻法条扩展配置
+    ARTICLE_EXPANSION_ENABLED: bool = True  # 是否用命中法条的前后条补充检索结果
+    ARTICLE_INDEX_PATH: str = "data/article_index.json"  # 入库时生成的法条顺序索引
+    ARTICLE_EXPANSION_WINDOW: int = 1  # 每条命中法条前后扩展的条数
+    ARTICLE_EXPANSION_TOP_N: int = 3  # 扩展排名前几的命中法条
+
+    # 反思（相关法条过滤）配置
+    REFLECTION_MODE: str = "llm_json"  # 默认模式: "llm_json", "llm_index", "reranker", "none"，可按请求覆盖
+    REFLECTION_SCORE_THRESHOLD: float = 0.3  # reranker模式下校准后相关概率的最低值
+    REFLECTION_SCORE_SCALE: float = 1.0  # 重排序logit校准: sigmoid(scale * logit + bias)
+    REFLECTION_SCORE_BIAS: float = 0.0
+    REFLECTION_MIN_DOCS: int = 1  # 过滤后至少保留的法条数
+    REFLECTION_INDEX_MAX_TOKENS: int = 64  # llm_index模式的最大输出token数
+
+    # 检索结果缓存配置
+    RETRIEVAL_CACHE_ENABLED: bool = True  # 是否缓存融合/重排序后的候选列表
+    RETRIEVAL_CACHE_SIZE: int = 2000  # 最大缓存查询数
+
+    # 查询向量化微批处理配置
+    EMBEDDING_MICRO_BATCHING: bool = True  # 是否合并并发的单条查询向量化请求
+    EMBEDDING_BATCH_MAX_SIZE: int = 32  # 单批最大查询数
+    EMBEDDING_BATCH_MAX_LATENCY_MS: float = 5.0  # 最早的请求最多等待的毫秒数
+
+    # 重排序跨请求微批处理配置
+    RERANK_MICRO_BATCHING: bool = True  # 是否合并并发查询的重排序计算
+    RERANK_BATCH_MAX_REQUESTS: int = 8  # 单次合并的最大查询数
+    RERANK_BATCH_MAX_LATENCY_MS: float = 10.0  # 最早的查询最多等待的毫秒数
+    RERANK_BATCH_MAX_PAIRS: int = 32  # 单次前向计算的最大文本对数
+    RERANK_BATCH_TOKEN_BUDGET: int = 8192  # 单次前向计算的token预算(最长长度 x 文本对数)
+
+    # 混合检索并发配置
+    DENSE_SEARCH_TIMEOUT: float = 5.0  # 稠密检索(含向量化)超时时间，秒
+    SPARSE_SEARCH_TIMEOUT: float = 3.0  # 稀疏检索超时时间，秒
+
     # BM25配置
     BM25_CACHE_DIR: str 
 
@@ -62,12 +163,24 @@ class Settings(BaseSettings):
     # 缓存设置
     CACHE_EXPIRATION: int = 3600  # 秒
 
+    # 语义答案缓存配置
+    # 默认关闭：BGE中文向量的相似度普遍偏高，"注册/注销公司"等含义相反的问法也可能超过阈值，
+    # 启用前需用评估集校准SEMANTIC_CACHE_THRESHOLD
+    SEMANTIC_CACHE_ENABLED: bool = False  # 是否启用语义答案缓存
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95  # 命中所需的最小余弦相似度
+    SEMANTIC_CACHE_SIZE: int = 2000  # 最大缓存条目数
+    SEMANTIC_CACHE_VALIDATE: bool = True  # 命中时是否从ES核对引用法条是否变更
+
     # Elasticsearch配置
     ES_HOSTS: List[str] = ["http://localhost:9200"]
     ES_INDEX: str = "legal_documents"
     ES_USERNAME: Optional[str] = None
     ES_PASSWORD: Optional[str] = None
     ES_USE_SSL: bool = False
+    ES_REQUEST_TIMEOUT: float = 30.0  # 建索引等管理操作及同步检索的请求超时（秒）
+    ES_SEARCH_TIMEOUT: float = 1.0  # 在线异步检索(search_async)的请求超时（秒），应小于SPARSE_SEARCH_TIMEOUT
+    ES_MAX_CONNECTIONS: int = 20  # 异步客户端每个节点的连接池大小
+    ES_MINIMUM_SHOULD_MATCH: str = ""  # 查询词最少匹配比例，如"30%"；为空时任一词匹配即可
 
     # 搜索引擎选择
     SEARCH_ENGINE: str = "elasticsearch"  # 可选值: "bm25", "elasticsearch"
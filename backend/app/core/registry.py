@@ -0,0 +1,126 @@
+'''
+进程级共享资源注册表
+
+嵌入模型、重排序模型、Milvus/ES客户端和LLM服务加载成本较高，
+RAGChain、Generator、评估脚本等各处都需要使用，统一在此懒加载，每个进程只创建一次。
+
+获取资源:
+get_embedding_model() -> BGEEmbedding
+get_reranker_model() -> BAAIReranker
+get_vector_store() -> VectorStore
+get_es_searcher() -> ESSearcher
+get_default_llm_service() -> LLMService
+get_inference_executor() -> InferenceExecutor
+get_semantic_cache() -> SemanticAnswerCache
+get_intent_classifier() -> IntentClassifier
+get_article_index() -> ArticleIndex
+'''
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+import logging
+import threading
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# 可重入锁：资源的构造函数中可能再次获取其他共享资源
+_lock = threading.RLock()
+_instances: Dict[str, Any] = {}
+
+
+def _get_or_create(name: str, factory: Callable[[], Any]) -> Any:
+    """双重检查加锁，保证同一资源在进程内只创建一次"""
+    instance = _instances.get(name)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(name)
+            if instance is None:
+                logger.info(f"初始化共享资源: {name}")
+                instance = factory()
+                _instances[name] = instance
+    return instance
+
+
+def get_embedding_model():
+    """获取共享的BGE嵌入模型"""
+    def factory():
+        from app.models.Embeddings.bge_embedding import BGEEmbedding
+        return BGEEmbedding()
+    return _get_or_create("embedding_model", factory)
+
+
+def get_reranker_model():
+    """获取共享的BAAI重排序模型"""
+    def factory():
+        from app.models.Rerankers.bge_reranker import BAAIReranker
+        return BAAIReranker()
+    return _get_or_create("reranker_model", factory)
+
+
+def get_vector_store():
+    """获取共享的Milvus向量库客户端"""
+    def factory():
+        from app.db.milvus import VectorStore
+        return VectorStore()
+    return _get_or_create("vector_store", factory)
+
+
+def get_es_searcher():
+    """获取共享的Elasticsearch搜索器"""
+    def factory():
+        from app.db.es_search import ESSearcher
+        return ESSearcher()
+    return _get_or_create("es_searcher", factory)
+
+
+def get_default_llm_service():
+    """获取使用默认配置的共享LLM服务"""
+    def factory():
+        from app.models.llm import LLMService
+        return LLMService()
+    return _get_or_create("llm_service", factory)
+
+
+def get_inference_executor():
+    """获取共享的模型推理执行器"""
+    def factory():
+        from app.models.inference_executor import InferenceExecutor
+        return InferenceExecutor()
+    return _get_or_create("inference_executor", factory)
+
+
+def get_semantic_cache():
+    """获取共享的语义答案缓存"""
+    def factory():
+        from app.rag.semantic_cache import SemanticAnswerCache
+        return SemanticAnswerCache()
+    return _get_or_create("semantic_cache", factory)
+
+
+def get_intent_classifier():
+    """获取共享的嵌入意图分类器"""
+    def factory():
+        from app.chat_management.intent_classifier import IntentClassifier
+        return IntentClassifier()
+    return _get_or_create("intent_classifier", factory)
+
+
+def get_article_index():
+    """获取法条顺序索引，首次使用时从ARTICLE_INDEX_PATH加载"""
+    def factory():
+        from app.core.config import settings
+        from app.rag.article_index import ArticleIndex
+        return ArticleIndex.load(settings.ARTICLE_INDEX_PATH)
+    return _get_or_create("article_index", factory)
+
+
+def get_created(name: str) -> Any:
+    """获取已创建的资源，未创建时返回None（不触发创建），用于关闭时释放资源"""
+    return _instances.get(name)
+
+
+def reset_registry():
+    """清空已创建的资源，下次获取时重新创建"""
+    with _lock:
+        _instances.clear()
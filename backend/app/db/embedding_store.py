@@ -0,0 +1,136 @@
+'''
+量化索引的浮点向量存储与重排
+
+IVF_PQ、BIN_FLAT等量化索引在Milvus中只保存压缩后的向量，召回的候选排序有损。
+EmbeddingStore把原始浮点向量以float16保存在磁盘上（numpy memmap），检索时只读取候选对应的行，
+用查询向量与原始向量的余弦相似度对候选重新排序，Milvus节点内存中不需要保留浮点向量。
+
+文件布局（每个集合一个目录）:
+    vectors.npy  [n, dim] float16，已归一化
+    uuids.json   与vectors.npy逐行对应的uuid列表
+
+使用方式:
+EmbeddingStore.write(path, uuids, embeddings)
+store = EmbeddingStore(path)
+hits = store.rescore(query_embedding, hits, limit)
+'''
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_VECTORS_FILE = "vectors.npy"
+_UUIDS_FILE = "uuids.json"
+
+
+def binarize_embeddings(embeddings) -> List[bytes]:
+    """
+    将浮点向量按符号二值化并按位打包，作为BINARY_VECTOR字段的值
+
+    dim维向量打包为dim/8字节，大于0的分量为1；归一化向量的汉明距离近似反映其夹角
+    """
+    vectors = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+    return [row.tobytes() for row in np.packbits(vectors > 0, axis=1)]
+
+
+class EmbeddingStore:
+    """按uuid查找原始浮点向量的磁盘存储"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: 存储目录
+        """
+        self.path = path
+        self._vectors: Optional[np.ndarray] = None
+        self._rows: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def write(cls, path: str, uuids: Sequence[str], embeddings, dtype=np.float16) -> "EmbeddingStore":
+        """
+        写入全部向量，覆盖已有存储
+
+        Args:
+            path: 存储目录
+            uuids: 与embeddings逐行对应的uuid
+            embeddings: [n, dim] 浮点向量，写入前归一化
+            dtype: 磁盘上的存储精度，float16可将文件大小减半，对余弦重排的影响可忽略
+        """
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        os.makedirs(path, exist_ok=True)
+        memmap = np.lib.format.open_memmap(os.path.join(path, _VECTORS_FILE), mode="w+", dtype=dtype, shape=vectors.shape)
+        memmap[:] = vectors
+        memmap.flush()
+        del memmap
+        with open(os.path.join(path, _UUIDS_FILE), "w", encoding="utf-8") as f:
+            json.dump(list(uuids), f)
+        logger.info(f"浮点向量存储已写入: {path}，向量数: {len(vectors)}")
+        return cls(path)
+
+    def exists(self) -> bool:
+        return os.path.exists(os.path.join(self.path, _VECTORS_FILE)) and os.path.exists(os.path.join(self.path, _UUIDS_FILE))
+
+    def _ensure_loaded(self) -> bool:
+        """首次使用时以只读memmap打开向量文件，不把向量读入内存"""
+        if self._vectors is not None:
+            return True
+        with self._lock:
+            if self._vectors is not None:
+                return True
+            if not self.exists():
+                return False
+            with open(os.path.join(self.path, _UUIDS_FILE), "r", encoding="utf-8") as f:
+                self._rows = {uuid: row for row, uuid in enumerate(json.load(f))}
+            self._vectors = np.load(os.path.join(self.path, _VECTORS_FILE), mmap_mode="r")
+            logger.info(f"浮点向量存储已打开: {self.path}，向量数: {len(self._rows)}")
+        return True
+
+    def __len__(self) -> int:
+        return len(self._rows) if self._ensure_loaded() else 0
+
+    def get(self, uuids: Sequence[str]) -> np.ndarray:
+        """
+        获取一组uuid的向量
+
+        Returns:
+            [len(uuids), dim] float32；不在存储中的uuid对应全零向量
+        """
+        if not self._ensure_loaded():
+            raise FileNotFoundError(f"浮点向量存储不存在: {self.path}")
+        result = np.zeros((len(uuids), self._vectors.shape[1]), dtype=np.float32)
+        found = [(i, self._rows[uuid]) for i, uuid in enumerate(uuids) if uuid in self._rows]
+        if found:
+            positions, rows = zip(*found)
+            # memmap按行号排序读取，减少随机IO
+            order = np.argsort(rows)
+            sorted_rows = np.asarray(rows)[order]
+            result[np.asarray(positions)[order]] = self._vectors[sorted_rows]
+        return result
+
+    def rescore(self, query_embedding, hits: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        """
+        用原始向量的余弦相似度对候选重新排序，score替换为余弦相似度
+
+        存储不可用或候选都不在存储中时按原顺序截取，保证检索可用
+        """
+        if not hits or not self._ensure_loaded():
+            return hits[:limit]
+        uuids = [hit["uuid"] for hit in hits]
+        known = [uuid in self._rows for uuid in uuids]
+        if not any(known):
+            logger.warning(f"候选不在浮点向量存储中，跳过重排: {self.path}")
+            return hits[:limit]
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        scores = self.get(uuids) @ query
+        # 不在存储中的候选排在最后，保持其原有顺序
+        ranked = sorted(range(len(hits)), key=lambda i: (not known[i], -scores[i] if known[i] else i))
+        return [{**hits[i], "score": float(scores[i]) if known[i] else hits[i]["score"]} for i in ranked[:limit]]
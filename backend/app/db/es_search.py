@@ -8,6 +8,8 @@ elasticSearch 关键词搜索器 版本为ES8.x
 更新索引: def update_index(self, documents: List[Dict[str, Any]], id_field: str = "uuid") -> bool
 获取索引信息: def get_index_info() -> Dict[str, Any]
 搜索: def search(self, query: str, top_k: int = 10) -> List[Dict[str, Any]]
+异步搜索: async def search_async(self, query: str, top_k: int = 10) -> List[Dict[str, Any]]
+关闭异步客户端: async def close_async()
  result = {
                     "uuid": doc.get("uuid", ""),
                     "content": content,
@@ -25,14 +27,22 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from typing import List, Dict, Any, Optional
 import logging
+import re
 import time
 import jieba
-from elasticsearch import Elasticsearch, helpers
+from elasticsearch import AsyncElasticsearch, Elasticsearch, helpers
 from app.core.config import Settings
+from app.db.index_events import notify_chunks_changed
 
 logger = logging.getLogger(__name__)
 settings = Settings()
 
+# 检索结果只需要的字段，不返回分词后的content
+_SEARCH_SOURCE_FIELDS = ["uuid", "original_content", "document_name", "chapter", "section", "effective_date", "is_effective"]
+
+# 纯标点/空白的分词结果，不参与检索
+_NOISE_TOKEN_PATTERN = re.compile(r"^[\W_]+$")
+
 class ESSearcher:
     """Elasticsearch搜索器，替代BM25搜索实现"""
 
@@ -43,6 +53,7 @@ class ESSearcher:
         self.es_password = settings.ES_PASSWORD
         self.use_ssl = settings.ES_USE_SSL
         self.client = None
+        self._async_client = None
         self.last_updated = None
         self.tokenizer = jieba.Tokenizer()  # 保留中文分词能力
         
@@ -53,20 +64,7 @@ class ESSearcher:
         """连接到Elasticsearch服务器"""
         try:
             # 创建ES客户端 - 适用于ES 8.x
-            connection_params = {
-                'request_timeout': 30
-            }
-            
-            # 添加认证信息(如果有)
-            if self.es_username:
-                connection_params['basic_auth'] = (self.es_username, self.es_password)
-            
-            # 添加SSL信息(如果启用)
-            if self.use_ssl:
-                connection_params['verify_certs'] = True
-            
-            # 创建客户端
-            self.client = Elasticsearch(self.es_hosts, **connection_params)
+            self.client = Elasticsearch(self.es_hosts, **self._connection_params())
             
             # 检查连接是否成功
             if self.client.ping():
@@ -79,6 +77,38 @@ class ESSearcher:
             logger.error(f"连接Elasticsearch时发生错误: {e}")
             return False
     
+    def _connection_params(self) -> Dict[str, Any]:
+        """同步与异步客户端共用的连接参数"""
+        connection_params = {
+            'request_timeout': settings.ES_REQUEST_TIMEOUT
+        }
+        
+        # 添加认证信息(如果有)
+        if self.es_username:
+            connection_params['basic_auth'] = (self.es_username, self.es_password)
+        
+        # 添加SSL信息(如果启用)
+        if self.use_ssl:
+            connection_params['verify_certs'] = True
+        return connection_params
+
+    @property
+    def async_client(self) -> AsyncElasticsearch:
+        """异步客户端，首次使用时创建，连接池在检索请求之间复用"""
+        if self._async_client is None:
+            self._async_client = AsyncElasticsearch(
+                self.es_hosts,
+                connections_per_node=settings.ES_MAX_CONNECTIONS,
+                **self._connection_params()
+            )
+        return self._async_client
+
+    async def close_async(self):
+        """关闭异步客户端"""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
     def tokenize_zh(self, text: str) -> List[str]:
         """中文分词函数"""
         if not text or not isinstance(text, str):
@@ -188,6 +218,7 @@ class ESSearcher:
                 # 刷新索引
                 self.client.indices.refresh(index=self.es_index)
                 self.last_updated = time.time()
+                notify_chunks_changed(doc.get(id_field) for doc in documents if doc.get(id_field))
                 # 计算操作数量是operations列表长度的一半（每个文档有两个操作）
                 doc_count = len(operations) // 2
                 logger.info(f"成功索引 {doc_count} 个文档到 Elasticsearch")
@@ -213,6 +244,35 @@ class ESSearcher:
         # 更新就是重新索引，直接调用build_index
         return self.build_index(documents, id_field)
     
+    def get_documents(self, uuids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        按uuid批量获取法条的原始内容和生效状态
+        
+        Args:
+            uuids: 法条uuid列表
+            
+        Returns:
+            uuid到{"content", "is_effective"}的映射，不存在的法条不包含在内
+        """
+        if not self.client or not uuids:
+            return {}
+        
+        response = self.client.mget(
+            index=self.es_index,
+            ids=list(uuids),
+            _source_includes=["original_content", "content", "is_effective"]
+        )
+        documents = {}
+        for doc in response["docs"]:
+            if not doc.get("found"):
+                continue
+            source = doc["_source"]
+            documents[doc["_id"]] = {
+                "content": source.get("original_content") or source.get("content", ""),
+                "is_effective": source.get("is_effective", False),
+            }
+        return documents
+    
     def get_index_info(self) -> Dict[str, Any]:
         """
         获取索引信息
@@ -252,63 +312,105 @@ class ESSearcher:
             }
        
 
+    def _build_query(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        构建检索查询：jieba分词后去掉标点/空白并去重，在预处理的content字段上匹配
+
+        Returns:
+            查询体，没有有效查询词时返回None
+        """
+        tokens = []
+        for token in self.tokenize_zh(query):
+            token = token.strip()
+            if token and not _NOISE_TOKEN_PATTERN.match(token) and token not in tokens:
+                tokens.append(token)
+        if not tokens:
+            return None
+
+        match_query = {
+            "query": " ".join(tokens),
+            "operator": "or"
+        }
+        if settings.ES_MINIMUM_SHOULD_MATCH:
+            match_query["minimum_should_match"] = settings.ES_MINIMUM_SHOULD_MATCH
+
+        return {
+            "bool": {
+                "must": [
+                    {
+                        "match": {
+                            "content": match_query  # 在预处理的内容字段中搜索
+                        }
+                    }
+                ],
+                "filter": [
+                    {
+                        "term": {
+                            "is_effective": True
+                        }
+                    }
+                ]
+            }
+        }
+
+    def _parse_hits(self, response) -> List[Dict[str, Any]]:
+        """将检索结果转换为统一的文档格式"""
+        results = []
+        for hit in response["hits"]["hits"]:
+            doc = hit["_source"]
+            result = {
+                "uuid": doc.get("uuid", ""),
+                "content": doc.get("original_content", ""),
+                "document_name": doc.get("document_name", ""),
+                "chapter": doc.get("chapter", ""),
+                "section": doc.get("section", ""),
+                "effective_date": doc.get("effective_date", ""),
+                "is_effective": doc.get("is_effective", False),
+            }
+            results.append(result)
+        return results
+
     def search(self, query: str, top_k: int = 10) -> List[Dict[str, Any]]:
-        """执行Elasticsearch搜索"""
+        """
+        执行Elasticsearch搜索
+        同步接口供离线评估和脚本使用，使用客户端默认超时(ES_REQUEST_TIMEOUT)；ES_SEARCH_TIMEOUT只用于在线的search_async
+        """
         if not self.client:
-            self.logger.warning("未连接到Elasticsearch，无法执行搜索")
+            logger.warning("未连接到Elasticsearch，无法执行搜索")
+            return []
+        
+        query_body = self._build_query(query)
+        if query_body is None:
             return []
         
         try:
-            tokens = self.tokenize_zh(query)
-            processed_query = " ".join(tokens)
-
-            query_body = {
-                "bool": {
-                    "must": [
-                        {
-                            "match": {
-                                "content": {  # 在预处理的内容字段中搜索
-                                    "query": processed_query,
-                                    "operator": "or"
-                                }
-                            }
-                        }
-                    ],
-                    "filter": [
-                        {
-                            "term": {
-                                "is_effective": True
-                            }
-                        }
-                    ]
-                }
-            }
-            
             response = self.client.search(
                 index=self.es_index,
                 query=query_body,
-                size=top_k
+                size=top_k,
+                source=_SEARCH_SOURCE_FIELDS
             )
-            
-            results = []
-            for hit in response["hits"]["hits"]:
-                doc = hit["_source"]
-                content = doc.get("original_content") or doc.get("content", "")
-                result = {
-                    "uuid": doc.get("uuid", ""),
-                    "content": content,
-                    "document_name": doc.get("document_name", ""),
-                    "chapter": doc.get("chapter", ""),
-                    "section": doc.get("section", ""),
-                    "effective_date": doc.get("effective_date", ""),
-                    "is_effective": doc.get("is_effective", False),
-                }
-                results.append(result)
-            
-            return results
+            return self._parse_hits(response)
         except Exception as e:
-            self.logger.error(f"Elasticsearch搜索失败: {e}")
+            logger.error(f"Elasticsearch搜索失败: {e}")
             return [] 
+
+    async def search_async(self, query: str, top_k: int = 10) -> List[Dict[str, Any]]:
+        """
+        search的异步版本，使用AsyncElasticsearch，不阻塞事件循环
+        失败时抛出异常，由调用方决定降级方式
+        """
+        query_body = self._build_query(query)
+        if query_body is None:
+            return []
+        
+        response = await self.async_client.options(request_timeout=settings.ES_SEARCH_TIMEOUT).search(
+            index=self.es_index,
+            query=query_body,
+            size=top_k,
+            source=_SEARCH_SOURCE_FIELDS
+        )
+        return self._parse_hits(response)
             
 
 # if __name__ == "__main__" :
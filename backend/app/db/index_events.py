@@ -0,0 +1,60 @@
+'''
+索引变更通知
+
+ESSearcher / VectorStore写入或删除法条数据后调用notify_chunks_changed，
+依赖索引内容的缓存（如语义答案缓存）通过subscribe注册回调，在相关法条变更时失效。
+
+通知只在当前进程内生效；离线脚本在其他进程中重建索引时，
+依赖方需要自行校验（如语义答案缓存命中时核对法条指纹）。
+'''
+import hashlib
+import logging
+import threading
+from typing import Callable, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_generation = 0
+_listeners: List[Callable[[Optional[Set[str]]], None]] = []
+
+
+def chunk_fingerprint(content: str, is_effective) -> str:
+    """法条指纹：内容和生效状态任一变化，指纹都会变化"""
+    return hashlib.sha1(f"{bool(is_effective)}\x00{content or ''}".encode("utf-8")).hexdigest()
+
+
+def get_index_generation() -> int:
+    """获取索引版本号，每次数据变更递增"""
+    return _generation
+
+
+def subscribe(listener: Callable[[Optional[Set[str]]], None]):
+    """
+    注册变更回调
+
+    Args:
+        listener: 回调函数，参数为变更的法条uuid集合，为None时表示全部数据可能变更
+    """
+    with _lock:
+        _listeners.append(listener)
+
+
+def notify_chunks_changed(uuids: Optional[Iterable[str]] = None):
+    """
+    通知法条数据发生变更
+
+    Args:
+        uuids: 变更的法条uuid，为None时表示无法确定范围（如删除集合）
+    """
+    global _generation
+    changed = set(uuids) if uuids is not None else None
+    with _lock:
+        _generation += 1
+        listeners = list(_listeners)
+    logger.info(f"索引数据变更，版本号: {_generation}，变更法条数: {len(changed) if changed is not None else '全部'}")
+    for listener in listeners:
+        try:
+            listener(changed)
+        except Exception as e:
+            logger.error(f"索引变更回调执行失败: {e}")
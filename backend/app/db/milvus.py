@@ -2,18 +2,78 @@ import os
 import sys
 import json
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 from pymilvus import connections, Collection, FieldSchema, CollectionSchema, DataType, utility
 from typing import List, Dict, Any, Optional
 import logging
+import threading
 from core.config import Settings
+from app.db.index_events import notify_chunks_changed
+from app.db.embedding_store import EmbeddingStore, binarize_embeddings
+from app.models.Embeddings.dim_reduction import EmbeddingProjector, projection_path
 
 settings = Settings()
 logger = logging.getLogger(__name__)
 
+# 支持的向量索引类型
+SUPPORTED_INDEX_TYPES = ("HNSW", "IVF_SQ8", "IVF_PQ", "BIN_FLAT")
+# 向量字段为BINARY_VECTOR、使用汉明距离的索引类型
+BINARY_INDEX_TYPES = ("BIN_FLAT",)
+# 有损索引，检索后用浮点向量存储重排
+RESCORE_INDEX_TYPES = ("IVF_PQ", "BIN_FLAT")
+
+
+def embedding_field(index_type: Optional[str] = None, dim: Optional[int] = None) -> FieldSchema:
+    """按索引类型定义embedding字段：二值索引为dim位的BINARY_VECTOR，其余为FLOAT_VECTOR"""
+    index_type = index_type or settings.MILVUS_INDEX_TYPE
+    dim = dim or settings.EMBEDDING_DIMENSION
+    if index_type in BINARY_INDEX_TYPES:
+        return FieldSchema(name="embedding", dtype=DataType.BINARY_VECTOR, dim=dim)
+    return FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=dim)
+
+
+def vector_index_params(index_type: Optional[str] = None) -> Dict[str, Any]:
+    """embedding字段的索引参数"""
+    index_type = index_type or settings.MILVUS_INDEX_TYPE
+    if index_type == "HNSW":
+        params = {
+            "M": settings.MILVUS_HNSW_M,                          # HNSW图中每个节点的最大边数
+            "efConstruction": settings.MILVUS_HNSW_EF_CONSTRUCTION # 构建时的搜索宽度
+        }
+    elif index_type == "IVF_SQ8":
+        params = {"nlist": settings.MILVUS_IVF_NLIST}
+    elif index_type == "IVF_PQ":
+        params = {"nlist": settings.MILVUS_IVF_NLIST, "m": settings.MILVUS_PQ_M, "nbits": settings.MILVUS_PQ_NBITS}
+    elif index_type == "BIN_FLAT":
+        params = {}
+    else:
+        raise ValueError(f"不支持的向量索引类型: {index_type}，可选: {SUPPORTED_INDEX_TYPES}")
+    return {
+        "metric_type": "HAMMING" if index_type in BINARY_INDEX_TYPES else "COSINE",
+        "index_type": index_type,
+        "params": params
+    }
+
 class VectorStore:
-    def __init__(self):
+    def __init__(self, embedding_store_dir: Optional[str] = None, projection_dir: Optional[str] = None):
+        """
+        Args:
+            embedding_store_dir: 浮点向量存储目录，为None时使用配置EMBEDDING_STORE_DIR（相对于backend目录）
+            projection_dir: 降维投影目录，为None时使用配置EMBEDDING_PROJECTION_DIR（相对于backend目录）
+        """
         self.collections = {}  # 字典，键为集合名称，值为集合对象
-        self.connect_to_milvus()
+        self.embedding_store_dir = embedding_store_dir or settings.EMBEDDING_STORE_DIR
+        # 已加载到内存的集合，检索前只在未加载时调用load()，避免每次检索一次RPC
+        self._loaded = set()
+        self._load_lock = threading.Lock()
+        # 集合名称 -> 向量索引类型，首次检索时从Milvus读取
+        self._index_types: Dict[str, str] = {}
+        self._embedding_stores: Dict[str, EmbeddingStore] = {}
+        self.projection_dir = projection_dir or settings.EMBEDDING_PROJECTION_DIR
+        # 集合名称 -> 降维投影，未降维的集合为None
+        self._projectors: Dict[str, Optional[EmbeddingProjector]] = {}
+        # 启动时Milvus不可达则为False，加载集合前重新连接
+        self._connected = self.connect_to_milvus()
      
     def connect_to_milvus(self):
         """连接到Milvus向量数据库"""
@@ -44,11 +104,108 @@ class VectorStore:
         self.collections[collection_name] = Collection(collection_name)
         return self.collections[collection_name]
     
-    def create_collection(self, fields, collection_name, description):
+    def ensure_loaded(self, collection_name) -> bool:
+        """
+        确保集合已加载，已加载的集合直接返回，不访问Milvus
+        尚未连接到Milvus时先重新连接，Milvus恢复后无需重启服务
+
+        Returns:
+            集合是否可供检索
+        """
+        if collection_name in self._loaded:
+            return True
+        with self._load_lock:
+            if collection_name in self._loaded:
+                return True
+            if not self._connected:
+                self._connected = self.connect_to_milvus()
+                if not self._connected:
+                    return False
+            try:
+                collection = self.get_collection(collection_name)
+                if not collection:
+                    logger.error(f"集合 {collection_name} 不存在")
+                    return False
+                collection.load()
+                self._loaded.add(collection_name)
+                logger.info(f"集合 {collection_name} 已加载")
+                return True
+            except Exception as e:
+                logger.error(f"加载集合 {collection_name} 失败: {e}")
+                return False
+
+    def load_collections(self, collection_names: List[str]) -> Dict[str, bool]:
+        """启动时预加载集合，返回每个集合是否加载成功"""
+        return {name: self.ensure_loaded(name) for name in collection_names}
+
+    def mark_unloaded(self, collection_name):
+        """集合被重建或释放后调用，下次检索前重新加载"""
+        self._loaded.discard(collection_name)
+
+    def release_collection(self, collection_name):
+        """释放集合占用的内存"""
+        collection = self.get_collection(collection_name)
+        if collection:
+            collection.release()
+        self.mark_unloaded(collection_name)
+
+    def is_ready(self, collection_names: List[str]) -> bool:
+        """集合是否均已加载，用于就绪检查"""
+        return all(name in self._loaded for name in collection_names)
+
+    def get_index_type(self, collection_name) -> str:
+        """集合embedding字段的索引类型，读取失败时使用配置MILVUS_INDEX_TYPE"""
+        if collection_name not in self._index_types:
+            index_type = settings.MILVUS_INDEX_TYPE
+            collection = self.get_collection(collection_name)
+            try:
+                for index in collection.indexes if collection else []:
+                    if index.field_name == "embedding":
+                        index_type = index.params.get("index_type", index_type)
+            except Exception as e:
+                logger.warning(f"读取集合 {collection_name} 的索引类型失败: {e}，使用配置 {index_type}")
+            self._index_types[collection_name] = index_type
+        return self._index_types[collection_name]
+
+    def get_embedding_store(self, collection_name) -> EmbeddingStore:
+        """集合对应的浮点向量存储，用于有损索引的重排"""
+        if collection_name not in self._embedding_stores:
+            self._embedding_stores[collection_name] = EmbeddingStore(os.path.join(self.embedding_store_dir, collection_name))
+        return self._embedding_stores[collection_name]
+
+    def get_vector_dim(self, collection_name) -> Optional[int]:
+        """集合embedding字段的维度，集合不存在时返回None"""
+        collection = self.get_collection(collection_name)
+        if not collection:
+            return None
+        return next((field.params["dim"] for field in collection.schema.fields if field.name == "embedding"), None)
+
+    def get_projector(self, collection_name, model_path: Optional[str] = None) -> Optional[EmbeddingProjector]:
+        """
+        集合对应的降维投影，检索前把全维查询向量投影到集合的维度
+        投影文件由入库/迁移脚本按集合名保存；没有投影文件，或集合已按全维重建（维度与投影不一致）时返回None
+
+        Args:
+            model_path: 当前嵌入模型路径，与拟合投影时的模型不一致时报错
+        """
+        if collection_name not in self._projectors:
+            path = projection_path(self.projection_dir, collection_name)
+            projector = EmbeddingProjector.load(path, model_path) if os.path.exists(path) else None
+            if projector is not None and projector.dim != self.get_vector_dim(collection_name):
+                logger.warning(f"集合 {collection_name} 的维度与降维投影({projector.dim}维)不一致，按全维向量检索: {path}")
+                projector = None
+            self._projectors[collection_name] = projector
+        return self._projectors[collection_name]
+
+    def create_collection(self, fields, collection_name, description, index_type: Optional[str] = None):
         """
         创建集合
         需要外部传输fields和collection_name和description
+        index_type为向量索引类型（见SUPPORTED_INDEX_TYPES），为None时使用配置MILVUS_INDEX_TYPE；
+        二值索引要求fields中的embedding字段为BINARY_VECTOR，可用embedding_field()生成
         """
+        index_type = index_type or settings.MILVUS_INDEX_TYPE
+        index_params = vector_index_params(index_type)
         if self.check_collection_exists(collection_name):
             logger.info(f"集合 {collection_name} 已存在")
             return self.get_collection(collection_name)
@@ -59,19 +216,13 @@ class VectorStore:
         # 创建集合
         collection = Collection(collection_name, schema=schema)
         self.collections[collection_name] = collection
+        self.mark_unloaded(collection_name)
+        self._index_types[collection_name] = index_type
         
         # 创建向量索引 (embedding字段)
-        vector_index_params = {
-            "metric_type": "COSINE",  # 余弦相似度
-            "index_type": "HNSW",     # 高效的近似最近邻搜索
-            "params": {
-                "M": 16,              # HNSW图中每个节点的最大边数
-                "efConstruction": 200 # 构建时的搜索宽度
-            }
-        }
         try:
-            collection.create_index(field_name="embedding", index_params=vector_index_params)
-            logger.info(f"已为字段 embedding 创建向量索引")
+            collection.create_index(field_name="embedding", index_params=index_params)
+            logger.info(f"已为字段 embedding 创建 {index_type} 向量索引")
         except Exception as e:
             logger.warning(f"创建 embedding 向量索引失败: {e}")
         
@@ -99,6 +250,7 @@ class VectorStore:
             insert_result = collection.insert(entities)
             collection.flush()
             logger.info(f"成功插入 {len(entities)} 条数据到集合 {collection_name}")
+            notify_chunks_changed(getattr(insert_result, "primary_keys", None))
             return insert_result
         except Exception as e:
             logger.error(f"插入数据失败: {e}")
@@ -115,6 +267,7 @@ class VectorStore:
             expr = f"id in {ids}"
             collection.delete(expr)
             logger.info(f"成功删除集合 {collection_name} 中 ID 为 {ids} 的向量")
+            notify_chunks_changed(str(i) for i in ids)
             return True
         except Exception as e:
             logger.error(f"删除向量失败: {e}")
@@ -126,7 +279,12 @@ class VectorStore:
             utility.drop_collection(collection_name)
             if collection_name in self.collections:
                 del self.collections[collection_name]
+            self.mark_unloaded(collection_name)
+            self._index_types.pop(collection_name, None)
+            self._embedding_stores.pop(collection_name, None)
+            self._projectors.pop(collection_name, None)
             logger.info(f"已删除集合 {collection_name}")
+            notify_chunks_changed()
             return True
         return False
     
@@ -151,54 +309,133 @@ class VectorStore:
                       query_embedding: list, 
                       limit: int = 10, 
                       output_fields: Optional[list] = None,
-                      expr: Optional[str] = None):
-        """搜索向量"""
-        collection = self.get_collection(collection_name)
-        if not collection:
-            logger.error(f"集合 {collection_name} 不存在")
+                      expr: Optional[str] = None,
+                      profile: Optional[str] = None):
+        """搜索向量，profile为检索档位（见MILVUS_SEARCH_PROFILES），为None时使用默认档位"""
+        return self.search_vectors_batch(collection_name, [query_embedding], limit, output_fields, expr, profile)[0]
+
+    def search_vectors_batch(self, collection_name: str,
+                             query_embeddings: List[list],
+                             limit: int = 10,
+                             output_fields: Optional[list] = None,
+                             expr: Optional[str] = None,
+                             profile: Optional[str] = None,
+                             rescore_embeddings: Optional[List[list]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        批量搜索向量，多个查询向量在一次请求中检索，由Milvus并行处理
+        profile为检索档位（见MILVUS_SEARCH_PROFILES），为None时使用默认档位
+
+        查询向量始终为浮点向量：二值索引的集合在检索前二值化；
+        有损索引（RESCORE_INDEX_TYPES）存在浮点向量存储时，先多取候选，再按原始向量的余弦相似度重排
+
+        Args:
+            rescore_embeddings: 与query_embeddings一一对应的全维查询向量，集合存储的是降维向量时传入，
+                                任意索引类型都在检索后用浮点向量存储中的全维向量重排
+
+        Returns:
+            与query_embeddings一一对应的结果列表；搜索失败时每个查询的结果均为空列表
+        """
+        if not query_embeddings:
             return []
-        
-        # 加载集合
-        collection.load()
+        empty = [[] for _ in query_embeddings]
+        # 集合只在首次检索或重建/释放后加载一次
+        if not self.ensure_loaded(collection_name):
+            return empty
+        collection = self.get_collection(collection_name)
         
         # 设置默认输出字段
         if output_fields is None:
             output_fields = ["id", "content", "document_name", "chapter", "section"]
         
-        # 搜索参数
-        search_params = {
-            "metric_type": "COSINE",
-            "params": {"ef": 100}  # 搜索时的候选集大小
-        }
-        
-        try:
-            results = collection.search(
-                data=[query_embedding], 
+        index_type = self.get_index_type(collection_name)
+        store = self.get_embedding_store(collection_name)
+        rescore = (index_type in RESCORE_INDEX_TYPES or rescore_embeddings is not None) and store.exists()
+        search_limit = limit * settings.MILVUS_RESCORE_FACTOR if rescore else limit
+        binary = index_type in BINARY_INDEX_TYPES
+        data = binarize_embeddings(query_embeddings) if binary else query_embeddings
+        search_params = self.search_params(index_type, profile, search_limit)
+
+        def search():
+            return collection.search(
+                data=data, 
                 anns_field="embedding", 
                 param=search_params,
-                limit=limit,
+                limit=search_limit,
                 output_fields=output_fields,
                 expr=expr
             )
+        
+        try:
+            try:
+                results = search()
+            except Exception as e:
+                # 集合在其他进程中被释放时，重新加载后重试一次
+                if "not loaded" not in str(e).lower():
+                    raise
+                logger.warning(f"集合 {collection_name} 未加载，重新加载后重试")
+                self.mark_unloaded(collection_name)
+                if not self.ensure_loaded(collection_name):
+                    return empty
+                results = search()
             
-            # 处理结果
-            search_results = []
-            for hits in results:
-                for hit in hits:
-                    result = {
-                        'uuid': hit.id,
-                        'score': hit.score,
-                    }
-                    for field in output_fields:
-                        if field != "id":
-                            result[field] = hit.entity.get(field)
-                    
-                    search_results.append(result)
-            
-            return search_results
+            # 处理结果，每个查询向量对应一组hits
+            batch_results = [self._parse_hits(hits, output_fields) for hits in results]
+            if rescore:
+                return [store.rescore(query_embedding, hits, limit)
+                        for query_embedding, hits in zip(rescore_embeddings or query_embeddings, batch_results)]
+            if binary:
+                # 没有浮点向量存储时，汉明距离换算为[-1, 1]的近似余弦相似度，与其他索引的score方向一致
+                bits = len(data[0]) * 8
+                for hits in batch_results:
+                    for hit in hits:
+                        hit["score"] = 1.0 - 2.0 * hit["score"] / bits
+            return batch_results
         except Exception as e:
             logger.error(f"搜索失败: {e}")
-            return []
+            return empty
+
+    @staticmethod
+    def search_ef(profile: Optional[str], limit: int) -> int:
+        """
+        检索档位对应的ef，HNSW要求ef不小于返回数量，不足时取limit
+
+        未知档位记录警告并使用默认档位
+        """
+        profiles = settings.MILVUS_SEARCH_PROFILES
+        profile = profile or settings.MILVUS_SEARCH_PROFILE
+        if profile not in profiles:
+            logger.warning(f"未知的检索档位 {profile}，使用默认档位 {settings.MILVUS_SEARCH_PROFILE}")
+            profile = settings.MILVUS_SEARCH_PROFILE
+        return max(profiles[profile], limit)
+
+    @classmethod
+    def search_params(cls, index_type: str, profile: Optional[str], limit: int) -> Dict[str, Any]:
+        """
+        按索引类型和检索档位生成搜索参数
+        HNSW使用ef，IVF使用nprobe（不超过nlist），BIN_FLAT为暴力检索，无额外参数
+        """
+        if index_type in BINARY_INDEX_TYPES:
+            return {"metric_type": "HAMMING", "params": {}}
+        if index_type.startswith("IVF"):
+            profiles = settings.MILVUS_IVF_SEARCH_PROFILES
+            nprobe = profiles.get(profile or settings.MILVUS_SEARCH_PROFILE, profiles[settings.MILVUS_SEARCH_PROFILE])
+            return {"metric_type": "COSINE", "params": {"nprobe": min(nprobe, settings.MILVUS_IVF_NLIST)}}
+        return {"metric_type": "COSINE", "params": {"ef": cls.search_ef(profile, limit)}}  # 搜索时的候选集大小
+
+    @staticmethod
+    def _parse_hits(hits, output_fields: list) -> List[Dict[str, Any]]:
+        """将单个查询向量的hits转换为结果字典列表"""
+        search_results = []
+        for hit in hits:
+            result = {
+                'uuid': hit.id,
+                'score': hit.score,
+            }
+            for field in output_fields:
+                if field != "id":
+                    result[field] = hit.entity.get(field)
+            search_results.append(result)
+        return search_results
         
 
 if __name__ == "__main__":
@@ -6,6 +6,7 @@
 import os
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
 import torch
 from transformers import AutoTokenizer, AutoModel
 import numpy as np
@@ -22,44 +23,77 @@ class BGEEmbedding:
     def __init__(self):
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model_path = settings.EMBEDDING_MODEL_PATH
+        self._batcher = None
+        self.cache = None
+        if settings.EMBEDDING_CACHE_ENABLED:
+            from app.models.Embeddings.embedding_cache import EmbeddingCache
+            self.cache = EmbeddingCache(self.model_path)
         print(self.model_path)
         try:
     
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_path, local_files_only=True)
-            self.model = AutoModel.from_pretrained(self.model_path, local_files_only=True)
+            self.onnx_session = None
+            self.model = None
 
-            # 如果有GPU，将模型移到GPU上
-            if torch.cuda.is_available():
-                self.model = self.model.to("cuda")
+            if settings.INFERENCE_BACKEND == "onnx":
+                # 使用onnxruntime推理，不加载torch模型
+                from app.models.onnx_backend import OnnxModelSession, ensure_onnx_model
+                onnx_path = ensure_onnx_model(self.model_path, "embedding")
+                if onnx_path is not None:
+                    self.onnx_session = OnnxModelSession(onnx_path)
+            # ONNX模型与当前模型不一致时回退到torch推理
+            if self.onnx_session is None:
+                self.model = AutoModel.from_pretrained(self.model_path, local_files_only=True)
+
+                # 如果有GPU，将模型移到GPU上
+                if torch.cuda.is_available():
+                    self.model = self.model.to("cuda")
             
             self.is_initialized = True
-            logger.info(f"词向量器初始化成功: {self.model_path}")
+            logger.info(f"词向量器初始化成功: {self.model_path}，推理后端: {'onnx' if self.onnx_session is not None else 'torch'}")
         except Exception as e:
             logger.error(f"初始化词向量器失败: {e}")
             self.is_initialized = False
 
-    def encode(self, texts, batch_size=32, normalize=True):
+    def encode(self, texts, batch_size=32, normalize=True, sort_by_length=False, max_tokens_per_batch=None, show_progress=False):
         """
-        将文本编码为向量
+        将文本编码为向量，单个字符串输入会先查询向量缓存
         
         参数:
             texts: 字符串或字符串列表
             batch_size: 批处理大小
             normalize: 是否对向量进行L2归一化
+            sort_by_length: 是否按token长度排序后分批，适合长度差异大的大批量文本（如全量法条重新向量化）
+            max_tokens_per_batch: 排序分批时每批的token预算(最长长度 x 文本数)，为None时使用配置EMBEDDING_TOKEN_BUDGET
+            show_progress: 是否显示进度条
             
         返回:
             如果输入是单个字符串，返回对应的向量（一维numpy数组）
-            如果输入是字符串列表，返回包含所有向量的二维numpy数组
+            如果输入是字符串列表，返回包含所有向量的二维numpy数组，顺序与输入一致
         """
+        # 单条查询先查向量缓存
+        use_cache = isinstance(texts, str) and normalize and self.cache is not None
+        if use_cache:
+            cached = self.cache.get(texts)
+            if cached is not None:
+                return cached
+            vector = self.encode([texts], batch_size, normalize)[0]
+            self.cache.set(texts, vector)
+            return vector
+
         # 处理单个字符串输入的情况
         single_input = False
         if isinstance(texts, str):
             texts = [texts]
             single_input = True
+
+        if sort_by_length:
+            result = self._encode_sorted(texts, normalize, max_tokens_per_batch or settings.EMBEDDING_TOKEN_BUDGET, show_progress)
+            return result[0] if single_input else result
             
         embeddings = []
         
-        for i in range(0, len(texts), batch_size):
+        for i in tqdm(range(0, len(texts), batch_size), desc="向量化进度", unit="batch", disable=not show_progress):
             batch_texts = texts[i:i+batch_size]
             
             # 编码
@@ -69,18 +103,8 @@ class BGEEmbedding:
                 truncation=True, 
                 max_length=512, 
                 return_tensors='pt'
-            ).to(self.device)
-            
-            # 计算嵌入
-            with torch.no_grad():
-                model_output = self.model(**encoded_input)
-                batch_embeddings = model_output.last_hidden_state[:, 0]
-                
-                # 归一化
-                if normalize:
-                    batch_embeddings = torch.nn.functional.normalize(batch_embeddings, p=2, dim=1)
-                
-                embeddings.append(batch_embeddings.cpu().numpy())
+            )
+            embeddings.append(self._embed_batch(encoded_input, normalize))
         
         result = np.vstack(embeddings)
         print(result)
@@ -92,6 +116,99 @@ class BGEEmbedding:
      
             
         return result
+
+    def _embed_batch(self, encoded_input, normalize=True):
+        """对已分词、padding后的一批输入计算CLS向量"""
+        if self.onnx_session is not None:
+            batch_embeddings = self.onnx_session.run(encoded_input).astype(np.float32)
+            if normalize:
+                norms = np.linalg.norm(batch_embeddings, axis=1, keepdims=True)
+                batch_embeddings = batch_embeddings / np.maximum(norms, 1e-12)
+            return batch_embeddings
+
+        encoded_input = encoded_input.to(self.device)
+        with torch.no_grad():
+            model_output = self.model(**encoded_input)
+            batch_embeddings = model_output.last_hidden_state[:, 0]
+            
+            # 归一化
+            if normalize:
+                batch_embeddings = torch.nn.functional.normalize(batch_embeddings, p=2, dim=1)
+            
+            return batch_embeddings.cpu().numpy()
+
+    def _encode_sorted(self, texts, normalize, max_tokens_per_batch, show_progress=False):
+        """
+        按token长度排序、按token预算分批的向量化
+
+        输入按长度顺序分批，每批只padding到相近的长度，避免短文本被padding到512；
+        批大小由token预算决定，短文本批次更大、长文本批次更小；最后按原始顺序返回
+        """
+        if not texts:
+            return np.empty((0, settings.EMBEDDING_DIMENSION), dtype=np.float32)
+
+        # 一次性分词（不padding）获取长度
+        encodings = self.tokenizer(texts, truncation=True, max_length=512)
+        lengths = [len(ids) for ids in encodings["input_ids"]]
+        # 从长到短，显存/内存峰值出现在最开始的批次
+        order = sorted(range(len(texts)), key=lambda i: lengths[i], reverse=True)
+
+        batches = []
+        current = []
+        for idx in order:
+            # 降序排列，批内最长的是第一个元素
+            if current and lengths[current[0]] * (len(current) + 1) > max_tokens_per_batch:
+                batches.append(current)
+                current = []
+            current.append(idx)
+        if current:
+            batches.append(current)
+
+        result = None
+        for batch in tqdm(batches, desc="向量化进度", unit="batch", disable=not show_progress):
+            features = [{key: encodings[key][i] for key in encodings.keys()} for i in batch]
+            encoded_input = self.tokenizer.pad(features, padding=True, return_tensors='pt')
+            batch_embeddings = self._embed_batch(encoded_input, normalize)
+            if result is None:
+                result = np.empty((len(texts), batch_embeddings.shape[1]), dtype=batch_embeddings.dtype)
+            # 写回原始位置，恢复输入顺序
+            result[batch] = batch_embeddings
+
+        return result
+
+    async def aencode(self, texts, batch_size=32, normalize=True):
+        """
+        encode的异步版本，在推理执行器中计算，不阻塞事件循环
+        单个字符串输入会经过微批处理器，与其他并发请求合并为一个批次计算
+        参数和返回值同encode
+        """
+        if isinstance(texts, str) and normalize:
+            cached = self.cache.get(texts) if self.cache is not None else None
+            if cached is not None:
+                return cached
+            if settings.EMBEDDING_MICRO_BATCHING:
+                vector = await self._get_batcher().submit(texts)
+                if self.cache is not None:
+                    self.cache.set(texts, vector)
+                return vector
+        from app.core.registry import get_inference_executor
+        return await get_inference_executor().run(self.encode, texts, batch_size, normalize)
+
+    def _get_batcher(self):
+        """懒加载查询向量化微批处理器"""
+        if self._batcher is None:
+            from app.models.micro_batcher import MicroBatcher
+            self._batcher = MicroBatcher(
+                process_batch=lambda batch_texts: list(self.encode(batch_texts, batch_size=len(batch_texts))),
+                max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+                max_latency_ms=settings.EMBEDDING_BATCH_MAX_LATENCY_MS,
+                name="embedding"
+            )
+        return self._batcher
+
+    def get_batching_stats(self):
+        """获取查询向量化微批处理的批大小统计"""
+        return self._batcher.get_stats() if self._batcher else {}
     
 if __name__ == "__main__":
     embedding = BGEEmbedding()
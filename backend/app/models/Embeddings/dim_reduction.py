@@ -0,0 +1,140 @@
+'''
+嵌入向量降维
+
+Milvus中的向量维度决定了ANN索引的内存和检索耗时。EmbeddingProjector把BGE输出的全维向量
+投影到低维（如256/512）后再写入和检索Milvus，检索后由浮点向量存储中的全维向量精确重排，
+召回损失集中在候选阶段，最终排序不受影响。
+
+两种投影方式：
+- pca: 在入库语料的全维向量上拟合PCA，适用于任意嵌入模型
+- truncate: 直接取前N维，仅适用于Matryoshka方式训练的模型
+
+投影矩阵由scripts/vector_index.py或scripts/migrate_vector_index.py在入库时拟合，按集合名保存到EMBEDDING_PROJECTION_DIR，
+附带嵌入模型路径用于加载时校验；服务端检索时由VectorStore.get_projector()加载所检索集合的投影。
+
+使用方式:
+projector = EmbeddingProjector.fit_pca(embeddings, 256, model_path)
+projector.save(projection_path(projection_dir, collection_name))
+reduced = EmbeddingProjector.load(projection_path(projection_dir, collection_name)).transform(embeddings)
+'''
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+import logging
+from typing import Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+REDUCTION_METHODS = ("pca", "truncate")
+
+
+def projection_path(projection_dir: str, collection_name: str) -> str:
+    """集合对应的投影文件路径，每个集合在自己的语料上拟合投影，互不覆盖"""
+    return os.path.join(projection_dir, f"{collection_name}.npz")
+
+
+class EmbeddingProjector:
+    """全维向量到低维向量的线性投影，投影后重新归一化，检索仍使用余弦相似度"""
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray, method: str = "pca", model_path: str = ""):
+        """
+        Args:
+            mean: [full_dim] 投影前减去的均值
+            components: [dim, full_dim] 投影矩阵，每行一个主成分
+            method: 投影方式，见REDUCTION_METHODS
+            model_path: 拟合时使用的嵌入模型路径
+        """
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+        self.method = method
+        self.model_path = model_path
+
+    @property
+    def dim(self) -> int:
+        return self.components.shape[0]
+
+    @property
+    def full_dim(self) -> int:
+        return self.components.shape[1]
+
+    @classmethod
+    def fit_pca(cls, embeddings, dim: int, model_path: str = "") -> "EmbeddingProjector":
+        """
+        在语料向量上拟合PCA
+
+        协方差矩阵只有full_dim x full_dim，十万级语料也可以直接特征分解
+
+        Args:
+            embeddings: [n, full_dim] 已归一化的语料向量
+            dim: 降维后的维度
+            model_path: 嵌入模型路径，保存后用于加载时校验
+        """
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if dim >= vectors.shape[1]:
+            raise ValueError(f"降维后的维度({dim})需小于原始维度({vectors.shape[1]})")
+        mean = vectors.mean(axis=0)
+        centered = vectors - mean
+        covariance = centered.T @ centered / max(len(vectors) - 1, 1)
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        order = np.argsort(eigenvalues)[::-1][:dim]
+        explained = float(eigenvalues[order].sum() / eigenvalues.sum())
+        logger.info(f"PCA拟合完成: {vectors.shape[1]} -> {dim} 维，样本数: {len(vectors)}，解释方差比例: {explained:.4f}")
+        return cls(mean, eigenvectors[:, order].T, "pca", model_path)
+
+    @classmethod
+    def truncation(cls, full_dim: int, dim: int, model_path: str = "") -> "EmbeddingProjector":
+        """取前dim维的投影（Matryoshka模型）"""
+        if dim >= full_dim:
+            raise ValueError(f"降维后的维度({dim})需小于原始维度({full_dim})")
+        return cls(np.zeros(full_dim, dtype=np.float32), np.eye(dim, full_dim, dtype=np.float32), "truncate", model_path)
+
+    @classmethod
+    def fit(cls, embeddings, dim: int, method: str = "pca", model_path: str = "") -> "EmbeddingProjector":
+        """按投影方式构建投影"""
+        if method == "pca":
+            return cls.fit_pca(embeddings, dim, model_path)
+        if method == "truncate":
+            return cls.truncation(np.asarray(embeddings).shape[1], dim, model_path)
+        raise ValueError(f"不支持的降维方式: {method}，可选: {REDUCTION_METHODS}")
+
+    def transform(self, embeddings) -> np.ndarray:
+        """
+        投影并归一化
+
+        Args:
+            embeddings: [full_dim] 或 [n, full_dim]
+
+        Returns:
+            与输入形状对应的 [dim] 或 [n, dim] float32
+        """
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        single = vectors.ndim == 1
+        reduced = (np.atleast_2d(vectors) - self.mean) @ self.components.T
+        reduced /= np.maximum(np.linalg.norm(reduced, axis=1, keepdims=True), 1e-12)
+        return reduced[0] if single else reduced
+
+    def save(self, path: str):
+        """保存投影矩阵"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(path, mean=self.mean, components=self.components, method=np.array(self.method),
+                 model_path=np.array(self.model_path))
+        logger.info(f"降维投影已保存: {path}，{self.full_dim} -> {self.dim} 维")
+
+    @classmethod
+    def load(cls, path: str, model_path: Optional[str] = None) -> "EmbeddingProjector":
+        """
+        加载投影矩阵
+
+        Args:
+            path: 投影文件路径
+            model_path: 当前嵌入模型路径，与拟合时的模型不一致时报错，避免用错误的投影检索
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"降维投影不存在，请先运行入库脚本拟合: {path}")
+        data = np.load(path)
+        projector = cls(data["mean"], data["components"], str(data["method"]), str(data["model_path"]))
+        if model_path and projector.model_path and projector.model_path != model_path:
+            raise ValueError(f"降维投影由其他嵌入模型拟合({projector.model_path})，与当前模型({model_path})不一致: {path}")
+        logger.info(f"降维投影加载成功: {path}，{projector.full_dim} -> {projector.dim} 维")
+        return projector
@@ -0,0 +1,141 @@
+'''
+查询向量缓存
+
+相同或近似相同的问题（如"注册公司需要什么材料"）每次都会重新向量化。
+向量缓存位于BGEEmbedding.encode之前：
+1. 进程内LRU缓存（容量有界）
+2. 可选的Redis二级缓存，多个worker/进程共享
+
+缓存键由模型路径和规范化后的查询文本共同决定，更换模型后自动失效；
+缓存值以float16/float32字节串紧凑存储
+'''
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+import hashlib
+import logging
+import re
+import unicodedata
+from typing import Any, Dict, Optional
+import numpy as np
+from app.core.config import settings
+from app.core.lru_cache import TTLLRUCache
+
+logger = logging.getLogger(__name__)
+
+# 规范化时去掉的结尾标点
+_TRAILING_PUNCTUATION = "？?。.！!；;，,、 "
+
+
+def normalize_query(text: str) -> str:
+    """
+    规范化查询文本：全角转半角、统一大小写、合并空白、去掉结尾标点
+
+    Args:
+        text: 原始查询
+
+    Returns:
+        规范化后的查询
+    """
+    text = unicodedata.normalize("NFKC", text or "")
+    text = re.sub(r"\s+", " ", text).strip().lower()
+    return text.rstrip(_TRAILING_PUNCTUATION)
+
+
+class EmbeddingCache:
+    """查询向量的两级缓存：进程内LRU + 可选Redis"""
+
+    def __init__(
+        self,
+        model_path: str,
+        max_size: Optional[int] = None,
+        ttl: Optional[int] = None,
+        dtype: Optional[str] = None,
+        use_redis: Optional[bool] = None
+    ):
+        """
+        初始化向量缓存
+
+        Args:
+            model_path: 嵌入模型路径，参与缓存键计算
+            max_size: 进程内缓存最大条目数
+            ttl: 缓存有效期（秒），0表示不过期
+            dtype: 存储精度，"float16" 或 "float32"
+            use_redis: 是否启用Redis二级缓存
+        """
+        self.model_path = model_path
+        self.ttl = settings.EMBEDDING_CACHE_TTL if ttl is None else ttl
+        self.dtype = np.dtype(dtype or settings.EMBEDDING_CACHE_DTYPE)
+        self.memory = TTLLRUCache(
+            max_size=max_size or settings.EMBEDDING_CACHE_SIZE,
+            ttl=self.ttl
+        )
+        self.redis = None
+        self.redis_hits = 0
+        if settings.EMBEDDING_CACHE_USE_REDIS if use_redis is None else use_redis:
+            self._connect_redis()
+
+    def _connect_redis(self):
+        """连接Redis，失败时只使用进程内缓存"""
+        try:
+            import redis
+            self.redis = redis.Redis(
+                host=settings.REDIS_HOST,
+                port=int(settings.REDIS_PORT),
+                socket_timeout=0.1,
+                socket_connect_timeout=0.5
+            )
+            self.redis.ping()
+            logger.info("向量缓存Redis二级缓存连接成功")
+        except Exception as e:
+            logger.warning(f"向量缓存连接Redis失败，仅使用进程内缓存: {e}")
+            self.redis = None
+
+    def _key(self, text: str) -> str:
+        """缓存键：模型路径 + 规范化文本的摘要"""
+        digest = hashlib.sha1(f"{self.model_path}\x00{normalize_query(text)}".encode("utf-8")).hexdigest()
+        return f"emb:{digest}"
+
+    def _encode_value(self, vector: np.ndarray) -> bytes:
+        return np.asarray(vector).astype(self.dtype).tobytes()
+
+    def _decode_value(self, value: bytes) -> np.ndarray:
+        return np.frombuffer(value, dtype=self.dtype).astype(np.float32)
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """
+        查询缓存
+
+        Returns:
+            命中时返回float32向量，未命中返回None
+        """
+        key = self._key(text)
+        value = self.memory.get(key)
+        if value is None and self.redis is not None:
+            try:
+                value = self.redis.get(key)
+            except Exception as e:
+                logger.warning(f"读取Redis向量缓存失败: {e}")
+                value = None
+            if value is not None:
+                self.redis_hits += 1
+                # 回填进程内缓存
+                self.memory.set(key, value)
+        return self._decode_value(value) if value is not None else None
+
+    def set(self, text: str, vector: np.ndarray):
+        """写入缓存"""
+        key = self._key(text)
+        value = self._encode_value(vector)
+        self.memory.set(key, value)
+        if self.redis is not None:
+            try:
+                self.redis.set(key, value, ex=self.ttl or None)
+            except Exception as e:
+                logger.warning(f"写入Redis向量缓存失败: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        stats = self.memory.get_stats()
+        stats["redis_hits"] = self.redis_hits
+        return stats
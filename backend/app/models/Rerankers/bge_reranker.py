@@ -1,5 +1,5 @@
 # app/rag/reranker.py
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 import torch
 from transformers import AutoModelForSequenceClassification, AutoTokenizer
 import os
@@ -30,6 +30,7 @@ class BAAIReranker:
     def __init__(self):
         model_path = settings.RERANKER_MODEL_PATH
         self.model_path = model_path
+        self._batcher = None
         self.initialize_reranker()
         
     def initialize_reranker(self):
@@ -37,14 +38,25 @@ class BAAIReranker:
         try:
     
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_path, local_files_only=True)
-            self.model = AutoModelForSequenceClassification.from_pretrained(self.model_path, local_files_only=True)
+            self.onnx_session = None
+            self.model = None
+
+            if settings.INFERENCE_BACKEND == "onnx":
+                # 使用onnxruntime推理，不加载torch模型
+                from app.models.onnx_backend import OnnxModelSession, ensure_onnx_model
+                onnx_path = ensure_onnx_model(self.model_path, "reranker")
+                if onnx_path is not None:
+                    self.onnx_session = OnnxModelSession(onnx_path)
+            # ONNX模型与当前模型不一致时回退到torch推理
+            if self.onnx_session is None:
+                self.model = AutoModelForSequenceClassification.from_pretrained(self.model_path, local_files_only=True)
 
             # 如果有GPU，将模型移到GPU上
             # if torch.cuda.is_available():
             #     self.model = self.model.to("cuda")
             
             self.is_initialized = True
-            logger.info(f"BAAI重排序器初始化成功: {self.model_path}")
+            logger.info(f"BAAI重排序器初始化成功: {self.model_path}，推理后端: {'onnx' if self.onnx_session is not None else 'torch'}")
         except Exception as e:
             logger.error(f"初始化BAAI重排序器失败: {e}")
             self.is_initialized = False
@@ -71,31 +83,129 @@ class BAAIReranker:
             text_pairs.append([query, doc["content"]])
             
         # 计算相关性分数
+        scores = self.compute_scores(text_pairs)
+        return self._select_top_k(documents, scores, top_k)
+
+    def compute_scores(self, text_pairs: List[List[str]]) -> List[float]:
+        """
+        计算[query, doc]文本对的相关性分数
+
+        先按token长度排序，再按单批文本对数量和token预算切分批次，
+        长度相近的文本对放在同一批，减少padding带来的无效计算；结果按输入顺序返回
+
+        Args:
+            text_pairs: [query, doc内容]文本对列表，可以来自不同的查询
+
+        Returns:
+            与text_pairs顺序一致的分数列表
+        """
+        if not text_pairs:
+            return []
+
+        # 不padding地分词，用于获取长度并按长度分桶
+        encodings = self.tokenizer(
+            [pair[0] for pair in text_pairs],
+            [pair[1] for pair in text_pairs],
+            truncation=True,
+            max_length=512
+        )
+        lengths = [len(ids) for ids in encodings["input_ids"]]
+        order = sorted(range(len(text_pairs)), key=lambda i: lengths[i])
+
+        max_pairs = settings.RERANK_BATCH_MAX_PAIRS
+        token_budget = settings.RERANK_BATCH_TOKEN_BUDGET
+        buckets = []
+        current = []
+        for idx in order:
+            # 升序排列，加入当前文本对后整批都会padding到lengths[idx]
+            if current and (len(current) >= max_pairs or lengths[idx] * (len(current) + 1) > token_budget):
+                buckets.append(current)
+                current = []
+            current.append(idx)
+        if current:
+            buckets.append(current)
+
+        scores = [0.0] * len(text_pairs)
         with torch.no_grad():
-            inputs = self.tokenizer(
-                text_pairs, 
-                padding=True,
-                truncation=True,
-                return_tensors="pt",
-                max_length=512
-            )
-            
-            if torch.cuda.is_available():
-                inputs = {k: v.to("cuda") for k, v in inputs.items()}
-                
-            outputs = self.model(**inputs)
-            scores = outputs.logits.squeeze(-1).cpu().tolist()
-            
+            for bucket in buckets:
+                features = [{key: encodings[key][i] for key in encodings.keys()} for i in bucket]
+                inputs = self.tokenizer.pad(features, padding=True, return_tensors="pt")
+
+                if self.onnx_session is not None:
+                    bucket_scores = self.onnx_session.run(inputs).reshape(-1).astype(float).tolist()
+                else:
+                    if torch.cuda.is_available():
+                        inputs = {k: v.to("cuda") for k, v in inputs.items()}
+
+                    outputs = self.model(**inputs)
+                    bucket_scores = outputs.logits.view(-1).float().cpu().tolist()
+                for i, score in zip(bucket, bucket_scores):
+                    scores[i] = score
+
+        return scores
+
+    def _select_top_k(self, documents: List[Dict[str, Any]], scores: List[float], top_k: int) -> List[Dict[str, Any]]:
+        """按分数排序并返回top_k文档"""
         scored_docs = [(doc, score) for doc, score in zip(documents, scores)]
         scored_docs.sort(key=lambda x: x[1], reverse=True)
         
-        # 取top_k结果
+        # 取top_k结果，附带重排序分数（原始logit），供反思阶段按分数过滤
         reranked_results = []
         for doc, score in scored_docs[:top_k]:
-            result = {}
-            result['doc'] = doc.copy()
+            result = doc.copy()
             result["reranker_score"] = score
             reranked_results.append(result)
             
-        return [result['doc'] for result in reranked_results]
+        return reranked_results
+
+    async def arerank(self, query: str, documents: List[Dict[str, Any]], top_k: int = 10) -> List[Dict[str, Any]]:
+        """
+        rerank的异步版本，在推理执行器中计算，不阻塞事件循环
+        开启微批处理时，与其他并发查询的文本对合并到同一批前向计算中
+        参数和返回值同rerank
+        """
+        if not self.is_initialized or not documents:
+            return documents[:top_k]
+        if settings.RERANK_MICRO_BATCHING:
+            scores = await self._get_batcher().submit((query, documents))
+            return self._select_top_k(documents, scores, top_k)
+        from app.core.registry import get_inference_executor
+        return await get_inference_executor().run(self.rerank, query, documents, top_k)
+
+    def _score_requests(self, requests: List[Tuple[str, List[Dict[str, Any]]]]) -> List[List[float]]:
+        """
+        微批处理函数：合并多个查询的文本对统一计算，再按请求拆分分数
+
+        Args:
+            requests: (query, documents)列表
+
+        Returns:
+            每个请求对应的分数列表
+        """
+        text_pairs = []
+        for query, documents in requests:
+            text_pairs.extend([query, doc["content"]] for doc in documents)
+        scores = self.compute_scores(text_pairs)
+
+        results = []
+        offset = 0
+        for _, documents in requests:
+            results.append(scores[offset:offset + len(documents)])
+            offset += len(documents)
+        return results
+
+    def _get_batcher(self):
+        """懒加载跨请求重排序微批处理器"""
+        if self._batcher is None:
+            from app.models.micro_batcher import MicroBatcher
+            self._batcher = MicroBatcher(
+                process_batch=self._score_requests,
+                max_batch_size=settings.RERANK_BATCH_MAX_REQUESTS,
+                max_latency_ms=settings.RERANK_BATCH_MAX_LATENCY_MS,
+                name="reranker"
+            )
+        return self._batcher
 
+    def get_batching_stats(self):
+        """获取重排序微批处理的批大小统计（按请求数计）"""
+        return self._batcher.get_stats() if self._batcher else {}
@@ -0,0 +1,69 @@
+'''
+模型推理执行器
+
+BGE嵌入和重排序的前向计算是同步的torch调用，直接在异步节点中执行会阻塞整个事件循环。
+推理执行器使用专用线程池执行这些计算，并通过有界队列限制排队中的请求数量，
+对外提供可await的接口，推理进行时其他对话请求仍可继续处理。
+
+使用方式:
+result = await executor.run(model.encode, texts)
+'''
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceExecutor:
+    """专用线程池 + 有界队列的模型推理执行器"""
+
+    def __init__(self, max_workers: Optional[int] = None, max_queue_size: Optional[int] = None):
+        """
+        初始化推理执行器
+
+        Args:
+            max_workers: 推理线程数，torch前向计算会释放GIL，CPU上通常1个线程配合torch内部并行即可
+            max_queue_size: 最大排队请求数，超过后新请求等待空位（背压）
+        """
+        self.max_workers = max_workers or settings.INFERENCE_MAX_WORKERS
+        self.max_queue_size = max_queue_size or settings.INFERENCE_QUEUE_SIZE
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="model-inference"
+        )
+        # 正在执行和排队中的请求总数上限
+        self._slots = asyncio.Semaphore(self.max_workers + self.max_queue_size)
+        self.pending = 0
+        logger.info(f"推理执行器初始化完成，线程数: {self.max_workers}，队列长度: {self.max_queue_size}")
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        在推理线程池中执行同步函数
+
+        Args:
+            func: 同步推理函数，如BGEEmbedding.encode
+            *args, **kwargs: 传给func的参数
+
+        Returns:
+            func的返回值
+        """
+        if self._slots.locked():
+            logger.debug(f"推理队列已满({self.pending}个请求)，等待空位")
+        async with self._slots:
+            self.pending += 1
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+            finally:
+                self.pending -= 1
+
+    def shutdown(self, wait: bool = True):
+        """关闭线程池"""
+        self._executor.shutdown(wait=wait)
@@ -2,13 +2,64 @@ import os
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 import httpx
+import json
 import logging
 import asyncio
-from typing import Dict, Any, Optional, List, Union
+from typing import Dict, Any, Optional, List, Union, AsyncIterator
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# 进程级共享的HTTP连接池，所有LLMService实例复用，避免每次调用都重新进行TCP+TLS握手
+_http_client: Optional[httpx.AsyncClient] = None
+# 创建连接池时的事件循环，连接绑定在该循环上，不能跨循环复用（如评估脚本多次调用asyncio.run）
+_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _http2_available() -> bool:
+    """检查是否可以启用HTTP/2（httpx需要h2依赖）"""
+    if not settings.LLM_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("未安装h2，LLM连接池回退到HTTP/1.1")
+        return False
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    获取共享的异步HTTP客户端，首次调用或事件循环变化时创建
+    需在事件循环中调用；原事件循环已结束时，其上的连接无法再关闭或复用，直接丢弃旧客户端
+
+    Returns:
+        长连接复用的httpx.AsyncClient
+    """
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client.is_closed or _http_client_loop is not loop:
+        limits = httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY
+        )
+        _http_client = httpx.AsyncClient(http2=_http2_available(), limits=limits)
+        _http_client_loop = loop
+        logger.info("LLM HTTP连接池初始化完成")
+    return _http_client
+
+
+async def close_http_client():
+    """关闭共享的HTTP客户端，在应用关闭时调用"""
+    global _http_client, _http_client_loop
+    if _http_client is not None and not _http_client.is_closed and _http_client_loop is asyncio.get_running_loop():
+        await _http_client.aclose()
+        logger.info("LLM HTTP连接池已关闭")
+    _http_client = None
+    _http_client_loop = None
+
+
 class LLMService:
     """
     大语言模型服务类，负责处理与LLM的交互
@@ -109,23 +160,24 @@ class LLMService:
         }
         
         try:
-            # 发送请求
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    self.api_url,
-                    headers=headers,
-                    json=request_data
-                )
-                
-                # 检查响应状态
-                if response.status_code != 200:
-                    logger.error(f"API请求失败: {response.status_code}, {response.text}")
-                    return f"API请求失败: {response.status_code}"
-                
-                # 解析响应 - 只针对火山引擎格式
-                response_data = response.json()
-                return response_data.get("choices", [{}])[0].get("message", {}).get("content", "")
-                
+            # 发送请求，复用共享连接池
+            client = get_http_client()
+            response = await client.post(
+                self.api_url,
+                headers=headers,
+                json=request_data,
+                timeout=self.timeout
+            )
+            
+            # 检查响应状态
+            if response.status_code != 200:
+                logger.error(f"API请求失败: {response.status_code}, {response.text}")
+                return f"API请求失败: {response.status_code}"
+            
+            # 解析响应 - 只针对火山引擎格式
+            response_data = response.json()
+            return response_data.get("choices", [{}])[0].get("message", {}).get("content", "")
+            
         except Exception as e:
             logger.exception(f"调用模型API时发生错误: {str(e)}")
             return f"调用模型API时发生错误: {str(e)}"
@@ -163,26 +215,121 @@ class LLMService:
         }
         
         try:
-            # 发送请求
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    self.api_url,
-                    headers=headers,
-                    json=request_data
-                )
-                
-                # 检查响应状态
-                if response.status_code != 200:
-                    logger.error(f"API请求失败: {response.status_code}, {response.text}")
-                    return {"error": f"API请求失败: {response.status_code}"}
-                
-                # 返回完整响应
-                return response.json()
-                
+            # 发送请求，复用共享连接池
+            client = get_http_client()
+            response = await client.post(
+                self.api_url,
+                headers=headers,
+                json=request_data,
+                timeout=self.timeout
+            )
+            
+            # 检查响应状态
+            if response.status_code != 200:
+                logger.error(f"API请求失败: {response.status_code}, {response.text}")
+                return {"error": f"API请求失败: {response.status_code}"}
+            
+            # 返回完整响应
+            return response.json()
+            
         except Exception as e:
             logger.exception(f"调用模型API时发生错误: {str(e)}")
             return {"error": str(e)}
 
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: str = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """
+        流式生成文本响应，逐个产出增量文本
+        
+        Args:
+            prompt: 用户输入的提示词
+            system_prompt: 系统提示词，用于设置模型行为
+            **kwargs: 其他参数，如temperature, max_tokens等
+            
+        Yields:
+            模型生成的增量文本
+        """
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        
+        async for delta in self.stream_chat_completion(messages, **kwargs):
+            yield delta
+    
+    async def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """
+        以stream=true调用聊天完成API，解析SSE数据块并产出增量文本
+        
+        Args:
+            messages: 消息列表
+            **kwargs: 其他参数
+            
+        Yields:
+            每个数据块中的增量文本(delta.content)
+            
+        Raises:
+            httpx.HTTPStatusError: API返回非200状态码时抛出
+        """
+        # 合并默认参数和自定义参数
+        params = self.default_params.copy()
+        params.update(kwargs)
+        
+        # 构建请求头
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        
+        # 构建请求体
+        request_data = {
+            "model": self.model,
+            "messages": messages,
+            **params,
+            "stream": True
+        }
+        
+        client = get_http_client()
+        async with client.stream(
+            "POST",
+            self.api_url,
+            headers=headers,
+            json=request_data,
+            timeout=self.timeout
+        ) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                logger.error(f"流式API请求失败: {response.status_code}, {body.decode('utf-8', errors='ignore')}")
+                response.raise_for_status()
+            
+            async for line in response.aiter_lines():
+                # SSE格式: "data: {...}"，以"data: [DONE]"结束
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if not data:
+                    continue
+                if data == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(data)
+                except json.JSONDecodeError:
+                    logger.warning(f"无法解析的流式数据块: {data}")
+                    continue
+                choices = chunk.get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
 
 def get_llm_service(
     model: str = None,
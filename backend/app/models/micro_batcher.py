@@ -0,0 +1,138 @@
+'''
+动态微批处理器
+
+并发请求各自只携带一条输入时（如每轮对话只向量化一个查询），逐条做batch=1的前向计算会浪费算力。
+微批处理器收集并发提交的请求，凑满max_batch_size或最早的请求等待超过max_latency_ms后，
+合并为一个批次在推理执行器中计算，再把结果分发回各请求的future。
+
+使用方式:
+batcher = MicroBatcher(process_batch=lambda texts: model.encode(texts), max_batch_size=32, max_latency_ms=5)
+vector = await batcher.submit("查询文本")
+'''
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+import asyncio
+import logging
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """收集并发请求、合并批量计算并分发结果"""
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 32,
+        max_latency_ms: float = 5.0,
+        name: str = "micro_batcher",
+        stats_log_interval: int = 100
+    ):
+        """
+        初始化微批处理器
+
+        Args:
+            process_batch: 同步批处理函数，输入为请求列表，返回与输入等长、顺序一致的结果列表
+            max_batch_size: 单批最大请求数
+            max_latency_ms: 批次中最早的请求最多等待的毫秒数
+            name: 名称，用于日志
+            stats_log_interval: 每处理多少个批次输出一次批大小统计
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000.0
+        self.name = name
+        self.stats_log_interval = stats_log_interval
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # 批大小统计
+        self.batch_count = 0
+        self.item_count = 0
+        self.batch_size_histogram: Counter = Counter()
+
+    def _ensure_worker(self):
+        """在当前事件循环中启动后台聚合任务（首次提交或事件循环变化时）"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        """
+        提交单个请求并等待其结果
+
+        Args:
+            item: 单个输入
+
+        Returns:
+            该输入对应的处理结果
+        """
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect_batch(self) -> List[Tuple[Any, asyncio.Future]]:
+        """阻塞等待第一个请求，然后在截止时间前尽量凑满一个批次"""
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+            except asyncio.TimeoutError:
+                break
+        # 丢弃调用方已取消（如超时）的请求
+        return [(item, future) for item, future in batch if not future.cancelled()]
+
+    async def _run(self):
+        """后台任务：循环聚合批次、计算并分发结果"""
+        from app.core.registry import get_inference_executor
+        executor = get_inference_executor()
+        while True:
+            batch = await self._collect_batch()
+            if not batch:
+                continue
+            items = [item for item, _ in batch]
+            try:
+                results = await executor.run(self.process_batch, items)
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                logger.error(f"{self.name}批处理失败: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            self._record_batch(len(batch))
+
+    def _record_batch(self, size: int):
+        """记录批大小统计并定期输出"""
+        self.batch_count += 1
+        self.item_count += size
+        self.batch_size_histogram[size] += 1
+        if self.batch_count % self.stats_log_interval == 0:
+            logger.info(f"{self.name}批处理统计: {self.get_stats()}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取批大小统计
+
+        Returns:
+            批次数、请求数、平均批大小和批大小分布
+        """
+        return {
+            "batch_count": self.batch_count,
+            "item_count": self.item_count,
+            "avg_batch_size": self.item_count / self.batch_count if self.batch_count else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_size_histogram.items()))
+        }
@@ -0,0 +1,227 @@
+'''
+ONNX Runtime推理后端
+
+CPU节点上PyTorch fp32推理较慢，可将BGE嵌入模型和重排序模型导出为ONNX，
+可选int8动态量化，使用onnxruntime并配置intra-op线程数进行推理。
+通过配置INFERENCE_BACKEND="onnx"启用，BGEEmbedding和BAAIReranker会自动切换后端。
+
+支持能力：
+导出模型: def export_to_onnx(model_path: str, output_path: str, task: str) -> str
+动态量化: def quantize_onnx(onnx_path: str, output_path: str) -> str
+获取模型路径: def get_onnx_model_path(task: str, quantized: bool) -> str
+来源校验: def onnx_model_matches(onnx_path: str, model_path: str) -> bool
+推理会话: class OnnxModelSession, run(inputs) -> np.ndarray
+'''
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+import json
+import logging
+from typing import Dict, Optional
+import numpy as np
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# backend目录，ONNX_MODEL_DIR为相对路径时相对于此目录，服务端和scripts/下的导出脚本读写同一位置
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+
+# 任务类型与模型输出
+# embedding: 输出CLS向量(未归一化)，形状[batch, dim]
+# reranker: 输出相关性logits，形状[batch, 1]
+TASK_OUTPUTS = {
+    "embedding": "embedding",
+    "reranker": "logits",
+}
+
+
+def get_onnx_model_path(task: str, quantized: Optional[bool] = None) -> str:
+    """
+    获取任务对应的ONNX模型文件路径
+
+    Args:
+        task: "embedding" 或 "reranker"
+        quantized: 是否使用int8量化模型，为None时使用配置ONNX_QUANTIZE
+
+    Returns:
+        ONNX模型文件路径
+    """
+    quantized = settings.ONNX_QUANTIZE if quantized is None else quantized
+    filename = "model.int8.onnx" if quantized else "model.onnx"
+    return os.path.join(BACKEND_DIR, settings.ONNX_MODEL_DIR, task, filename)
+
+
+def _source_path(onnx_path: str) -> str:
+    """ONNX模型旁记录来源模型路径的文件"""
+    return onnx_path + ".source.json"
+
+
+def _write_source(onnx_path: str, model_path: str):
+    """记录导出该ONNX模型的源模型路径"""
+    with open(_source_path(onnx_path), "w", encoding="utf-8") as f:
+        json.dump({"model_path": model_path}, f, ensure_ascii=False)
+
+
+def onnx_model_matches(onnx_path: str, model_path: str) -> bool:
+    """
+    ONNX模型是否由model_path导出
+    微调后模型路径改变，旧的ONNX模型不能继续使用；没有来源记录的模型无法确认，同样视为不一致
+    """
+    try:
+        with open(_source_path(onnx_path), "r", encoding="utf-8") as f:
+            source = json.load(f).get("model_path")
+    except (OSError, ValueError):
+        source = None
+    if source != model_path:
+        logger.warning(f"ONNX模型由其他模型导出({source})，与当前模型({model_path})不一致: {onnx_path}")
+        return False
+    return True
+
+
+def export_to_onnx(model_path: str, output_path: str, task: str, opset_version: int = 14) -> str:
+    """
+    将HuggingFace模型导出为ONNX，batch和序列长度为动态维度
+
+    Args:
+        model_path: 本地模型目录
+        output_path: 导出的ONNX文件路径
+        task: "embedding" 或 "reranker"
+        opset_version: ONNX算子集版本
+
+    Returns:
+        导出的ONNX文件路径
+    """
+    import torch
+    from transformers import AutoTokenizer, AutoModel, AutoModelForSequenceClassification
+
+    if task not in TASK_OUTPUTS:
+        raise ValueError(f"不支持的任务类型: {task}")
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+    if task == "embedding":
+        model = AutoModel.from_pretrained(model_path, local_files_only=True)
+    else:
+        model = AutoModelForSequenceClassification.from_pretrained(model_path, local_files_only=True)
+    model.eval()
+
+    dummy = tokenizer(["公司注册需要哪些材料"], ["有限责任公司由股东出资设立"], return_tensors="pt")
+    input_names = list(dummy.keys())
+    output_name = TASK_OUTPUTS[task]
+
+    class _ExportWrapper(torch.nn.Module):
+        """按名称传参并只输出需要的张量，避免导出整个last_hidden_state"""
+
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, *args):
+            outputs = self.inner(**dict(zip(input_names, args)))
+            if task == "embedding":
+                return outputs.last_hidden_state[:, 0]
+            return outputs.logits
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes[output_name] = {0: "batch"}
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            _ExportWrapper(model),
+            tuple(dummy[name] for name in input_names),
+            output_path,
+            input_names=input_names,
+            output_names=[output_name],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset_version,
+        )
+    _write_source(output_path, model_path)
+    logger.info(f"已导出ONNX模型: {output_path}")
+    return output_path
+
+
+def quantize_onnx(onnx_path: str, output_path: str) -> str:
+    """
+    对ONNX模型进行int8动态量化（权重量化，激活在运行时量化）
+
+    Args:
+        onnx_path: fp32 ONNX模型路径
+        output_path: 量化后模型路径
+
+    Returns:
+        量化后模型路径
+    """
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    quantize_dynamic(onnx_path, output_path, weight_type=QuantType.QInt8)
+    # 量化模型与fp32模型来源相同
+    with open(_source_path(onnx_path), "r", encoding="utf-8") as f:
+        _write_source(output_path, json.load(f)["model_path"])
+    logger.info(f"已完成int8动态量化: {output_path}")
+    return output_path
+
+
+def ensure_onnx_model(model_path: str, task: str, quantized: Optional[bool] = None) -> Optional[str]:
+    """
+    确保ONNX模型存在，不存在时从HuggingFace模型导出（需要torch）
+
+    Returns:
+        可用的ONNX模型路径；已有的ONNX模型由其他模型导出时返回None，由调用方回退到torch推理，
+        需要重新运行scripts/onnx_export.py导出
+    """
+    quantized = settings.ONNX_QUANTIZE if quantized is None else quantized
+    target_path = get_onnx_model_path(task, quantized)
+    if os.path.exists(target_path):
+        return target_path if onnx_model_matches(target_path, model_path) else None
+
+    fp32_path = get_onnx_model_path(task, quantized=False)
+    if os.path.exists(fp32_path) and not onnx_model_matches(fp32_path, model_path):
+        return None
+    if not os.path.exists(fp32_path):
+        logger.info(f"未找到ONNX模型，开始从 {model_path} 导出")
+        export_to_onnx(model_path, fp32_path, task)
+    if quantized:
+        quantize_onnx(fp32_path, target_path)
+    return target_path
+
+
+class OnnxModelSession:
+    """onnxruntime推理会话封装"""
+
+    def __init__(self, onnx_path: str, intra_op_threads: Optional[int] = None):
+        """
+        初始化推理会话
+
+        Args:
+            onnx_path: ONNX模型路径
+            intra_op_threads: 算子内并行线程数，为0或None时使用onnxruntime默认值
+        """
+        import onnxruntime as ort
+
+        intra_op_threads = settings.ONNX_INTRA_OP_THREADS if intra_op_threads is None else intra_op_threads
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(onnx_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = [node.name for node in self.session.get_inputs()]
+        self.onnx_path = onnx_path
+        logger.info(f"ONNX推理会话初始化成功: {onnx_path}，intra-op线程数: {intra_op_threads or '默认'}")
+
+    def run(self, inputs: Dict[str, object]) -> np.ndarray:
+        """
+        执行推理
+
+        Args:
+            inputs: 分词器输出，值可以是torch张量或numpy数组；模型不需要的输入会被忽略
+
+        Returns:
+            模型的唯一输出
+        """
+        feed = {}
+        for name in self.input_names:
+            value = inputs[name]
+            if hasattr(value, "cpu"):
+                value = value.cpu().numpy()
+            feed[name] = np.asarray(value, dtype=np.int64)
+        return self.session.run(None, feed)[0]
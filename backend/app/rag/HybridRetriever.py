@@ -4,14 +4,30 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../.
 from app.rag.dense_search import DenseSearch
 from app.rag.sparse_search import SparseSearch
 from app.rag.reranker import Reranker
-from typing import List, Dict, Any, Optional
+from app.core.config import settings
+from app.core.lru_cache import TTLLRUCache
+from app.db.index_events import get_index_generation, subscribe
+from app.models.Embeddings.embedding_cache import normalize_query
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Hashable
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# 检索结果缓存：索引版本不变时，同一查询和检索配置的结果是确定的
+# 键中包含索引版本号，ES update_index / Milvus insert_vectors 后旧结果不再命中；
+# 同时在变更通知时清空，及时释放内存
+_result_cache = TTLLRUCache(max_size=settings.RETRIEVAL_CACHE_SIZE, ttl=settings.CACHE_EXPIRATION)
+subscribe(lambda uuids: _result_cache.clear())
 
 class HybridRetriever:
-    def __init__(self,use_dense=True,use_sparse=True,use_rerank=True):
+    def __init__(self,use_dense=True,use_sparse=True,use_rerank=True,use_cache=None):
     
         self.use_dense = use_dense
         self.use_sparse = use_sparse
         self.use_rerank = use_rerank
+        self.use_cache = settings.RETRIEVAL_CACHE_ENABLED if use_cache is None else use_cache
         self.dense_searcher = DenseSearch()
         self.sparse_searcher = SparseSearch()
         self.reranker = Reranker()
@@ -19,6 +35,8 @@ class HybridRetriever:
         self.RRF_top_k = 20
         self.dense_top_k = 20
         self.sparse_top_k = 20
+        self.dense_timeout = settings.DENSE_SEARCH_TIMEOUT
+        self.sparse_timeout = settings.SPARSE_SEARCH_TIMEOUT
 
 
     def RRF(self, dense_results: List[Dict[str, Any]], sparse_results: List[Dict[str, Any]],
@@ -95,15 +113,244 @@ class HybridRetriever:
 
 
 
-    def hybridRetrieve(self,query:str,top_k:int):
+    def hybridRetrieve(self,query:str,top_k:int,search_profile:Optional[str]=None):
+        """search_profile: 稠密检索的检索档位（见MILVUS_SEARCH_PROFILES），为None时使用默认档位"""
+        cached = self._get_cached(query, top_k, search_profile)
+        if cached is not None:
+            return cached
+        depth = self._cache_depth(top_k)
+        results = self._hybridRetrieve(query, depth, search_profile=search_profile)
+        self._set_cached(query, depth, results, search_profile)
+        return results[:top_k]
+
+    def hybridRetrieveBatch(self, queries: List[str], top_k: int,
+                            search_profile: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        """
+        批量混合检索，供评估等一次处理多个查询的场景使用
+
+        未命中缓存的查询一次向量化、在一次Milvus请求中完成稠密检索，
+        稀疏检索、RRF融合与重排序仍逐个查询进行
+
+        Returns:
+            与queries一一对应的结果列表
+        """
+        results = [self._get_cached(query, top_k, search_profile) for query in queries]
+        missing = [i for i, cached in enumerate(results) if cached is None]
+        if missing:
+            depth = self._cache_depth(top_k)
+            dense_batch = [None] * len(missing)
+            if self.use_dense:
+                dense_batch = self.dense_searcher.search_batch(
+                    [queries[i] for i in missing], self.dense_top_k if self.use_sparse else depth, search_profile)
+            for i, dense_results in zip(missing, dense_batch):
+                results[i] = self._hybridRetrieve(queries[i], depth, dense_results)
+                self._set_cached(queries[i], depth, results[i], search_profile)
+        return [r[:top_k] for r in results]
+
+    def _hybridRetrieve(self,query:str,top_k:int,dense_results:Optional[List[Dict[str, Any]]]=None,search_profile:Optional[str]=None):
+        """dense_results: 已批量完成的稠密检索结果，为None时在此检索"""
         if not self.use_dense:
             return self.sparse_searcher.search(query,top_k)
+        if dense_results is None:
+            dense_results = self.dense_searcher.search(query,top_k if not self.use_sparse else self.dense_top_k,search_profile)
         if not self.use_sparse:
-            return self.dense_searcher.search(query,top_k)
+            return dense_results[:top_k]
         if not self.use_rerank:
-            return self.RRF(self.dense_searcher.search(query,self.dense_top_k),self.sparse_searcher.search(query,self.sparse_top_k),self.RRF_alpha,top_k)
+            return self.RRF(dense_results,self.sparse_searcher.search(query,self.sparse_top_k),self.RRF_alpha,top_k)
         else:
-            return self.reranker.rerank(query,self.RRF(self.dense_searcher.search(query,self.dense_top_k),self.sparse_searcher.search(query,self.sparse_top_k),self.RRF_alpha,self.RRF_top_k),top_k)
+            return self.reranker.rerank(query,self.RRF(dense_results,self.sparse_searcher.search(query,self.sparse_top_k),self.RRF_alpha,self.RRF_top_k),top_k)
+
+    def _cache_key(self, query: str, search_profile: Optional[str] = None) -> Hashable:
+        """缓存键：规范化查询 + 检索配置（含检索档位） + 索引版本号，不含top_k"""
+        return (
+            normalize_query(query),
+            self.use_dense, self.use_sparse, self.use_rerank,
+            self.RRF_alpha, self.RRF_top_k, self.dense_top_k, self.sparse_top_k,
+            search_profile or settings.MILVUS_SEARCH_PROFILE,
+            get_index_generation()
+        )
+
+    def _cache_depth(self, top_k: int) -> int:
+        """
+        缓存的候选列表长度
+
+        重排序只在RRF_top_k个候选中排序，取max(top_k, RRF_top_k)后，
+        同一查询后续更小的top_k都可以直接截取缓存列表
+        """
+        return max(top_k, self.RRF_top_k)
+
+    def _get_cached(self, query: str, top_k: int, search_profile: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """命中且缓存列表不短于top_k时返回结果副本"""
+        if not self.use_cache:
+            return None
+        entry = _result_cache.get(self._cache_key(query, search_profile))
+        if entry is None or entry["depth"] < top_k:
+            return None
+        return [dict(doc) for doc in entry["results"][:top_k]]
+
+    def _set_cached(self, query: str, depth: int, results: List[Dict[str, Any]], search_profile: Optional[str] = None):
+        """写入缓存，空结果不缓存；异步检索降级时由调用方跳过，避免固化不完整的结果"""
+        if not self.use_cache or not results:
+            return
+        _result_cache.set(self._cache_key(query, search_profile), {"depth": depth, "results": [dict(doc) for doc in results]})
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取检索结果缓存的命中统计"""
+        return _result_cache.get_stats()
+
+    async def _run_leg(self, name: str, leg: Awaitable[List[Dict[str, Any]]], timeout: float) -> List[Dict[str, Any]]:
+        """
+        执行单路检索，带独立超时
+
+        超时或异常时返回空列表，由调用方使用另一路的结果继续，保证部分可用
+        """
+        start_time = time.time()
+        try:
+            results = await asyncio.wait_for(leg, timeout=timeout)
+            logger.debug(f"{name}检索完成，耗时: {time.time() - start_time:.3f}秒，结果数: {len(results)}")
+            return results
+        except asyncio.TimeoutError:
+            logger.warning(f"{name}检索超时({timeout}秒)，使用部分结果继续")
+            return []
+        except Exception as e:
+            logger.error(f"{name}检索失败: {e}，使用部分结果继续")
+            return []
+
+    def _dense_leg(self, query: str, top_k: int, search_profile: Optional[str] = None) -> Awaitable[List[Dict[str, Any]]]:
+        """稠密检索：向量化走推理执行器，不阻塞事件循环"""
+        return self._run_leg("dense", self.dense_searcher.asearch(query, top_k, search_profile), self.dense_timeout)
+
+    async def _dense_batch_leg(self, texts: List[str], top_k: int,
+                               search_profile: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        """批量稠密检索：多个文本在一次Milvus请求中检索，超时或失败时每个文本的结果均为空列表"""
+        results = await self._run_leg("dense", self.dense_searcher.asearch_batch(texts, top_k, search_profile), self.dense_timeout)
+        return results or [[] for _ in texts]
+
+    def _sparse_leg(self, query: str, top_k: int) -> Awaitable[List[Dict[str, Any]]]:
+        """稀疏检索：异步ES客户端，不占用线程"""
+        return self._run_leg("sparse", self.sparse_searcher.asearch(query, top_k), self.sparse_timeout)
+
+    async def ahybridRetrieve(self, query: str, top_k: int, search_profile: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        异步混合检索，稠密检索与稀疏检索并发执行
+
+        检索阶段耗时约为max(dense, sparse)而非两者之和；
+        某一路超时或不可用时，仅使用另一路的结果进行融合和重排序；
+        模型推理(向量化、重排序)在推理执行器中进行，不阻塞事件循环；
+        search_profile为稠密检索的检索档位，为None时使用默认档位
+        """
+        cached = self._get_cached(query, top_k, search_profile)
+        if cached is not None:
+            return cached
+        depth = self._cache_depth(top_k)
+        results, degraded = await self._ahybridRetrieve(query, depth, search_profile)
+        if not degraded:
+            self._set_cached(query, depth, results, search_profile)
+        return results[:top_k]
+
+    async def _ahybridRetrieve(self, query: str, top_k: int, search_profile: Optional[str] = None):
+        """返回(结果列表, 是否降级)，降级指某一路检索超时或失败"""
+        if not self.use_dense:
+            results = await self._sparse_leg(query, top_k)
+            return results, not results
+        if not self.use_sparse:
+            results = await self._dense_leg(query, top_k, search_profile)
+            return results, not results
+
+        candidates, degraded = await self._afuse(query, top_k if not self.use_rerank else self.RRF_top_k,
+                                                 search_profile=search_profile)
+        if not self.use_rerank:
+            return candidates, degraded
+        return await self.reranker.arerank(query, candidates, top_k), degraded
+
+    async def _afuse(self, query: str, top_k: int, on_dense: Callable[[List[Dict[str, Any]]], None] = None,
+                     search_profile: Optional[str] = None):
+        """
+        稠密与稀疏检索并发执行后RRF融合，返回(融合结果, 是否降级)
+        on_dense: 稠密检索完成时立即以其结果回调，不等待稀疏检索
+        """
+        dense_results, sparse_results = await asyncio.gather(
+            self._notify(self._dense_leg(query, self.dense_top_k, search_profile), on_dense),
+            self._sparse_leg(query, self.sparse_top_k)
+        )
+        degraded = not dense_results or not sparse_results
+        return self.RRF(dense_results, sparse_results, self.RRF_alpha, top_k), degraded
+
+    async def _notify(self, leg: Awaitable[List[Dict[str, Any]]], callback: Optional[Callable]) -> List[Dict[str, Any]]:
+        """单路检索完成后回调其结果"""
+        results = await leg
+        if callback is not None:
+            callback(results)
+        return results
+
+    async def afuse_candidates(self, query: str,
+                               on_dense: Callable[[List[Dict[str, Any]]], None] = None,
+                               search_profile: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        获取重排序前的候选列表，供需要在重排序前合并其他检索结果的调用方使用（如HyDE）
+
+        Args:
+            query: 查询
+            on_dense: 稠密检索完成时以其结果回调，调用方可据此提前决策（如是否跳过HyDE）
+            search_profile: 稠密检索的检索档位，为None时使用默认档位
+
+        Returns:
+            RRF融合后的前RRF_top_k个候选；未启用稀疏检索时为稠密检索结果
+        """
+        if not self.use_dense:
+            return await self._sparse_leg(query, self.sparse_top_k)
+        if not self.use_sparse:
+            return await self._notify(self._dense_leg(query, self.dense_top_k, search_profile), on_dense)
+        candidates, _ = await self._afuse(query, self.RRF_top_k, on_dense, search_profile)
+        return candidates
+
+    async def adense_search(self, text: str, top_k: int = None, search_profile: Optional[str] = None) -> List[Dict[str, Any]]:
+        """单独执行稠密检索（带超时，失败时返回空列表）"""
+        return await self._dense_leg(text, top_k or self.dense_top_k, search_profile)
+
+    async def adense_search_batch(self, texts: List[str], top_k: int = None,
+                                  search_profile: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        """批量稠密检索（一次Milvus请求，带超时），返回与texts一一对应的结果列表"""
+        return await self._dense_batch_leg(texts, top_k or self.dense_top_k, search_profile)
+
+    async def afuse_with_dense_texts(self, query: str, texts: List[str], search_profile: Optional[str] = None):
+        """
+        获取原始查询的候选列表，同时对额外文本（如缓存的HyDE伪文档）做稠密检索
+
+        原始查询与额外文本的稠密检索合并为一次Milvus请求，与原始查询的稀疏检索并发执行
+
+        Returns:
+            (afuse_candidates同样的候选列表, 与texts一一对应的稠密检索结果)
+        """
+        if not self.use_dense:
+            return await self._sparse_leg(query, self.sparse_top_k), [[] for _ in texts]
+        if not self.use_sparse:
+            dense_batch = await self._dense_batch_leg([query, *texts], self.dense_top_k, search_profile)
+            return dense_batch[0], dense_batch[1:]
+        dense_batch, sparse_results = await asyncio.gather(
+            self._dense_batch_leg([query, *texts], self.dense_top_k, search_profile),
+            self._sparse_leg(query, self.sparse_top_k)
+        )
+        return self.RRF(dense_batch[0], sparse_results, self.RRF_alpha, self.RRF_top_k), dense_batch[1:]
+
+    async def amerge_and_rerank(self, query: str, candidates: List[Dict[str, Any]],
+                                extra_results: List[Dict[str, Any]], top_k: int,
+                                alpha: float = 0.5) -> List[Dict[str, Any]]:
+        """
+        将额外检索结果与候选列表RRF融合后，使用原始查询统一重排序一次
+
+        Args:
+            query: 原始查询，重排序以它为准
+            candidates: afuse_candidates返回的候选列表
+            extra_results: 额外的检索结果，如HyDE伪文档的稠密检索结果
+            top_k: 返回数量
+            alpha: candidates的权重
+        """
+        if extra_results:
+            candidates = self.RRF(candidates, extra_results, alpha, self.RRF_top_k)
+        if not self.use_rerank:
+            return candidates[:top_k]
+        return await self.reranker.arerank(query, candidates, top_k)
 
     
 
@@ -5,35 +5,198 @@ rag的基本模块
 import os
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
-from typing import List, Dict, Any, Optional, Callable
+from typing import List, Dict, Any, Optional, Callable, AsyncIterator
 import logging
 import asyncio
+import time
 from app.rag.HybridRetriever import HybridRetriever
 from app.rag.response_generator import Generator
 from app.core.config import settings
 from app.models.llm import get_llm_service, LLMService
 from app.rag.hyde import HyDEGenerator
-from app.rag.reflection import reflection_llm
+from app.rag.reflection import reflect
+from app.core.registry import get_embedding_model, get_semantic_cache, get_article_index
+from app.rag.article_index import expand_with_neighbours, cites_article
 
 logger = logging.getLogger(__name__)
 
 class RAGChain:
-    def __init__(self,use_dense:bool=True,use_sparse:bool=True,use_rerank:bool=True,llm_service:LLMService=None,use_hyde:bool=True):
+    def __init__(self,use_dense:bool=True,use_sparse:bool=True,use_rerank:bool=True,llm_service:LLMService=None,use_hyde:bool=True,use_semantic_cache:bool=None):
         self.use_dense = use_dense
         self.use_sparse = use_sparse
         self.use_rerank = use_rerank
         self.llm_service = llm_service
         self.use_hyde = use_hyde 
+        self.use_semantic_cache = settings.SEMANTIC_CACHE_ENABLED if use_semantic_cache is None else use_semantic_cache
         self.retriever = HybridRetriever(use_dense=use_dense,use_sparse=use_sparse,use_rerank=use_rerank)
         self.generator = Generator(llm_service=self.llm_service)
+        # HyDE伪文档只用于稠密检索，未启用稠密检索时不生成
+        self.hyde_generator = HyDEGenerator() if use_hyde and use_dense else None
+        self.hyde_timeout = settings.HYDE_TIMEOUT
+        self.use_article_expansion = settings.ARTICLE_EXPANSION_ENABLED
+        # 进行中的伪文档生成任务，保留引用避免被回收
+        self._hyde_generations = set()
 
-    async def rag_chain(self,query:str,top_k:int=10):
-        if self.use_hyde:
-            query = self.hyde_generator.generate_document(query)
-        retrieved_docs = self.retriever.hybridRetrieve(query,top_k)
-        reflection_response = await reflection_llm(query,retrieved_docs)
+    def _semantic_cache_options(self,query:str,top_k:int,reflection_mode:Optional[str],search_profile:Optional[str]) -> Dict[str, Any]:
+        """影响回答的请求选项，按生效值记录，只有选项相同的请求才能共用缓存的回答"""
+        return {
+            "top_k": top_k,
+            "reflection_mode": reflection_mode or settings.REFLECTION_MODE,
+            "search_profile": self._resolve_search_profile(query,search_profile) or settings.MILVUS_SEARCH_PROFILE,
+        }
+
+    async def _lookup_semantic_cache(self,query:str,options:Dict[str, Any]):
+        """
+        查询语义答案缓存
+        返回(查询向量, 缓存结果)，未启用缓存时查询向量为None
+        """
+        if not self.use_semantic_cache:
+            return None, None
+        # 与稠密检索使用同一查询文本，向量会进入向量缓存，不会重复计算
+        query_embedding = await get_embedding_model().aencode(query)
+        return query_embedding, await get_semantic_cache().alookup(query_embedding,options)
+
+    def _store_semantic_cache(self,query:str,query_embedding,response:Dict[str, Any],retrieved_docs:List[Dict[str, Any]],options:Dict[str, Any]):
+        """写入语义答案缓存，引用的法条为重排序后的全部候选"""
+        if query_embedding is not None:
+            get_semantic_cache().store(query,query_embedding,response,retrieved_docs,options)
+
+    def _resolve_search_profile(self,query:str,search_profile:Optional[str]) -> Optional[str]:
+        """
+        确定本次稠密检索的检索档位
+        请求指定时使用指定档位；查询明确引用法条编号时关键词检索已能精确命中，使用低ef档位；
+        否则返回None，使用默认档位
+        """
+        if search_profile:
+            return search_profile
+        if cites_article(query):
+            return settings.MILVUS_CITATION_SEARCH_PROFILE
+        return None
+
+    async def _retrieve(self,query:str,top_k:int,search_profile:Optional[str]=None) -> List[Dict[str, Any]]:
+        """检索并用相邻法条扩展排名靠前的命中法条"""
+        retrieved_docs = await self._retrieve_hits(query,top_k,self._resolve_search_profile(query,search_profile))
+        if not self.use_article_expansion:
+            return retrieved_docs
+        return expand_with_neighbours(
+            retrieved_docs,
+            get_article_index(),
+            top_n=settings.ARTICLE_EXPANSION_TOP_N,
+            window=settings.ARTICLE_EXPANSION_WINDOW
+        )
+
+    async def _retrieve_hits(self,query:str,top_k:int,search_profile:Optional[str]=None) -> List[Dict[str, Any]]:
+        """
+        检索阶段
+        启用HyDE时，原始查询的混合检索立即开始，与伪文档生成并行；
+        原始查询候选就绪后，在截止时间(hyde_timeout，从检索开始计算)内等待HyDE结果，
+        超时则只使用原始查询候选；两者RRF融合后用原始查询统一重排序一次
+
+        以下情况不调用LLM生成伪文档：
+        - 查询明确引用法条编号（关键词检索已能精确命中），直接走普通混合检索
+        - 伪文档缓存命中，缓存的伪文档与原始查询在同一次Milvus请求中检索
+        - 原始查询稠密检索的最高相似度已足够高，伪文档生成等稠密检索返回后再决定是否开始
+        """
+        if self.hyde_generator is None:
+            return await self.retriever.ahybridRetrieve(query,top_k,search_profile)
+
+        skip_reason = self.hyde_generator.skip_reason(query)
+        if skip_reason is not None:
+            self.hyde_generator.record_decision(query,skip_reason)
+            return await self.retriever.ahybridRetrieve(query,top_k,search_profile)
+
+        hypothetical_doc = self.hyde_generator.get_cached_document(query)
+        if hypothetical_doc is not None and hypothetical_doc != query:
+            self.hyde_generator.record_decision(query,"cached")
+            candidates,(hyde_results,) = await self.retriever.afuse_with_dense_texts(query,[hypothetical_doc],search_profile)
+            return await self.retriever.amerge_and_rerank(query,candidates,hyde_results,top_k,settings.HYDE_RRF_ALPHA)
+
+        start_time = time.time()
+        dense_ready = asyncio.get_running_loop().create_future()
+
+        def on_dense(dense_results):
+            if not dense_ready.done():
+                dense_ready.set_result(dense_results)
+
+        hyde_task = asyncio.create_task(self._hyde_search(query,dense_ready,search_profile))
+        try:
+            candidates = await self.retriever.afuse_candidates(query,on_dense=on_dense,search_profile=search_profile)
+        except BaseException:
+            hyde_task.cancel()
+            raise
+        finally:
+            on_dense([])
+
+        remaining = max(0.0, self.hyde_timeout - (time.time() - start_time))
+        try:
+            hyde_results = await asyncio.wait_for(hyde_task, timeout=remaining)
+        except asyncio.TimeoutError:
+            logger.warning(f"HyDE未在{self.hyde_timeout}秒内完成，仅使用原始查询的检索结果")
+            hyde_results = []
+        except Exception as e:
+            logger.error(f"HyDE检索失败: {e}，仅使用原始查询的检索结果")
+            hyde_results = []
+
+        return await self.retriever.amerge_and_rerank(query,candidates,hyde_results,top_k,settings.HYDE_RRF_ALPHA)
+
+    def _start_hyde_generation(self,query:str) -> asyncio.Task:
+        """
+        在后台生成伪文档
+        检索超时只取消对结果的等待，生成任务继续执行并写入伪文档缓存，后续相同查询可直接命中
+        """
+        task = asyncio.create_task(self.hyde_generator.generate_document(query,use_cache=False))
+        self._hyde_generations.add(task)
+        task.add_done_callback(self._hyde_generations.discard)
+        return task
+
+    async def _hyde_search(self,query:str,dense_ready:asyncio.Future,search_profile:Optional[str]=None) -> List[Dict[str, Any]]:
+        """
+        获取伪文档（缓存或生成）并用其进行稠密检索
+        缓存未命中时先等待原始查询的稠密检索结果，相似度足够高则跳过生成
+        """
+        hypothetical_doc = self.hyde_generator.get_cached_document(query)
+        if hypothetical_doc is not None:
+            self.hyde_generator.record_decision(query,"cached")
+        else:
+            skip_reason = self.hyde_generator.skip_reason(query,await dense_ready)
+            if skip_reason is not None:
+                self.hyde_generator.record_decision(query,skip_reason)
+                return []
+            self.hyde_generator.record_decision(query,"generated")
+            hypothetical_doc = await asyncio.shield(self._start_hyde_generation(query))
+        # 生成失败时generate_document返回原查询，原查询已经检索过
+        if not hypothetical_doc or hypothetical_doc == query:
+            return []
+        return await self.retriever.adense_search(hypothetical_doc,search_profile=search_profile)
+
+    async def rag_chain(self,query:str,top_k:int=10,reflection_mode:Optional[str]=None,search_profile:Optional[str]=None):
+        cache_options = self._semantic_cache_options(query,top_k,reflection_mode,search_profile)
+        query_embedding, cached_response = await self._lookup_semantic_cache(query,cache_options)
+        if cached_response is not None:
+            return cached_response
+        retrieved_docs = await self._retrieve(query,top_k,search_profile)
+        reflection_response = await reflect(query,retrieved_docs,reflection_mode)
         response = await self.generator.generate(query,reflection_response)
+        self._store_semantic_cache(query,query_embedding,response,retrieved_docs,cache_options)
         return response
+
+    async def rag_chain_stream(self,query:str,top_k:int=10,reflection_mode:Optional[str]=None,search_profile:Optional[str]=None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式RAG：检索（含并行HyDE）与反思完成后，逐个产出生成阶段的增量事件
+        事件格式见Generator.generate_stream；命中语义缓存时直接产出完整回答
+        """
+        cache_options = self._semantic_cache_options(query,top_k,reflection_mode,search_profile)
+        query_embedding, cached_response = await self._lookup_semantic_cache(query,cache_options)
+        if cached_response is not None:
+            yield {"type": "delta", "content": cached_response.get("answer", "")}
+            yield {"type": "done", **cached_response}
+            return
+        retrieved_docs = await self._retrieve(query,top_k,search_profile)
+        reflection_response = await reflect(query,retrieved_docs,reflection_mode)
+        async for event in self.generator.generate_stream(query,reflection_response):
+            if event["type"] == "done" and not event.get("error"):
+                self._store_semantic_cache(query,query_embedding,{"answer": event["answer"], "retrieved_docs": event["retrieved_docs"]},retrieved_docs,cache_options)
+            yield event
       
 
 # if __name__ == "__main__":
@@ -0,0 +1,191 @@
+'''
+法条顺序索引与相邻法条扩展
+
+法律问题的回答常常需要命中法条的前后条（第N-1条、第N+1条），而向量库和ES中的chunk彼此独立、没有顺序。
+入库时按文档记录法条顺序（文档 -> 有序的chunk列表，含条号），保存为JSON；
+检索后由ArticleIndex在内存中查找命中法条的相邻法条并补充到结果中，不需要额外的Milvus/ES请求。
+
+构建索引: ArticleIndex.build(chunks).save(path)
+加载索引: ArticleIndex.load(path)
+相邻法条: def neighbours(self, uuid: str, window: int = 1) -> List[Dict[str, Any]]
+结果扩展: def expand_with_neighbours(docs, index, top_n, window) -> List[Dict[str, Any]]
+'''
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_CHINESE_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4,
+                   "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_CHINESE_UNITS = {"十": 10, "百": 100, "千": 1000, "万": 10000}
+
+_ARTICLE_PATTERN = re.compile(r"^\s*第([零〇一二两三四五六七八九十百千万\d]+)条")
+_CITATION_PATTERN = re.compile(r"第[零〇一二两三四五六七八九十百千万\d]+条")
+
+# 相邻法条中保留的字段，与检索结果字段一致
+_ENTRY_FIELDS = ("uuid", "content", "document_name", "chapter", "section", "effective_date", "is_effective", "article_number")
+
+
+def chinese_to_int(text: str) -> Optional[int]:
+    """
+    将中文数字转换为整数，如"二十九" -> 29，"一百零五" -> 105，也支持阿拉伯数字
+
+    Returns:
+        转换结果，无法识别时返回None
+    """
+    if not text:
+        return None
+    if text.isdigit():
+        return int(text)
+    total, section, number = 0, 0, 0
+    for char in text:
+        if char in _CHINESE_DIGITS:
+            number = _CHINESE_DIGITS[char]
+        elif char in _CHINESE_UNITS:
+            unit = _CHINESE_UNITS[char]
+            if unit == 10000:
+                total += (section + number) * unit
+                section = 0
+            else:
+                # "十"开头时省略了"一"，如"十二"
+                section += (number or 1) * unit
+            number = 0
+        else:
+            return None
+    return total + section + number
+
+
+def parse_article_number(content: str) -> Optional[int]:
+    """从法条内容开头的"第X条"解析条号"""
+    match = _ARTICLE_PATTERN.match(content or "")
+    return chinese_to_int(match.group(1)) if match else None
+
+
+def cites_article(text: str) -> bool:
+    """文本中是否明确引用了法条编号，如“公司法第二十九条”"""
+    return bool(_CITATION_PATTERN.search(text or ""))
+
+
+class ArticleIndex:
+    """按文档组织的法条顺序索引"""
+
+    def __init__(self, documents: Optional[Dict[str, List[Dict[str, Any]]]] = None):
+        """
+        Args:
+            documents: 文档标识到有序法条列表的映射
+        """
+        self.documents = documents or {}
+        # uuid -> (文档标识, 在文档中的位置)
+        self._positions: Dict[str, Tuple[str, int]] = {
+            entry["uuid"]: (key, position)
+            for key, entries in self.documents.items()
+            for position, entry in enumerate(entries)
+        }
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    @staticmethod
+    def _document_key(metadata: Dict[str, Any]) -> str:
+        """同一法律的不同版本（生效日期不同）视为不同文档"""
+        return f"{metadata.get('document_name', '')}|{metadata.get('effective_date', '')}"
+
+    @classmethod
+    def build(cls, chunks: List[Dict[str, Any]]) -> "ArticleIndex":
+        """
+        根据入库的chunk构建索引
+
+        Args:
+            chunks: LegalDocumentProcessor输出的chunk列表，包含uuid、content和metadata；
+                    按metadata中的article_index排序，没有时按列表中的顺序
+        """
+        documents: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+        for order, chunk in enumerate(chunks):
+            metadata = chunk.get("metadata", {})
+            entry = {
+                "uuid": chunk["uuid"],
+                "content": chunk.get("content", ""),
+                "document_name": metadata.get("document_name", ""),
+                "chapter": metadata.get("chapter", ""),
+                "section": metadata.get("section", ""),
+                "effective_date": str(metadata.get("effective_date", "")),
+                "is_effective": metadata.get("is_effective", True),
+                "article_number": metadata.get("article_number") or parse_article_number(chunk.get("content", "")),
+            }
+            documents.setdefault(cls._document_key(metadata), []).append((metadata.get("article_index", order), entry))
+
+        index = cls({key: [entry for _, entry in sorted(items, key=lambda x: x[0])] for key, items in documents.items()})
+        logger.info(f"法条顺序索引构建完成，文档数: {len(index.documents)}，法条数: {len(index)}")
+        return index
+
+    def save(self, path: str):
+        """保存索引"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.documents, f, ensure_ascii=False)
+        logger.info(f"法条顺序索引已保存: {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "ArticleIndex":
+        """加载索引，文件不存在时返回空索引（扩展不生效）"""
+        if not os.path.exists(path):
+            logger.warning(f"法条顺序索引不存在，相邻法条扩展不生效: {path}")
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            index = cls(json.load(f))
+        logger.info(f"法条顺序索引加载成功: {path}，法条数: {len(index)}")
+        return index
+
+    def neighbours(self, uuid: str, window: int = 1) -> List[Dict[str, Any]]:
+        """
+        获取同一文档中前后window条法条
+
+        Returns:
+            相邻法条列表，按文档顺序排列，不包含法条本身
+        """
+        position = self._positions.get(uuid)
+        if position is None:
+            return []
+        key, i = position
+        entries = self.documents[key]
+        return [entries[j] for j in range(max(0, i - window), min(len(entries), i + window + 1)) if j != i]
+
+
+def expand_with_neighbours(docs: List[Dict[str, Any]], index: ArticleIndex,
+                           top_n: int = 3, window: int = 1) -> List[Dict[str, Any]]:
+    """
+    将前top_n个检索结果的相邻法条补充到结果中
+
+    相邻法条紧跟在命中法条之后，标记expanded_from为命中法条的uuid；
+    已在结果中的法条和已失效的法条不会重复加入
+
+    Args:
+        docs: 按相关性排序的检索结果
+        index: 法条顺序索引
+        top_n: 扩展的命中法条数
+        window: 每条命中法条前后扩展的条数
+    """
+    if not docs or not len(index) or top_n <= 0 or window <= 0:
+        return docs
+
+    seen = {doc.get("uuid") for doc in docs}
+    expanded = []
+    added = 0
+    for rank, doc in enumerate(docs):
+        expanded.append(doc)
+        if rank >= top_n:
+            continue
+        for neighbour in index.neighbours(doc.get("uuid"), window):
+            if neighbour["uuid"] in seen or not neighbour.get("is_effective", True):
+                continue
+            seen.add(neighbour["uuid"])
+            expanded.append({**{k: neighbour.get(k) for k in _ENTRY_FIELDS}, "expanded_from": doc.get("uuid")})
+            added += 1
+    if added:
+        logger.debug(f"相邻法条扩展: 补充 {added} 条")
+    return expanded
@@ -0,0 +1,156 @@
+'''
+检索文档的提示词上下文构建
+
+生成和反思阶段都需要把检索到的法条放进提示词，法条按相关性排序后逐条展开会重复大量
+法律名称/章节标题，且单条法条可能很长。ContextBuilder按token预算构建紧凑的上下文：
+- 同一法律、同一章节的法条归为一组，标题只出现一次
+- 每条法条的内容截断到CONTEXT_DOC_MAX_TOKENS以内
+- 按相关性顺序放入法条，总token数不超过CONTEXT_MAX_TOKENS，放不下的法条被省略
+- 法条编号[n]保持为其在输入列表中的位置，引用编号可直接映射回原始文档
+
+token数使用模型分词器统计：配置CONTEXT_TOKENIZER_PATH时使用该分词器，否则从EMBEDDING_MODEL_PATH加载一个独立的分词器实例。
+
+使用方式:
+builder = ContextBuilder()
+context, included = builder.build(retrieved_docs)
+'''
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def get_context_tokenizer():
+    """获取用于统计上下文token数的分词器，首次使用时加载"""
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                # 始终加载独立的分词器实例：嵌入模型的分词器在推理执行器线程中以truncation/padding调用，
+                # 在事件循环中共用同一个fast tokenizer会并发借用其内部状态（Already borrowed）
+                from transformers import AutoTokenizer
+                _tokenizer = AutoTokenizer.from_pretrained(
+                    settings.CONTEXT_TOKENIZER_PATH or settings.EMBEDDING_MODEL_PATH, local_files_only=True)
+    return _tokenizer
+
+
+class ContextBuilder:
+    """按token预算构建检索文档上下文"""
+
+    # 截断后法条内容的最少token数
+    min_doc_tokens = 32
+
+    def __init__(self, max_tokens: Optional[int] = None, max_doc_tokens: Optional[int] = None, tokenizer=None):
+        """
+        Args:
+            max_tokens: 上下文总token预算，为None时使用配置CONTEXT_MAX_TOKENS
+            max_doc_tokens: 单条法条内容的token上限，为None时使用配置CONTEXT_DOC_MAX_TOKENS
+            tokenizer: 分词器，为None时使用get_context_tokenizer()
+        """
+        self.max_tokens = max_tokens or settings.CONTEXT_MAX_TOKENS
+        self.max_doc_tokens = max_doc_tokens or settings.CONTEXT_DOC_MAX_TOKENS
+        self._tokenizer = tokenizer
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            self._tokenizer = get_context_tokenizer()
+        return self._tokenizer
+
+    def count_tokens(self, text: str) -> int:
+        """统计文本的token数（不含特殊token）"""
+        if not text:
+            return 0
+        return len(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    def truncate(self, text: str, max_tokens: int) -> Tuple[str, int]:
+        """
+        按token数截断文本，在原文字符位置上截断，保留原始格式
+
+        Returns:
+            (截断后的文本, token数)
+        """
+        if not text or max_tokens <= 0:
+            return "", 0
+        encoded = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+        offsets = encoded["offset_mapping"]
+        if len(offsets) <= max_tokens:
+            return text, len(offsets)
+        return text[:offsets[max_tokens - 1][1]] + "……", max_tokens
+
+    @staticmethod
+    def _document_header(doc: Dict[str, Any]) -> str:
+        status = "现行有效" if doc.get("is_effective", True) else "已失效"
+        return f"《{doc.get('document_name') or '未知来源'}》（{status}）"
+
+    @staticmethod
+    def _chapter_header(doc: Dict[str, Any]) -> str:
+        return " ".join(part for part in (doc.get("chapter"), doc.get("section")) if part)
+
+    def build(self, retrieved_docs: List[Dict[str, Any]], max_tokens: Optional[int] = None) -> Tuple[str, List[int]]:
+        """
+        构建上下文
+
+        Args:
+            retrieved_docs: 按相关性排序的检索文档
+            max_tokens: 覆盖本次构建的总token预算
+
+        Returns:
+            (上下文文本, 放入上下文的文档在输入列表中的位置)
+        """
+        budget = max_tokens or self.max_tokens
+        used = 0
+        seen_headers = set()
+        # 文档标题 -> 章节标题 -> [(编号, 内容)]，保持首次出现的顺序
+        groups: "OrderedDict[str, OrderedDict[str, List[Tuple[int, str]]]]" = OrderedDict()
+        included = []
+
+        for i, doc in enumerate(retrieved_docs):
+            document_header = self._document_header(doc)
+            chapter_header = self._chapter_header(doc)
+            # 新出现的标题计入预算
+            header_tokens = 0
+            if document_header not in seen_headers:
+                header_tokens += self.count_tokens(document_header)
+            if (document_header, chapter_header) not in seen_headers:
+                header_tokens += self.count_tokens(chapter_header)
+            label = f"[{i + 1}] "
+            overhead = header_tokens + self.count_tokens(label)
+
+            text = doc.get("text", "") or doc.get("content", "")
+            allowed = min(self.max_doc_tokens, budget - used - overhead)
+            # 剩余预算只能放下很短的片段时不再截断放入，片段对回答帮助不大
+            if allowed < self.min_doc_tokens and self.count_tokens(text) > allowed:
+                break
+            content, content_tokens = self.truncate(text, allowed)
+            if not content:
+                continue
+
+            seen_headers.add(document_header)
+            seen_headers.add((document_header, chapter_header))
+            groups.setdefault(document_header, OrderedDict()).setdefault(chapter_header, []).append((i + 1, content))
+            included.append(i)
+            used += overhead + content_tokens
+
+        if len(included) < len(retrieved_docs):
+            logger.info(f"上下文token预算({budget})内放入 {len(included)}/{len(retrieved_docs)} 条法条")
+
+        lines = []
+        for document_header, chapters in groups.items():
+            lines.append(document_header)
+            for chapter_header, items in chapters.items():
+                if chapter_header:
+                    lines.append(chapter_header)
+                for number, content in items:
+                    lines.append(f"[{number}] {content}")
+            lines.append("")
+        return "\n".join(lines).strip(), included
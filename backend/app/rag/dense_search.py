@@ -5,45 +5,92 @@
 import os
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import asyncio
 import numpy as np
-from app.db.milvus import VectorStore
-from app.models.Embeddings.bge_embedding import BGEEmbedding  
 from app.core.config import Settings
+from app.core.registry import get_embedding_model, get_vector_store
 settings = Settings()
 
 
 class DenseSearch:
     def __init__(self):
-        self.embedding = BGEEmbedding()
-        self.vector_store = VectorStore()
         self.collection_name = settings.MILVUS_COLLECTION
 
-        
+    @property
+    def embedding(self):
+        """共享的嵌入模型，首次使用时加载"""
+        return get_embedding_model()
 
-    def search(self, query: str, top_k: int = 10) -> List[Dict[str, Any]]:
-        """基于向量相似度的搜索"""
+    @property
+    def vector_store(self):
+        """共享的Milvus客户端，首次使用时连接"""
+        return get_vector_store()
+
+
+    def search(self, query: str, top_k: int = 10, profile: Optional[str] = None) -> List[Dict[str, Any]]:
+        """基于向量相似度的搜索，profile为检索档位，为None时使用默认档位"""
         # 获取查询的嵌入向量
         query_embedding = self.embedding.encode(query)
-        
-        # 确保向量格式正确，milvus要求向量格式为浮点数列表
-        # 修改了encode函数后，现在返回的是一维numpy数组
-        # 需要转换为浮点数列表以适配Milvus
+        return self._search_by_embedding(query_embedding, top_k, profile)
+
+    async def asearch(self, query: str, top_k: int = 10, profile: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        search的异步版本
+        向量化在推理执行器中完成，Milvus检索在线程中完成，均不阻塞事件循环
+        """
+        query_embedding = await self.embedding.aencode(query)
+        return await asyncio.to_thread(self._search_by_embedding, query_embedding, top_k, profile)
+
+    def search_batch(self, queries: List[str], top_k: int = 10, profile: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        """批量搜索，所有查询一次向量化、一次Milvus请求，返回与queries一一对应的结果列表"""
+        if not queries:
+            return []
+        query_embeddings = self.embedding.encode(list(queries))
+        return self._search_by_embeddings(list(query_embeddings), top_k, profile)
 
-        if isinstance(query_embedding, np.ndarray):
-            query_embedding = query_embedding.astype(np.float32).tolist()
-        
+    async def asearch_batch(self, queries: List[str], top_k: int = 10, profile: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        """
+        search_batch的异步版本
+        各查询分别向量化（命中向量缓存或与其他请求合并微批），再在一次Milvus请求中检索
+        """
+        if not queries:
+            return []
+        query_embeddings = await asyncio.gather(*(self.embedding.aencode(query) for query in queries))
+        return await asyncio.to_thread(self._search_by_embeddings, list(query_embeddings), top_k, profile)
+
+    def _search_by_embedding(self, query_embedding, top_k: int = 10, profile: Optional[str] = None) -> List[Dict[str, Any]]:
+        """使用查询向量在Milvus中检索"""
+        return self._search_by_embeddings([query_embedding], top_k, profile)[0]
+
+    def _search_by_embeddings(self, query_embeddings: list, top_k: int = 10,
+                              profile: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+        """
+        使用多个查询向量在一次Milvus请求中检索
+        集合为降维集合时，用该集合的投影降维后检索Milvus，再用全维向量对候选精确重排
+        """
+        # 确保向量格式正确，milvus要求向量格式为浮点数列表
+        # encode返回的是numpy数组，需要转换为浮点数列表以适配Milvus
+        query_embeddings = [
+            embedding.astype(np.float32).tolist() if isinstance(embedding, np.ndarray) else embedding
+            for embedding in query_embeddings
+        ]
+        rescore_embeddings = None
+        projector = self.vector_store.get_projector(self.collection_name, self.embedding.model_path)
+        if projector is not None:
+            rescore_embeddings = query_embeddings
+            query_embeddings = projector.transform(query_embeddings).tolist()
         output_fields = ["uuid", "content", "document_name", "chapter", "section", "effective_date", "is_effective"]
-        vector_results = self.vector_store.search_vectors(
+        return self.vector_store.search_vectors_batch(
             collection_name=self.collection_name,
-            query_embedding=query_embedding,
+            query_embeddings=query_embeddings,
             limit=top_k,
             output_fields=output_fields,
-            expr="is_effective == True"  # 添加过滤条件，只返回有效的文档
+            expr="is_effective == True",  # 添加过滤条件，只返回有效的文档
+            profile=profile,
+            rescore_embeddings=rescore_embeddings
         )
 
-        return vector_results
-
 # if __name__ == "__main__":
 #     dense_search = DenseSearch()
 #     vector_results = dense_search.search(collection_name=settings.MILVUS_COLLECTION, query="我想注册一个公司，应该怎么做？")
@@ -6,12 +6,19 @@ import asyncio
 import time
 import traceback
 import httpx
+from typing import Any, Dict, List, Optional
 
 from app.core.config import settings
+from app.core.lru_cache import TTLLRUCache
+from app.models.Embeddings.embedding_cache import normalize_query
 from app.models.llm import get_llm_service, LLMService
+from app.rag.article_index import cites_article
 
 logger = logging.getLogger(__name__)
 
+# 伪文档缓存，按规范化查询存储，所有HyDEGenerator实例共享
+_hyde_cache = TTLLRUCache(max_size=settings.HYDE_CACHE_SIZE, ttl=settings.CACHE_EXPIRATION)
+
 class HyDEGenerator:
     """
     假设性文档嵌入(Hypothetical Document Embeddings)生成器
@@ -35,18 +42,67 @@ class HyDEGenerator:
             max_tokens=max_tokens
         )
         self.max_tokens = max_tokens
+        self.skip_article_citation = settings.HYDE_SKIP_ARTICLE_CITATION
+        self.skip_dense_score = settings.HYDE_SKIP_DENSE_SCORE
+        self.decisions = {"generated": 0, "cached": 0, "skip_citation": 0, "skip_dense_score": 0}
         logger.info(f"HyDE生成器初始化完成，使用模型: {self.llm_service.model}")
+
+    def get_cached_document(self, query: str) -> Optional[str]:
+        """获取缓存的伪文档，未命中返回None"""
+        return _hyde_cache.get(normalize_query(query))
+
+    def skip_reason(self, query: str, dense_results: Optional[List[Dict[str, Any]]] = None) -> Optional[str]:
+        """
+        判断是否可以跳过HyDE
+
+        Args:
+            query: 原始查询
+            dense_results: 原始查询的稠密检索结果，为None时只做文本判断
+
+        Returns:
+            跳过原因，不跳过时返回None
+        """
+        # 明确引用法条编号的查询，如"公司法第二十九条"，关键词检索已能精确命中，伪文档帮助不大
+        if self.skip_article_citation and cites_article(query):
+            return "skip_citation"
+        if self.skip_dense_score and dense_results:
+            top_score = max(doc.get("score", 0.0) for doc in dense_results)
+            if top_score >= self.skip_dense_score:
+                return "skip_dense_score"
+        return None
+
+    def record_decision(self, query: str, decision: str):
+        """记录HyDE决策，日志中附带累计统计"""
+        self.decisions[decision] += 1
+        total = sum(self.decisions.values())
+        llm_rate = self.decisions["generated"] / total
+        cache_stats = _hyde_cache.get_stats()
+        logger.info(
+            f"HyDE决策: {decision}，查询: {query[:30]}；累计 {total} 次，"
+            f"调用LLM比例: {llm_rate:.2%}，决策分布: {self.decisions}，缓存命中率: {cache_stats['hit_rate']:.2%}"
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取HyDE决策统计与缓存统计"""
+        return {"decisions": dict(self.decisions), "cache": _hyde_cache.get_stats()}
     
-    async def generate_document(self, enhanced_query: str) -> str:
+    async def generate_document(self, enhanced_query: str, use_cache: bool = True) -> str:
         """
         根据增强查询生成伪文档
         
         Args:
             enhanced_query: 已经包含历史和上下文的增强查询
+            use_cache: 是否先查询伪文档缓存，调用方已查询过时传False；生成成功的结果总会写入缓存
             
         Returns:
             生成的伪文档
         """
+        cache_key = normalize_query(enhanced_query)
+        if use_cache:
+            cached_doc = _hyde_cache.get(cache_key)
+            if cached_doc is not None:
+                return cached_doc
+
         start_time = time.time()
         logger.info("开始生成伪文档...")
         
@@ -68,6 +124,11 @@ class HyDEGenerator:
             logger.info(f"伪文档生成成功，长度: {len(hypothetical_doc)} 字符")
             logger.info(f"耗时: {elapsed_time:.2f}秒")
             
+            # LLMService调用失败时返回错误描述而不是抛出异常，不能作为伪文档使用或缓存
+            if not hypothetical_doc or hypothetical_doc.startswith(("API请求失败", "调用模型API时发生错误")):
+                logger.warning(f"伪文档生成失败，使用原查询: {hypothetical_doc[:50] if hypothetical_doc else ''}")
+                return enhanced_query
+            _hyde_cache.set(cache_key, hypothetical_doc)
             return hypothetical_doc
                 
         except Exception as e:
@@ -3,8 +3,11 @@ import markdown
 from bs4 import BeautifulSoup, Tag
 from typing import List, Dict, Any, Tuple, Optional
 import os
+import sys
 from datetime import datetime
 import uuid
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from app.rag.article_index import parse_article_number
 
 '''
 法规文件处理预期：
@@ -14,6 +17,7 @@ import uuid
 - 立法层级 先不要
 - 是否生效
 - 章节条
+- 法条在文档中的顺序(article_index)和条号(article_number)，用于相邻法条扩展
 '''
 
 class LegalDocumentProcessor:
@@ -208,7 +212,9 @@ class LegalDocumentProcessor:
                             "metadata": {
                                 **file_metadata,
                                 "chapter": legal_context["chapter"],
-                                "section": legal_context["section"]
+                                "section": legal_context["section"],
+                                "article_index": len(chunks),
+                                "article_number": parse_article_number(text)
                             }
                         }
                         is_structure = True
@@ -2,11 +2,48 @@ import sys
 import os
 import asyncio
 import json
+import math
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from app.models.llm import get_llm_service, LLMService
-from app.rag.HybridRetriever import HybridRetriever
+from app.core.config import settings
+from app.core.registry import get_default_llm_service
+from app.rag.context_builder import ContextBuilder
+
+# 反思模式
+# llm_json: LLM逐条分析后以JSON对象数组返回相关法条的序号
+# llm_index: LLM只输出相关法条的序号，一次调用批量判断全部法条
+# reranker: 按校准后的重排序分数过滤，不调用LLM
+# none: 不过滤
+REFLECTION_MODES = ("llm_json", "llm_index", "reranker", "none")
+
+# 反思提示词中的法条上下文，与生成阶段使用相同的token预算
+_context_builder = ContextBuilder()
+
+
+async def reflect(query: str, retrieved_docs: List[Dict[str, Any]], mode: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    按指定模式过滤检索到的文档
+    
+    Args:
+        query: 用户问题
+        retrieved_docs: 检索到的文档列表
+        mode: 反思模式，为None时使用配置REFLECTION_MODE
+    
+    Returns:
+        过滤后的相关文档列表
+    """
+    mode = mode or settings.REFLECTION_MODE
+    if not retrieved_docs or mode == "none":
+        return retrieved_docs
+    if mode == "reranker":
+        return reflection_reranker(retrieved_docs)
+    if mode == "llm_index":
+        return await reflection_llm_index(query, retrieved_docs)
+    if mode == "llm_json":
+        return await reflection_llm(query, retrieved_docs)
+    raise ValueError(f"不支持的反思模式: {mode}，可选: {REFLECTION_MODES}")
 
 
 async def reflection_llm(query: str, retrieved_docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -20,7 +57,7 @@ async def reflection_llm(query: str, retrieved_docs: List[Dict[str, Any]]) -> Li
     Returns:
         过滤后的相关文档列表
     """
-    llm_service = LLMService()
+    llm_service = get_default_llm_service()
     system_prompt = build_reflection_prompt(query, retrieved_docs)
     response = await llm_service.generate(system_prompt)
     
@@ -31,12 +68,10 @@ async def reflection_llm(query: str, retrieved_docs: List[Dict[str, Any]]) -> Li
 
 def build_reflection_prompt(query: str, retrieved_docs: List[Dict[str, Any]]) -> str:
     """
-    构建反思prompt，要求LLM以JSON格式返回过滤后的文档
+    构建反思prompt，要求LLM以JSON格式返回相关文档的序号
+    法律依据按token预算紧凑排列，不展开uuid、分数等检索字段，由序号映射回原始文档
     """
-    # 将retrieved_docs格式化为更清晰的展示
-    docs_text = ""
-    for i, doc in enumerate(retrieved_docs):
-        docs_text += f"[{i+1}] {doc}\n"
+    docs_text, _ = _context_builder.build(retrieved_docs)
     
     return f"""
 ## 背景 ##
@@ -54,38 +89,19 @@ def build_reflection_prompt(query: str, retrieved_docs: List[Dict[str, Any]]) ->
 
 ## 输出要求 ##
 请仔细分析每个法律依据与用户问题的相关性，然后以JSON格式返回相关的法律依据。
-输出格式必须是一个JSON数组，每个元素包含原始文档的所有字段。
+输出格式必须是一个JSON数组，每个元素包含法律依据的序号index。
 
 **重要**: 
 1. 只返回与用户问题直接相关的法律依据
-2. 保持原始文档的完整格式和字段
+2. index必须是上面给出的序号[n]中的n
 3. 输出必须是有效的JSON格式
 4. 如果没有相关的法律依据，返回空数组 []
 
 ## 输出示例 ##
 ```json
 [
-   {{
-            "uuid": "1234567890",
-            "score": 0.95,
-            "content": "第一百四十条 上市公司应当依法披露股东、实际控制人的信息...",
-            "document_name": "公司法",
-            "chapter": "第五章 股份有限公司的设立和组织机构",
-            "section": "第五节 上市公司组织机构的特别规定",
-            "effective_status": "True",
-            "effective_date": "2021-01-01"
-        
-    }}
-    ,
-    {{
-        "content": "第一百六十六条 上市公司应当依照法律、行政法规的规定披露相关信息",
-        "document_name": "公司法",
-        "chapter": "第六章 股份有限公司的股份发行和转让",
-        "section": "第二节 股份转让",
-        "effective_status": "True",
-        "effective_date": "2021-01-01"
-
-    }}
+    {{"index": 1}},
+    {{"index": 3}}
 ]
 ```
 
@@ -94,21 +110,21 @@ def build_reflection_prompt(query: str, retrieved_docs: List[Dict[str, Any]]) ->
 
 def parse_llm_response(response: str, original_docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
-    解析LLM的响应，提取JSON格式的文档列表
+    解析LLM的响应，提取JSON数组中的序号并映射回原始文档
     
     Args:
         response: LLM的原始响应
         original_docs: 原始文档列表，用作备用
     
     Returns:
-        解析后的文档列表
+        序号对应的文档列表，无法解析时返回原始文档
     """
     try:
         json_match = re.search(r'```json\s*(.*?)\s*```', response, re.DOTALL)
         if json_match:
             json_str = json_match.group(1)
         else:
-            array_match = re.search(r'\[.*?\]', response, re.DOTALL)
+            array_match = re.search(r'\[.*\]', response, re.DOTALL)
             if array_match:
                 json_str = array_match.group(0)
             else:
@@ -118,7 +134,7 @@ def parse_llm_response(response: str, original_docs: List[Dict[str, Any]]) -> Li
         parsed_data = json.loads(json_str)
         
         if isinstance(parsed_data, list):
-            return parsed_data
+            return _map_indices(parsed_data, original_docs)
         else:
             print(f"Warning: 解析的数据不是列表格式: {type(parsed_data)}")
             return original_docs
@@ -132,6 +148,117 @@ def parse_llm_response(response: str, original_docs: List[Dict[str, Any]]) -> Li
         return original_docs
 
 
+def _map_indices(items: List[Any], original_docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    将LLM返回的序号映射回原始文档
+    元素为{"index": n}或整数n；越界或无法识别的元素忽略，结果按原始顺序去重
+    """
+    indices = set()
+    for item in items:
+        index = item.get("index") if isinstance(item, dict) else item
+        if isinstance(index, str) and index.strip().isdigit():
+            index = int(index)
+        if isinstance(index, int) and not isinstance(index, bool) and 1 <= index <= len(original_docs):
+            indices.add(index - 1)
+    return [doc for i, doc in enumerate(original_docs) if i in indices]
+
+
+def calibrated_relevance(reranker_score: float) -> float:
+    """将重排序logit校准为相关概率: sigmoid(scale * logit + bias)"""
+    return 1.0 / (1.0 + math.exp(-(settings.REFLECTION_SCORE_SCALE * reranker_score + settings.REFLECTION_SCORE_BIAS)))
+
+
+def reflection_reranker(retrieved_docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    按重排序分数过滤文档，不调用LLM
+    校准后相关概率低于REFLECTION_SCORE_THRESHOLD的文档被过滤，至少保留REFLECTION_MIN_DOCS个分数最高的文档
+    
+    Args:
+        retrieved_docs: 重排序后的文档列表（包含reranker_score）
+    
+    Returns:
+        过滤后的文档列表，保持原有顺序
+    """
+    # 相邻法条扩展补充的文档没有分数，随其命中法条保留或过滤
+    scored = [i for i, doc in enumerate(retrieved_docs) if "expanded_from" not in doc]
+    if any("reranker_score" not in retrieved_docs[i] for i in scored):
+        print("Warning: 文档缺少reranker_score（未启用重排序），跳过分数过滤")
+        return retrieved_docs
+    
+    relevances = {i: calibrated_relevance(retrieved_docs[i]["reranker_score"]) for i in scored}
+    ranked = sorted(scored, key=lambda i: relevances[i], reverse=True)
+    keep = set(ranked[:settings.REFLECTION_MIN_DOCS])
+    keep.update(i for i, relevance in relevances.items() if relevance >= settings.REFLECTION_SCORE_THRESHOLD)
+    kept_uuids = {retrieved_docs[i].get("uuid") for i in keep}
+    return [
+        doc for i, doc in enumerate(retrieved_docs)
+        if i in keep or doc.get("expanded_from") in kept_uuids
+    ]
+
+
+async def reflection_llm_index(query: str, retrieved_docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    使用LLM批量判断文档相关性，LLM只输出相关文档的序号
+    
+    Args:
+        query: 用户问题
+        retrieved_docs: 检索到的文档列表
+    
+    Returns:
+        过滤后的相关文档列表，解析失败时返回原始文档
+    """
+    llm_service = get_default_llm_service()
+    prompt = build_reflection_index_prompt(query, retrieved_docs)
+    response = await llm_service.generate(prompt, max_tokens=settings.REFLECTION_INDEX_MAX_TOKENS)
+    return parse_index_response(response, retrieved_docs)
+
+
+def build_reflection_index_prompt(query: str, retrieved_docs: List[Dict[str, Any]]) -> str:
+    """
+    构建序号式反思prompt，只展示判断相关性所需的字段
+    """
+    docs_text, _ = _context_builder.build(retrieved_docs)
+    
+    return f"""
+## 背景 ##
+你是一个法律咨询顾问，帮助用户回答问题。
+
+## 任务 ##
+你会收到一个用户的问题（query），以及检索到的带序号的法律依据（retrieved_docs）。
+请判断哪些法律依据与用户问题直接相关，可以用来准确地回答用户的问题。
+
+## 输入 ##
+用户问题: {query}
+
+检索到的法律依据:
+{docs_text}
+
+## 输出要求 ##
+只输出相关法律依据的序号，组成一个JSON数组，例如 [1, 3]，不要输出任何其他内容。
+如果没有相关的法律依据，输出 []。
+
+## 输出 ##"""
+
+
+def parse_index_response(response: str, original_docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    解析LLM输出的序号数组，映射回原始文档
+    
+    Args:
+        response: LLM的原始响应
+        original_docs: 原始文档列表
+    
+    Returns:
+        序号对应的文档列表（按原始顺序），无法解析时返回原始文档
+    """
+    array_match = re.search(r'\[[\d\s,，]*\]', response or "")
+    if not array_match:
+        print(f"Warning: 无法从响应中提取序号数组: {response}")
+        return original_docs
+    
+    indices = {int(i) - 1 for i in re.findall(r'\d+', array_match.group(0))}
+    return [doc for i, doc in enumerate(original_docs) if i in indices]
+
 
 # if __name__ == "__main__":
 #     hybrid_retriever = HybridRetriever()
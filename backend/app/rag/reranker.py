@@ -2,7 +2,7 @@ import os
 import sys
 from typing import List, Dict, Any
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
-from app.models.Rerankers.bge_reranker import BAAIReranker
+from app.core.registry import get_reranker_model
 
 '''
 def rerank(self, query: str, documents: List[Dict[str, Any]], top_k: int = 10) -> List[Dict[str, Any]]:
@@ -10,9 +10,13 @@ def rerank(self, query: str, documents: List[Dict[str, Any]], top_k: int = 10) -
 '''
 
 class Reranker:
-    def __init__(self):
-        self.reranker = BAAIReranker()
-
+    @property
+    def reranker(self):
+        """共享的重排序模型，首次使用时加载"""
+        return get_reranker_model()
 
     def rerank(self, query: str, documents: List[Dict[str, Any]], top_k: int = 10):
-        return self.reranker.rerank(query, documents, top_k)
\ No newline at end of file
+        return self.reranker.rerank(query, documents, top_k)
+
+    async def arerank(self, query: str, documents: List[Dict[str, Any]], top_k: int = 10):
+        return await self.reranker.arerank(query, documents, top_k)
@@ -8,12 +8,10 @@ import os
 import sys
 # 添加项目根目录到Python路径
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 from app.core.config import settings
 from app.models.llm import get_llm_service, LLMService
-# 初始化检索器
-from app.rag.HybridRetriever import HybridRetriever
-        
+from app.rag.context_builder import ContextBuilder
 
 logger = logging.getLogger(__name__)
 
@@ -36,7 +34,7 @@ class Generator:
             temperature=0.15,
             max_tokens=4000
         )
-        self.retriever = HybridRetriever()
+        self.context_builder = ContextBuilder()
        
 
     async def generate(self,
@@ -80,16 +78,7 @@ class Generator:
 
             return {
                 "answer": answer,
-                "retrieved_docs": [
-                    {
-                        "document_name": doc.get('document_name', ''),
-                        "chapter": doc.get('chapter', ''),
-                        "section": doc.get('section', ''),
-                        "content": doc.get('content', ''),
-                        "effective_status": doc.get('effective_status', ''),
-                        "effective_date": doc.get('effective_date', '')
-                    } for doc in retrieved_docs
-                ]
+                "retrieved_docs": self._format_retrieved_docs(retrieved_docs)
             }
 
         except Exception as e:
@@ -102,6 +91,64 @@ class Generator:
                 "error": str(e)
             }
 
+    async def generate_stream(self,
+                              query: str,
+                              retrieved_docs: List[Dict[str, Any]] = None,
+                              **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """
+        根据检索到的文档流式生成回答
+
+        Args:
+            query: 用户问题
+            retrieved_docs: 检索到的文档列表
+            **kwargs: 其他生成参数，如temperature, max_tokens等
+
+        Yields:
+            {"type": "delta", "content": 增量文本}，生成过程中逐个产出
+            {"type": "done", "answer": 完整回答, "retrieved_docs": [...]}，生成结束时产出一次，出错时附带error
+        """
+        retrieved_docs = retrieved_docs or []
+        messages = [
+            {"role": "system", "content": self._build_system_prompt()},
+            {"role": "user", "content": self._build_user_prompt(query, retrieved_docs)}
+        ]
+
+        answer_parts = []
+        error = None
+        try:
+            async for delta in self.llm_service.stream_chat_completion(messages, **kwargs):
+                answer_parts.append(delta)
+                yield {"type": "delta", "content": delta}
+        except Exception as e:
+            logger.exception(f"流式生成回答时发生错误: {str(e)}")
+            error = str(e)
+            if not answer_parts:
+                fallback = "抱歉，在生成回答时遇到了技术问题。请稍后再试。"
+                answer_parts.append(fallback)
+                yield {"type": "delta", "content": fallback}
+
+        done_event = {
+            "type": "done",
+            "answer": "".join(answer_parts),
+            "retrieved_docs": self._format_retrieved_docs(retrieved_docs)
+        }
+        if error:
+            done_event["error"] = error
+        yield done_event
+
+    def _format_retrieved_docs(self, retrieved_docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """整理返回给调用方的法律依据字段"""
+        return [
+            {
+                "document_name": doc.get('document_name', ''),
+                "chapter": doc.get('chapter', ''),
+                "section": doc.get('section', ''),
+                "content": doc.get('content', ''),
+                "effective_status": doc.get('effective_status', ''),
+                "effective_date": doc.get('effective_date', '')
+            } for doc in (retrieved_docs or [])
+        ]
+
     def _build_system_prompt(self) -> str:
         """构建系统提示"""
         return """
@@ -129,33 +176,11 @@ class Generator:
 请确保你引用的每个法条编号[n]都准确对应提供给你的法律依据列表中的编号。不要自行编造法条内容，只能引用我提供给你的法律依据。"""
 
     def _build_user_prompt(self, query: str, retrieved_docs: List[Dict[str, Any]]) -> str:
-        """构建用户提示，包含查询和检索到的文档"""
+        """构建用户提示，包含查询和检索到的文档（按token预算紧凑排列，编号[n]对应retrieved_docs中的位置）"""
+        context, _ = self.context_builder.build(retrieved_docs)
         prompt = f"我的问题是：{query}\n\n"
         prompt += "以下是相关的法律依据：\n\n"
-
-        for i, doc in enumerate(retrieved_docs, 1):
-            # 构建来源信息
-            source_parts = []
-            if doc.get('document_name'):
-                source_parts.append(doc.get('document_name'))
-                
-            if doc.get('chapter'):
-                source_parts.append(doc.get('chapter'))
-    
-                
-            if doc.get('section'):
-                source_parts.append(doc.get('section'))
-        
-            
-            is_effective = doc.get('is_effective', True)
-            effective_status = "（现行有效）" if is_effective else "（已失效）"
-            
-            source = " - ".join(source_parts) if source_parts else "未知来源"
-            source += effective_status
-
-            prompt += f"[{i}] {source}:\n"
-            prompt += f"{doc.get('text', '') or doc.get('content', '')}\n\n"
-
+        prompt += f"{context}\n\n"
         prompt += "请根据以上法律依据回答我的问题，必须在回答中准确引用相关的法条编号[n]，并在回答最后列出所有引用的法条原文。"
         return prompt
 
@@ -0,0 +1,202 @@
+'''
+语义答案缓存
+
+很多用户会问相同的法律问题，而每轮RAG都要经过意图识别、HyDE、混合检索、重排序、反思和生成。
+语义答案缓存把查询向量与历史查询向量比较，相似度超过阈值时直接返回缓存的生成结果。
+
+- 历史查询向量保存在内存矩阵中（已L2归一化），查询时做一次矩阵乘法即可得到全部余弦相似度，
+  缓存规模在数千条以内时比维护ANN索引更简单、更精确
+- 每条缓存记录引用到的法条uuid及其指纹（内容 + 是否生效）：
+  1. 本进程内索引变更时通过index_events回调立即失效
+  2. 命中时可选从ES批量核对指纹，覆盖离线脚本在其他进程中更新索引的情况
+- 每条缓存记录生成时的请求选项（反思模式、检索档位），只有选项相同的请求才能命中
+'''
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+import numpy as np
+from app.core.config import settings
+from app.db.index_events import chunk_fingerprint, subscribe
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticAnswerCache:
+    """基于查询向量相似度的RAG答案缓存"""
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        max_size: Optional[int] = None,
+        ttl: Optional[int] = None,
+        validate: Optional[bool] = None
+    ):
+        """
+        初始化语义答案缓存
+
+        Args:
+            threshold: 命中所需的最小余弦相似度
+            max_size: 最大缓存条目数，超过时淘汰最久未命中的条目
+            ttl: 缓存有效期（秒），0表示不过期
+            validate: 命中时是否从ES核对引用法条的指纹
+        """
+        self.threshold = settings.SEMANTIC_CACHE_THRESHOLD if threshold is None else threshold
+        self.max_size = max_size or settings.SEMANTIC_CACHE_SIZE
+        self.ttl = settings.CACHE_EXPIRATION if ttl is None else ttl
+        self.validate = settings.SEMANTIC_CACHE_VALIDATE if validate is None else validate
+
+        self._lock = threading.Lock()
+        self._embeddings: Optional[np.ndarray] = None  # [n, dim]，与_entries一一对应
+        self._entries: List[Dict[str, Any]] = []
+        self.hits = 0
+        self.misses = 0
+
+        # 本进程内的索引变更立即失效相关条目
+        subscribe(self.invalidate)
+
+    async def alookup(self, query_embedding: np.ndarray, options: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        查找语义相似的历史查询
+
+        Args:
+            query_embedding: 已归一化的查询向量
+            options: 影响生成结果的请求选项，只匹配以相同选项生成的条目
+
+        Returns:
+            命中时返回缓存的生成结果，否则返回None
+        """
+        entry = self._match(query_embedding, options or {})
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if self.validate and not await asyncio.to_thread(self._validate_entry, entry):
+            logger.info(f"语义缓存条目引用的法条已变更，失效: {entry['query'][:30]}")
+            self._remove_entry(entry)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        entry["last_hit"] = time.time()
+        logger.info(f"语义缓存命中，相似度: {entry['similarity']:.4f}，原查询: {entry['query'][:30]}")
+        return entry["response"]
+
+    def _match(self, query_embedding: np.ndarray, options: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """计算与全部历史查询的余弦相似度，返回请求选项相同且超过阈值的最相似条目"""
+        query_embedding = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        with self._lock:
+            if self._embeddings is None or not self._entries:
+                return None
+            similarities = self._embeddings @ query_embedding
+            mismatched = [i for i, entry in enumerate(self._entries) if entry["options"] != options]
+            similarities[mismatched] = -np.inf
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            entry = self._entries[best]
+            if similarity < self.threshold:
+                return None
+            if self.ttl and entry["created_at"] + self.ttl < time.time():
+                self._remove_indices([best])
+                return None
+            entry["similarity"] = similarity
+            return entry
+
+    def _validate_entry(self, entry: Dict[str, Any]) -> bool:
+        """从ES核对引用法条的内容和生效状态是否与缓存时一致"""
+        fingerprints = entry["fingerprints"]
+        if not fingerprints:
+            return True
+        try:
+            from app.core.registry import get_es_searcher
+            current = get_es_searcher().get_documents(list(fingerprints.keys()))
+        except Exception as e:
+            logger.warning(f"核对语义缓存法条失败，按未命中处理: {e}")
+            return False
+        for uuid, fingerprint in fingerprints.items():
+            doc = current.get(uuid)
+            if doc is None or chunk_fingerprint(doc["content"], doc["is_effective"]) != fingerprint:
+                return False
+        return True
+
+    def store(self, query: str, query_embedding: np.ndarray, response: Dict[str, Any], docs: List[Dict[str, Any]],
+              options: Optional[Dict[str, Any]] = None):
+        """
+        写入缓存
+
+        Args:
+            query: 查询文本
+            query_embedding: 已归一化的查询向量
+            response: Generator.generate的返回结果
+            docs: 生成时引用的候选法条（需包含uuid、content、is_effective）
+            options: 生成时的请求选项，见alookup
+        """
+        if not response or response.get("error"):
+            return
+        fingerprints = {
+            str(doc["uuid"]): chunk_fingerprint(doc.get("content", ""), doc.get("is_effective", True))
+            for doc in docs or [] if doc.get("uuid")
+        }
+        now = time.time()
+        entry = {
+            "query": query,
+            "response": response,
+            "fingerprints": fingerprints,
+            "options": dict(options or {}),
+            "created_at": now,
+            "last_hit": now,
+        }
+        vector = np.asarray(query_embedding, dtype=np.float32).reshape(1, -1)
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                # 淘汰最久未命中的条目
+                oldest = min(range(len(self._entries)), key=lambda i: self._entries[i]["last_hit"])
+                self._remove_indices([oldest])
+            self._entries.append(entry)
+            self._embeddings = vector if self._embeddings is None else np.vstack([self._embeddings, vector])
+
+    def invalidate(self, uuids: Optional[Set[str]] = None):
+        """
+        失效引用了指定法条的条目
+
+        Args:
+            uuids: 变更的法条uuid，为None时清空全部缓存
+        """
+        with self._lock:
+            if uuids is None:
+                removed = len(self._entries)
+                self._entries = []
+                self._embeddings = None
+            else:
+                indices = [i for i, entry in enumerate(self._entries) if uuids & entry["fingerprints"].keys()]
+                removed = len(indices)
+                self._remove_indices(indices)
+        if removed:
+            logger.info(f"语义缓存失效 {removed} 条")
+
+    def _remove_entry(self, entry: Dict[str, Any]):
+        with self._lock:
+            indices = [i for i, e in enumerate(self._entries) if e is entry]
+            self._remove_indices(indices)
+
+    def _remove_indices(self, indices: List[int]):
+        """删除指定位置的条目，调用方需持有锁"""
+        if not indices:
+            return
+        keep = [i for i in range(len(self._entries)) if i not in set(indices)]
+        self._entries = [self._entries[i] for i in keep]
+        self._embeddings = self._embeddings[keep] if keep else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
@@ -4,6 +4,7 @@ elasticSearch 关键词搜索器 版本为ES8.x
 
 支持能力：
 搜索: def search(self, query: str, top_k: int = 10) -> List[Dict[str, Any]]
+异步搜索: async def asearch(self, query: str, top_k: int = 10) -> List[Dict[str, Any]]
  result = {
                     "uuid": doc.get("uuid", ""),
                     "content": content,
@@ -20,18 +21,23 @@ import os
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from typing import List, Dict, Any
-from app.db.es_search import ESSearcher
+from app.core.registry import get_es_searcher
 
 
 class SparseSearch:
     """Elasticsearch搜索器，替代BM25搜索实现"""
 
-    def __init__(self):
-        self.es_search = ESSearcher()
+    @property
+    def es_search(self):
+        """共享的Elasticsearch搜索器，首次使用时连接"""
+        return get_es_searcher()
 
     def search(self, query: str, top_k: int = 10) -> List[Dict[str, Any]]:
         return self.es_search.search(query, top_k)
 
+    async def asearch(self, query: str, top_k: int = 10) -> List[Dict[str, Any]]:
+        return await self.es_search.search_async(query, top_k)
+
 # if __name__ == "__main__":
 #     sparse_search = SparseSearch()
 #     results = sparse_search.search(query="公司注册需要哪些材料", top_k=10)
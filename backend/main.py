@@ -1,14 +1,55 @@
 # app/main.py - 应用入口
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.api import api_router
 from app.db.session import engine
 from app.db.models import Base  
+from app.models.llm import close_http_client
+from app.core.config import settings
+from app.core.registry import get_created, get_vector_store
+
+logger = logging.getLogger(__name__)
 
 # 创建数据库表
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="法律知识问答系统")
+
+async def preload_milvus():
+    """连接Milvus并加载检索集合，在后台执行，不阻塞应用启动"""
+    try:
+        vector_store = await asyncio.to_thread(get_vector_store)
+        result = await asyncio.to_thread(vector_store.load_collections, [settings.MILVUS_COLLECTION])
+        logger.info(f"Milvus集合预加载完成: {result}")
+    except Exception as e:
+        logger.error(f"Milvus集合预加载失败: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时预加载Milvus集合，关闭时释放共享资源"""
+    app.state.preload_task = asyncio.create_task(preload_milvus()) if settings.MILVUS_PRELOAD else None
+    yield
+    # 预加载仍在进行时先取消，再关闭共享资源
+    preload_task = app.state.preload_task
+    if preload_task is not None and not preload_task.done():
+        preload_task.cancel()
+        try:
+            await preload_task
+        except asyncio.CancelledError:
+            pass
+    # 关闭LLM共享连接池
+    await close_http_client()
+    # 关闭Elasticsearch异步客户端（仅在已创建时）
+    es_searcher = get_created("es_searcher")
+    if es_searcher is not None:
+        await es_searcher.close_async()
+
+
+app = FastAPI(title="法律知识问答系统", lifespan=lifespan)
 
 # 允许跨域请求
 app.add_middleware(
@@ -25,3 +66,26 @@ app.include_router(api_router)
 @app.get("/")
 async def root():
     return {"message": "法律知识问答系统API"}
+
+@app.get("/ready")
+async def ready():
+    """
+    就绪检查：检索集合加载完成前返回503
+    预加载任务进行中时直接返回其进度；未启用预加载或预加载失败（如启动时Milvus不可达）时，
+    由就绪检查重新加载集合，Milvus恢复后即可就绪
+    """
+    collections = [settings.MILVUS_COLLECTION]
+    vector_store = get_created("vector_store")
+    preload_task = app.state.preload_task
+    preloading = preload_task is not None and not preload_task.done()
+    if not preloading and (vector_store is None or not vector_store.is_ready(collections)):
+        try:
+            vector_store = await asyncio.to_thread(get_vector_store)
+            for collection_name in collections:
+                await asyncio.to_thread(vector_store.ensure_loaded, collection_name)
+        except Exception as e:
+            logger.error(f"就绪检查加载Milvus集合失败: {e}")
+    vector_store = get_created("vector_store")
+    if vector_store is None or not vector_store.is_ready(collections):
+        return JSONResponse(status_code=503, content={"ready": False, "collections": collections})
+    return {"ready": True, "collections": collections}
@@ -7,13 +7,18 @@ RAG检索阶段Hit Rate评估脚本
 通过计算Hit Rate（命中率）来评估检索系统的效果。
 
 Hit Rate = 检索结果中包含正确参考文档的问题数 / 总问题数
+
+每个问题只按最大的top-k检索一次，记录正确文档的排名，
+再从同一个排序列表计算各个k下的Hit Rate、MRR和nDCG；问题按批检索（一批问题的稠密检索合并为一次Milvus请求），批次之间用有界线程池并发。
 """
 
 import json
+import math
 import os
 import sys
 import logging
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
 from tqdm import tqdm
 import asyncio
 
@@ -35,10 +40,13 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 初始化配置
+settings = Settings()
+
 class RAGEvaluator:
     """RAG检索评估器"""
     
-    def __init__(self, use_dense=True, use_sparse=True, use_rerank=True):
+    def __init__(self, use_dense=True, use_sparse=True, use_rerank=True, search_profile="accurate"):
         """
         初始化评估器
         
@@ -46,10 +54,12 @@ class RAGEvaluator:
             use_dense: 是否使用稠密检索（向量检索）
             use_sparse: 是否使用稀疏检索（关键词检索）
             use_rerank: 是否使用重排序
+            search_profile: 稠密检索档位（见MILVUS_SEARCH_PROFILES），评估默认使用高召回的accurate
         """
         self.use_dense = use_dense
         self.use_sparse = use_sparse
         self.use_rerank = use_rerank
+        self.search_profile = search_profile
         
         # 初始化检索器（不需要生成器，只测试检索）
         self.retriever = HybridRetriever(
@@ -58,7 +68,7 @@ class RAGEvaluator:
             use_rerank=use_rerank
         )
         
-        logger.info(f"RAG评估器初始化完成 - Dense: {use_dense}, Sparse: {use_sparse}, Rerank: {use_rerank}")
+        logger.info(f"RAG评估器初始化完成 - Dense: {use_dense}, Sparse: {use_sparse}, Rerank: {use_rerank}, 检索档位: {search_profile}")
     
     def load_test_dataset(self, dataset_path: str) -> List[Dict[str, Any]]:
         """
@@ -117,114 +127,161 @@ class RAGEvaluator:
         Returns:
             是否命中正确文档
         """
-        reference_info = self.extract_reference_info(reference)
+        return self.find_hit_rank(retrieved_docs, reference) is not None
+    
+    def find_hit_rank(self, retrieved_docs: List[Dict[str, Any]], reference: str) -> Optional[int]:
+        """
+        查找正确参考文档在检索结果中的排名
         
-        for doc in retrieved_docs:
-            # 检查文档内容是否包含参考法条
-            doc_content = doc.get('content', '')
-            doc_name = doc.get('document_name', '')
+        Args:
+            retrieved_docs: 检索到的文档列表（按相关性排序）
+            reference: 正确的参考文档
             
-            # 方法1: 检查文档内容是否包含完整的参考信息
-            if reference in doc_content:
+        Returns:
+            第一个命中文档的排名（从1开始），未命中返回None
+        """
+        reference_info = self.extract_reference_info(reference)
+        
+        for rank, doc in enumerate(retrieved_docs, start=1):
+            if self._doc_matches(doc, reference, reference_info):
+                return rank
+        
+        return None
+    
+    def _doc_matches(self, doc: Dict[str, Any], reference: str, reference_info: Dict[str, str]) -> bool:
+        """检查单个文档是否为正确的参考法条"""
+        # 检查文档内容是否包含参考法条
+        doc_content = doc.get('content', '')
+        doc_name = doc.get('document_name', '')
+        
+        # 方法1: 检查文档内容是否包含完整的参考信息
+        if reference in doc_content:
+            return True
+        
+        # 方法2: 检查法律名称和条文号是否匹配
+        law_name = reference_info['law_name']
+        article = reference_info['article']
+        
+        if law_name in doc_name or law_name in doc_content:
+            if article and (f"第{article}条" in doc_content or f"第 {article} 条" in doc_content):
                 return True
+        
+        # 方法3: 模糊匹配（处理可能的格式差异）
+        if law_name in doc_content and article:
+            # 检查是否包含条文号（考虑不同格式）
+            article_patterns = [
+                f"第{article}条",
+                f"第 {article} 条", 
+                f"第{article}條",
+                f"第{article.zfill(2)}条",  # 补零格式
+                f"第{article.zfill(3)}条"   # 三位数格式
+            ]
             
-            # 方法2: 检查法律名称和条文号是否匹配
-            law_name = reference_info['law_name']
-            article = reference_info['article']
-            
-            if law_name in doc_name or law_name in doc_content:
-                if article and (f"第{article}条" in doc_content or f"第 {article} 条" in doc_content):
+            for pattern in article_patterns:
+                if pattern in doc_content:
                     return True
-            
-            # 方法3: 模糊匹配（处理可能的格式差异）
-            if law_name in doc_content and article:
-                # 检查是否包含条文号（考虑不同格式）
-                article_patterns = [
-                    f"第{article}条",
-                    f"第 {article} 条", 
-                    f"第{article}條",
-                    f"第{article.zfill(2)}条",  # 补零格式
-                    f"第{article.zfill(3)}条"   # 三位数格式
-                ]
-                
-                for pattern in article_patterns:
-                    if pattern in doc_content:
-                        return True
         
         return False
     
-    def evaluate_retrieval(self, test_data: List[Dict[str, Any]], top_k_list: List[int] = [5, 10, 20]) -> Dict[str, Any]:
+    def _evaluate_batch(self, items: List[Dict[str, Any]], max_k: int) -> List[Dict[str, Any]]:
+        """
+        按最大的top-k批量检索一组问题，记录每个问题正确文档的排名
+        一组问题的稠密检索在一次向量化和一次Milvus请求中完成
+        
+        Args:
+            items: 一组测试数据
+            max_k: 最大的top-k值
+            
+        Returns:
+            每个问题的详细结果
+        """
+        details = [{
+            'uuid': item['uuid'],
+            'question': item['question'],
+            'reference': item['reference'],
+        } for item in items]
+        try:
+            batch_docs = self.retriever.hybridRetrieveBatch([item['question'] for item in items], max_k, self.search_profile)
+        except Exception as e:
+            logger.error(f"处理问题 {[item['uuid'] for item in items]} 时出错: {e}")
+            for detail in details:
+                detail['hit_rank'] = None
+                detail['error'] = str(e)
+            return details
+        for item, detail, retrieved_docs in zip(items, details, batch_docs):
+            detail['hit_rank'] = self.find_hit_rank(retrieved_docs, item['reference'])
+            detail['retrieved_count'] = len(retrieved_docs)
+            detail['top_doc_scores'] = [doc.get('score', 0) for doc in retrieved_docs[:3]]  # 前3个文档的分数
+        return details
+    
+    def evaluate_retrieval(self, test_data: List[Dict[str, Any]], top_k_list: List[int] = [5, 10, 20],
+                           max_workers: int = 4, batch_size: int = 16) -> Dict[str, Any]:
         """
         评估检索性能
         
+        每个问题只检索一次（k取top_k_list中的最大值），各个k的指标都从同一个排序列表计算：
+        - Hit@k: 正确文档排名 <= k
+        - MRR@k: 排名 <= k 时为 1/排名，否则为0
+        - nDCG@k: 每个问题只有一个正确文档，理想DCG为1，排名 <= k 时为 1/log2(排名+1)
+        
         Args:
             test_data: 测试数据列表
             top_k_list: 要测试的top-k值列表
+            max_workers: 并发检索的批次数
+            batch_size: 每批问题数，一批问题的稠密检索合并为一次Milvus请求
             
         Returns:
             评估结果字典
         """
         results = {
             'total_questions': len(test_data),
+            # 向量库配置，对比不同索引类型/降维维度的评估结果时区分来源
+            'vector_config': {
+                'collection': settings.MILVUS_COLLECTION,
+                'reduced_dim': settings.EMBEDDING_REDUCED_DIM,
+                'search_profile': self.search_profile,
+            },
             'top_k_results': {},
             'detailed_results': []
         }
         
-        logger.info(f"开始评估检索性能，共 {len(test_data)} 个问题")
+        max_k = max(top_k_list)
+        logger.info(f"开始评估检索性能，共 {len(test_data)} 个问题，检索深度 Top-{max_k}，并发数 {max_workers}")
         
+        # 按批检索，有界线程池并发处理多个批次，executor.map保持结果顺序与test_data一致
+        batches = [test_data[i:i + batch_size] for i in range(0, len(test_data), batch_size)]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            detailed_results = [
+                detail
+                for details in tqdm(
+                    executor.map(lambda items: self._evaluate_batch(items, max_k), batches),
+                    total=len(batches),
+                    desc="检索评估进度"
+                )
+                for detail in details
+            ]
+        
+        total = len(test_data)
         for top_k in top_k_list:
-            logger.info(f"评估 Top-{top_k} 检索性能")
-            hit_count = 0
-            detailed_results = []
-            
-            # 使用tqdm显示进度条
-            for i, item in enumerate(tqdm(test_data, desc=f"Top-{top_k} 评估进度")):
-                question = item['question']
-                reference = item['reference']
-                uuid = item['uuid']
-                
-                try:
-                    # 执行检索
-                    retrieved_docs = self.retriever.hybridRetrieve(question, top_k)
-                    
-                    # 检查是否命中
-                    is_hit = self.check_hit(retrieved_docs, reference)
-                    
-                    if is_hit:
-                        hit_count += 1
-                    
-                    # 记录详细结果
-                    detail = {
-                        'uuid': uuid,
-                        'question': question,
-                        'reference': reference,
-                        'is_hit': is_hit,
-                        'retrieved_count': len(retrieved_docs),
-                        'top_doc_scores': [doc.get('score', 0) for doc in retrieved_docs[:3]]  # 前3个文档的分数
-                    }
-                    detailed_results.append(detail)
-                    
-                except Exception as e:
-                    logger.error(f"处理问题 {i+1} 时出错: {e}")
-                    detail = {
-                        'uuid': uuid,
-                        'question': question,
-                        'reference': reference,
-                        'is_hit': False,
-                        'error': str(e)
-                    }
-                    detailed_results.append(detail)
-            
-            # 计算Hit Rate
-            hit_rate = hit_count / len(test_data) if test_data else 0
+            ranks = [d['hit_rank'] for d in detailed_results if d['hit_rank'] is not None and d['hit_rank'] <= top_k]
+            hit_count = len(ranks)
+            hit_rate = hit_count / total if total else 0
+            mrr = sum(1.0 / rank for rank in ranks) / total if total else 0
+            ndcg = sum(1.0 / math.log2(rank + 1) for rank in ranks) / total if total else 0
             
             results['top_k_results'][f'top_{top_k}'] = {
                 'hit_count': hit_count,
                 'hit_rate': hit_rate,
-                'total_questions': len(test_data)
+                'mrr': mrr,
+                'ndcg': ndcg,
+                'total_questions': total
             }
             
-            logger.info(f"Top-{top_k} Hit Rate: {hit_rate:.4f} ({hit_count}/{len(test_data)})")
+            logger.info(f"Top-{top_k} Hit Rate: {hit_rate:.4f} ({hit_count}/{total}), MRR: {mrr:.4f}, nDCG: {ndcg:.4f}")
+        
+        for detail in detailed_results:
+            rank = detail['hit_rank']
+            detail['is_hit'] = {f'top_{k}': rank is not None and rank <= k for k in top_k_list}
         
         results['detailed_results'] = detailed_results
         return results
@@ -256,6 +313,8 @@ class RAGEvaluator:
         print("="*60)
         print(f"总问题数: {results['total_questions']}")
         print(f"检索配置: Dense={self.use_dense}, Sparse={self.use_sparse}, Rerank={self.use_rerank}")
+        vector_config = results.get('vector_config', {})
+        print(f"向量库配置: 集合={vector_config.get('collection')}, 降维={vector_config.get('reduced_dim') or '不降维'}, 检索档位={vector_config.get('search_profile')}")
         print("-"*60)
         
         for key, result in results['top_k_results'].items():
@@ -264,7 +323,8 @@ class RAGEvaluator:
             hit_count = result['hit_count']
             total = result['total_questions']
             
-            print(f"Top-{top_k:2s} Hit Rate: {hit_rate:.4f} ({hit_count:3d}/{total:3d}) - {hit_rate*100:.2f}%")
+            print(f"Top-{top_k:2s} Hit Rate: {hit_rate:.4f} ({hit_count:3d}/{total:3d}) - {hit_rate*100:.2f}%  "
+                  f"MRR: {result['mrr']:.4f}  nDCG: {result['ndcg']:.4f}")
         
         print("="*60)
 
@@ -277,11 +337,14 @@ def main():
 
     # TOP_K_LIST = [5, 10, 20]  # 要测试的top-k值
     TOP_K_LIST = [1,3,5,10,20]
+    MAX_WORKERS = 4  # 并发检索的批次数，受Milvus/ES连接和模型推理能力限制
+    BATCH_SIZE = 16  # 每批问题数，一批问题的稠密检索合并为一次Milvus请求
     
     # 检索配置 - 可以根据需要调整
     USE_DENSE = True    # 是否使用向量检索
     USE_SPARSE = True  # 是否使用关键词检索  
     USE_RERANK = True   # 是否使用重排序
+    SEARCH_PROFILE = "accurate"  # 稠密检索档位
     
     try:
         # 检查数据集文件是否存在
@@ -293,7 +356,8 @@ def main():
         evaluator = RAGEvaluator(
             use_dense=USE_DENSE,
             use_sparse=USE_SPARSE,
-            use_rerank=USE_RERANK
+            use_rerank=USE_RERANK,
+            search_profile=SEARCH_PROFILE
         )
         
         # 加载测试数据
@@ -303,7 +367,7 @@ def main():
             return
         
         # 执行评估
-        results = evaluator.evaluate_retrieval(test_data, TOP_K_LIST)
+        results = evaluator.evaluate_retrieval(test_data, TOP_K_LIST, MAX_WORKERS, BATCH_SIZE)
         
         # 保存结果
         evaluator.save_results(results, OUTPUT_PATH)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+HNSW检索档位基准测试脚本
+对MILVUS_SEARCH_PROFILES中的每个档位，统计recall@k（相对暴力检索的精确近邻）与单次检索延迟，
+输出表格和JSON结果，并绘制recall@k-延迟曲线
+
+精确近邻：从集合中读出全部有效法条的向量，用numpy计算余弦相似度得到，与服务端相同的is_effective过滤
+
+用法:
+python benchmark_search_profiles.py                                   # 连接配置中的Milvus服务
+python benchmark_search_profiles.py --uri ./milvus_lite.db            # 使用本地Milvus Lite
+python benchmark_search_profiles.py --collection finetune_data --num-queries 200 --k 5 10 20
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import numpy as np
+
+# 添加项目路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from pymilvus import connections, Collection
+from backend.app.core.config import Settings
+from backend.app.db.milvus import VectorStore
+from backend.app.models.Embeddings.bge_embedding import BGEEmbedding
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 初始化配置
+settings = Settings()
+
+FILTER_EXPR = "is_effective == True"
+
+
+def connect(uri: str = None):
+    """连接Milvus，指定uri时连接该地址（如Milvus Lite的本地文件），否则使用配置中的服务地址"""
+    if uri:
+        connections.connect(alias="default", uri=uri)
+        logger.info(f"已连接到Milvus: {uri}")
+    else:
+        VectorStore()
+
+
+def load_questions(dataset_path: str, num_queries: int) -> list:
+    """加载评估问题，每行为包含question字段的JSON"""
+    questions = []
+    with open(dataset_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                questions.append(json.loads(line)["question"])
+            if len(questions) >= num_queries:
+                break
+    return questions
+
+
+def load_corpus(collection: Collection, batch_size: int = 1000):
+    """读出集合中全部有效法条的uuid和向量"""
+    ids, vectors = [], []
+    iterator = collection.query_iterator(batch_size=batch_size, expr=FILTER_EXPR, output_fields=["uuid", "embedding"])
+    while True:
+        batch = iterator.next()
+        if not batch:
+            iterator.close()
+            break
+        for row in batch:
+            ids.append(row["uuid"])
+            vectors.append(row["embedding"])
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    logger.info(f"读取法条向量: {len(ids)} 条")
+    return ids, matrix
+
+
+def exact_neighbours(query_vectors: np.ndarray, ids: list, matrix: np.ndarray, k: int) -> list:
+    """暴力计算每个查询的前k个精确近邻"""
+    scores = query_vectors @ matrix.T
+    top = np.argsort(-scores, axis=1)[:, :k]
+    return [[ids[j] for j in row] for row in top]
+
+
+def benchmark_profile(collection: Collection, query_vectors: np.ndarray, ground_truth: list,
+                      profile: str, k_list: list) -> dict:
+    """按档位逐条检索，统计各k下的recall与延迟"""
+    max_k = max(k_list)
+    ef = VectorStore.search_ef(profile, max_k)
+    search_params = {"metric_type": "COSINE", "params": {"ef": ef}}
+    latencies, retrieved = [], []
+    for query_vector in query_vectors:
+        start_time = time.perf_counter()
+        results = collection.search(
+            data=[query_vector.tolist()],
+            anns_field="embedding",
+            param=search_params,
+            limit=max_k,
+            expr=FILTER_EXPR
+        )
+        latencies.append((time.perf_counter() - start_time) * 1000)
+        retrieved.append([hit.id for hit in results[0]])
+
+    recall = {
+        k: float(np.mean([len(set(r[:k]) & set(g[:k])) / k for r, g in zip(retrieved, ground_truth)]))
+        for k in k_list
+    }
+    return {
+        "profile": profile,
+        "ef": ef,
+        "recall": recall,
+        "latency_ms": {
+            "mean": float(np.mean(latencies)),
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+        },
+    }
+
+
+def print_table(results: list, k_list: list):
+    """打印各档位的recall@k与延迟"""
+    print("\n" + "=" * 80)
+    header = f"{'档位':10s} {'ef':>5s} " + " ".join(f"{'R@' + str(k):>7s}" for k in k_list) + f" {'mean(ms)':>9s} {'p50(ms)':>8s} {'p95(ms)':>8s}"
+    print(header)
+    print("-" * 80)
+    for result in results:
+        recall = " ".join(f"{result['recall'][k]:7.4f}" for k in k_list)
+        latency = result["latency_ms"]
+        marker = " <- MILVUS_SEARCH_PROFILE" if result["profile"] == settings.MILVUS_SEARCH_PROFILE else ""
+        print(f"{result['profile']:10s} {result['ef']:5d} {recall} {latency['mean']:9.2f} {latency['p50']:8.2f} {latency['p95']:8.2f}{marker}")
+    print("=" * 80)
+
+
+def plot(results: list, k_list: list, output_path: str):
+    """绘制recall@k-延迟曲线，每个k一条曲线，点为各档位"""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        logger.warning("未安装matplotlib，跳过绘图")
+        return
+    fig, ax = plt.subplots(figsize=(8, 5))
+    latencies = [result["latency_ms"]["p50"] for result in results]
+    for k in k_list:
+        ax.plot(latencies, [result["recall"][k] for result in results], marker="o", label=f"recall@{k}")
+    for result, latency in zip(results, latencies):
+        ax.annotate(f"{result['profile']}(ef={result['ef']})", (latency, result["recall"][max(k_list)]),
+                    textcoords="offset points", xytext=(4, 4), fontsize=8)
+    ax.set_xlabel("p50 latency (ms)")
+    ax.set_ylabel("recall")
+    ax.set_title("HNSW search profiles: recall vs latency")
+    ax.grid(True, alpha=0.3)
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(output_path, dpi=150)
+    logger.info(f"曲线已保存: {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HNSW检索档位recall@k与延迟基准测试")
+    parser.add_argument("--uri", default=None, help="Milvus地址，如Milvus Lite的本地文件./milvus_lite.db；默认使用配置中的服务地址")
+    parser.add_argument("--collection", default=settings.MILVUS_COLLECTION, help="集合名称")
+    parser.add_argument("--dataset", default="../data/qa_dataset.jsonl", help="评估问题文件(jsonl)，每行包含question字段")
+    parser.add_argument("--num-queries", type=int, default=100, help="使用的问题数")
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10, 20], help="统计recall的k值")
+    parser.add_argument("--profiles", nargs="+", default=list(settings.MILVUS_SEARCH_PROFILES), help="测试的档位")
+    parser.add_argument("--output", default="search_profile_benchmark.json", help="结果保存路径")
+    parser.add_argument("--plot", default="search_profile_benchmark.png", help="曲线图保存路径")
+    args = parser.parse_args()
+
+    connect(args.uri)
+    collection = Collection(args.collection)
+    collection.load()
+
+    questions = load_questions(args.dataset, args.num_queries)
+    query_vectors = np.asarray(BGEEmbedding().encode(questions, normalize=True), dtype=np.float32)
+    ids, matrix = load_corpus(collection)
+    ground_truth = exact_neighbours(query_vectors, ids, matrix, max(args.k))
+
+    # 预热，避免首次检索的连接和缓存开销计入延迟
+    benchmark_profile(collection, query_vectors[:5], ground_truth[:5], args.profiles[0], args.k)
+    results = [benchmark_profile(collection, query_vectors, ground_truth, profile, args.k) for profile in args.profiles]
+
+    print_table(results, args.k)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({"collection": args.collection, "num_queries": len(questions), "results": results}, f, ensure_ascii=False, indent=2)
+    logger.info(f"结果已保存: {args.output}")
+    plot(results, args.k, args.plot)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+向量索引迁移与对比脚本
+把已有集合（默认MILVUS_COLLECTION）的数据复制到使用另一种向量索引的新集合，不重新向量化；
+有损索引（IVF_PQ/BIN_FLAT）同时写入浮点向量存储，供检索后重排。
+指定--reduced-dim时在源集合的向量上拟合降维投影，目标集合存储降维后的向量，全维向量写入浮点向量存储用于重排。
+迁移完成后输出源集合与目标集合的recall@k、检索延迟、内存占用对比报告。
+
+降维投影按目标集合名保存，服务端检索时按集合加载，不会覆盖其他集合的投影。
+
+迁移不修改源集合，确认报告后把MILVUS_COLLECTION指向新集合并重启服务即可切换，
+回退时改回原配置。
+
+用法:
+python migrate_vector_index.py --index-type IVF_SQ8 --target legal_documents_sq8
+python migrate_vector_index.py --index-type BIN_FLAT --target legal_documents_bin --overwrite
+python migrate_vector_index.py --report-only --collections legal_documents legal_documents_sq8 legal_documents_bin
+python migrate_vector_index.py --uri ./milvus_lite.db --index-type IVF_PQ --target legal_documents_pq
+python migrate_vector_index.py --index-type HNSW --reduced-dim 256 --target legal_documents_pca256
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+from pathlib import Path
+import numpy as np
+from tqdm import tqdm
+
+# 添加项目路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from pymilvus import Collection, FieldSchema, utility
+from backend.app.core.config import Settings
+from backend.app.db.milvus import VectorStore, embedding_field, SUPPORTED_INDEX_TYPES, BINARY_INDEX_TYPES, RESCORE_INDEX_TYPES
+from backend.app.db.embedding_store import EmbeddingStore, binarize_embeddings
+from backend.app.models.Embeddings.bge_embedding import BGEEmbedding
+from backend.app.models.Embeddings.dim_reduction import EmbeddingProjector, REDUCTION_METHODS, projection_path
+from benchmark_search_profiles import connect, load_questions, exact_neighbours, FILTER_EXPR
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 初始化配置
+settings = Settings()
+
+# 浮点向量存储目录，路径相对于backend目录，与服务端读取的位置一致
+EMBEDDING_STORE_DIR = Path("../backend") / settings.EMBEDDING_STORE_DIR
+PROJECTION_DIR = Path("../backend") / settings.EMBEDDING_PROJECTION_DIR
+
+
+def read_collection(collection: Collection, batch_size: int = 1000) -> dict:
+    """读出集合的全部数据，返回字段名到列数据的映射"""
+    field_names = [field.name for field in collection.schema.fields]
+    columns = {name: [] for name in field_names}
+    iterator = collection.query_iterator(batch_size=batch_size, output_fields=field_names)
+    with tqdm(total=collection.num_entities, desc=f"读取 {collection.name}") as progress:
+        while True:
+            batch = iterator.next()
+            if not batch:
+                iterator.close()
+                break
+            for row in batch:
+                for name in field_names:
+                    columns[name].append(row[name])
+            progress.update(len(batch))
+    return columns
+
+
+def vector_dim(collection: Collection) -> int:
+    """集合embedding字段的维度"""
+    return next(field.params["dim"] for field in collection.schema.fields if field.name == "embedding")
+
+
+def target_fields(source: Collection, index_type: str, dim: int = None) -> list:
+    """复制源集合的字段定义，embedding字段按目标索引类型和维度替换"""
+    fields = []
+    for field in source.schema.fields:
+        if field.name == "embedding":
+            fields.append(embedding_field(index_type, dim or field.params["dim"]))
+        else:
+            fields.append(FieldSchema(name=field.name, dtype=field.dtype, is_primary=field.is_primary,
+                                      auto_id=field.auto_id, **field.params))
+    return fields
+
+
+def migrate(vector_store: VectorStore, source: Collection, columns: dict, target_name: str, index_type: str,
+            overwrite: bool = False, batch_size: int = 1000, projector: EmbeddingProjector = None):
+    """
+    把源集合的数据（read_collection的结果）复制到使用index_type索引的目标集合
+    projector不为None时，目标集合存储投影后的降维向量
+    """
+    if vector_store.check_collection_exists(target_name):
+        if not overwrite:
+            raise Exception(f"目标集合 {target_name} 已存在，使用--overwrite覆盖")
+        vector_store.drop_collection(target_name)
+
+    uuids, embeddings = columns["uuid"], np.asarray(columns["embedding"], dtype=np.float32)
+    logger.info(f"源集合 {source.name}: {len(uuids)} 条，维度 {embeddings.shape[1]}")
+    columns = dict(columns)
+
+    fields = target_fields(source, index_type, projector.dim if projector else None)
+    description = f"{source.description}（{index_type}索引{f'，降维至{projector.dim}维' if projector else ''}）"
+    collection = vector_store.create_collection(
+        fields=fields,
+        collection_name=target_name,
+        description=description,
+        index_type=index_type
+    )
+    if not collection:
+        raise Exception("创建集合失败")
+
+    if projector is not None or index_type in RESCORE_INDEX_TYPES:
+        EmbeddingStore.write(str(EMBEDDING_STORE_DIR / target_name), uuids, embeddings)
+    if projector is not None:
+        embeddings = projector.transform(embeddings)
+        columns["embedding"] = embeddings.tolist()
+    if index_type in BINARY_INDEX_TYPES:
+        columns["embedding"] = binarize_embeddings(embeddings)
+
+    field_names = [field.name for field in fields]
+    for i in tqdm(range(0, len(uuids), batch_size), desc="插入数据"):
+        batch_entities = [columns[name][i:i + batch_size] for name in field_names]
+        if not vector_store.insert_vectors(target_name, batch_entities):
+            raise Exception(f"批次 {i // batch_size + 1} 插入失败")
+    collection.flush()
+    logger.info(f"迁移完成: {source.name} -> {target_name} ({index_type})")
+
+
+def estimate_index_bytes(index_type: str, count: int, dim: int) -> int:
+    """按索引结构估算向量索引的内存占用（字节），不含标量字段"""
+    if index_type == "HNSW":
+        # 原始float32向量 + 每个节点约2*M条边（int32）
+        return count * (dim * 4 + 2 * settings.MILVUS_HNSW_M * 4)
+    if index_type == "IVF_SQ8":
+        return count * dim + settings.MILVUS_IVF_NLIST * dim * 4
+    if index_type == "IVF_PQ":
+        codebooks = settings.MILVUS_PQ_M * (2 ** settings.MILVUS_PQ_NBITS) * (dim // settings.MILVUS_PQ_M) * 4
+        return count * settings.MILVUS_PQ_M * settings.MILVUS_PQ_NBITS // 8 + settings.MILVUS_IVF_NLIST * dim * 4 + codebooks
+    if index_type in BINARY_INDEX_TYPES:
+        return count * dim // 8
+    return count * dim * 4
+
+
+def loaded_memory_bytes(collection_name: str) -> int:
+    """Milvus上已加载分段的内存占用，无法获取时返回0"""
+    try:
+        return sum(segment.mem_size for segment in utility.get_query_segment_info(collection_name))
+    except Exception as e:
+        logger.warning(f"获取集合 {collection_name} 的分段内存失败: {e}")
+        return 0
+
+
+def evaluate_collection(vector_store: VectorStore, collection_name: str, query_vectors: np.ndarray,
+                        ground_truth: list, k_list: list, profile: str, model_path: str = None) -> dict:
+    """
+    逐条检索，统计recall@k、延迟和内存
+    集合维度低于查询向量时为降维集合，与服务端一致：用该集合的投影降维后检索，再用全维向量重排（投影耗时计入延迟）
+    """
+    max_k = max(k_list)
+    vector_store.ensure_loaded(collection_name)
+    index_type = vector_store.get_index_type(collection_name)
+    collection = Collection(collection_name)
+    dim = vector_dim(collection)
+    reduced = dim != query_vectors.shape[1]
+    projector = vector_store.get_projector(collection_name, model_path) if reduced else None
+    if reduced and projector is None:
+        raise Exception(f"集合 {collection_name} 为 {dim} 维，需要对应维度的降维投影: {projection_path(str(PROJECTION_DIR), collection_name)}")
+    latencies, retrieved = [], []
+    for query_vector in query_vectors:
+        start_time = time.perf_counter()
+        if reduced:
+            hits = vector_store.search_vectors_batch(collection_name, [projector.transform(query_vector).tolist()],
+                                                     limit=max_k, output_fields=["uuid"], expr=FILTER_EXPR,
+                                                     profile=profile, rescore_embeddings=[query_vector.tolist()])[0]
+        else:
+            hits = vector_store.search_vectors(collection_name, query_vector.tolist(), limit=max_k,
+                                               output_fields=["uuid"], expr=FILTER_EXPR, profile=profile)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+        retrieved.append([hit["uuid"] for hit in hits])
+
+    count = collection.num_entities
+    store = vector_store.get_embedding_store(collection_name)
+    return {
+        "collection": collection_name,
+        "index_type": index_type,
+        "dim": dim,
+        "rescored": (reduced or index_type in RESCORE_INDEX_TYPES) and store.exists(),
+        "count": count,
+        "recall": {k: float(np.mean([len(set(r[:k]) & set(g[:k])) / k for r, g in zip(retrieved, ground_truth)]))
+                   for k in k_list},
+        "latency_ms": {
+            "mean": float(np.mean(latencies)),
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+        },
+        "estimated_index_mb": estimate_index_bytes(index_type, count, dim) / 2 ** 20,
+        "loaded_memory_mb": loaded_memory_bytes(collection_name) / 2 ** 20,
+    }
+
+
+def print_report(results: list, k_list: list):
+    """打印对比表"""
+    print("\n" + "=" * 110)
+    print(f"{'集合':28s} {'索引':9s} {'维度':>5s} {'重排':4s} " + " ".join(f"{'R@' + str(k):>7s}" for k in k_list)
+          + f" {'p50(ms)':>8s} {'p95(ms)':>8s} {'索引估算(MB)':>12s} {'加载内存(MB)':>12s}")
+    print("-" * 110)
+    for result in results:
+        recall = " ".join(f"{result['recall'][k]:7.4f}" for k in k_list)
+        print(f"{result['collection']:28s} {result['index_type']:9s} {result['dim']:5d} {'是' if result['rescored'] else '否':4s} {recall} "
+              f"{result['latency_ms']['p50']:8.2f} {result['latency_ms']['p95']:8.2f} "
+              f"{result['estimated_index_mb']:12.1f} {result['loaded_memory_mb']:12.1f}")
+    print("=" * 110)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量索引迁移与recall/延迟/内存对比")
+    parser.add_argument("--uri", default=None, help="Milvus地址，如Milvus Lite的本地文件；默认使用配置中的服务地址")
+    parser.add_argument("--source", default=settings.MILVUS_COLLECTION, help="源集合")
+    parser.add_argument("--target", default=None, help="目标集合，默认为 源集合_索引类型")
+    parser.add_argument("--index-type", default="IVF_SQ8", choices=SUPPORTED_INDEX_TYPES, help="目标集合的向量索引类型")
+    parser.add_argument("--overwrite", action="store_true", help="目标集合已存在时删除重建")
+    parser.add_argument("--reduced-dim", type=int, default=0, help="目标集合降维后的维度，0为不降维")
+    parser.add_argument("--reduction-method", default=settings.EMBEDDING_REDUCTION_METHOD, choices=REDUCTION_METHODS, help="降维方式")
+    parser.add_argument("--report-only", action="store_true", help="不迁移，只对比--collections中的集合")
+    parser.add_argument("--collections", nargs="+", default=None, help="参与对比的集合，默认为源集合和目标集合")
+    parser.add_argument("--dataset", default="../data/qa_dataset.jsonl", help="评估问题文件(jsonl)，每行包含question字段")
+    parser.add_argument("--num-queries", type=int, default=100, help="使用的问题数")
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10, 20], help="统计recall的k值")
+    parser.add_argument("--profile", default=None, help="检索档位，默认使用MILVUS_SEARCH_PROFILE")
+    parser.add_argument("--output", default="vector_index_report.json", help="报告保存路径")
+    args = parser.parse_args()
+
+    connect(args.uri)
+    vector_store = VectorStore(embedding_store_dir=str(EMBEDDING_STORE_DIR), projection_dir=str(PROJECTION_DIR))
+    target = args.target or f"{args.source}_{args.index_type.lower()}"
+    source = Collection(args.source)
+    source.load()
+    columns = read_collection(source)
+    embedding_model = BGEEmbedding()
+    if not args.report_only:
+        projector = None
+        if args.reduced_dim:
+            projector = EmbeddingProjector.fit(columns["embedding"], args.reduced_dim, args.reduction_method, embedding_model.model_path)
+            projector.save(projection_path(str(PROJECTION_DIR), target))
+        migrate(vector_store, source, columns, target, args.index_type, args.overwrite, projector=projector)
+    collections = args.collections or [args.source, target]
+
+    # 精确近邻以源集合的浮点向量为准
+    effective = [i for i, is_effective in enumerate(columns["is_effective"]) if is_effective]
+    ids = [columns["uuid"][i] for i in effective]
+    matrix = np.asarray([columns["embedding"][i] for i in effective], dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    questions = load_questions(args.dataset, args.num_queries)
+    query_vectors = np.asarray(embedding_model.encode(questions, normalize=True), dtype=np.float32)
+    ground_truth = exact_neighbours(query_vectors, ids, matrix, max(args.k))
+
+    results = [evaluate_collection(vector_store, name, query_vectors, ground_truth, args.k, args.profile, embedding_model.model_path)
+               for name in collections]
+    print_report(results, args.k)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({"num_queries": len(questions), "results": results}, f, ensure_ascii=False, indent=2)
+    logger.info(f"报告已保存: {args.output}")
+    if not args.report_only:
+        print(f"\n确认报告后，设置 MILVUS_COLLECTION={target} 并重启服务即可切换到新索引")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+ONNX导出与一致性校验脚本
+将BGE嵌入模型和重排序模型导出为ONNX（可选int8动态量化），
+并对比torch与onnxruntime在样例法律文本上的输出，校验两者一致
+
+用法:
+python onnx_export.py --task all            # 导出fp32模型并校验
+python onnx_export.py --task all --quantize # 导出并量化为int8，再校验
+python onnx_export.py --task embedding --check-only
+"""
+
+import os
+import sys
+import argparse
+import logging
+import numpy as np
+
+# 添加项目路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from backend.app.core.config import Settings
+from backend.app.models.onnx_backend import (
+    OnnxModelSession,
+    export_to_onnx,
+    get_onnx_model_path,
+    onnx_model_matches,
+    quantize_onnx,
+)
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 初始化配置
+settings = Settings()
+
+SAMPLE_QUERIES = [
+    "注册公司需要什么材料？",
+    "公司法第二十九条",
+    "股东未按期缴纳出资应当承担什么责任",
+]
+
+SAMPLE_DOCS = [
+    "第二十九条 设立公司，应当依法向公司登记机关申请设立登记。",
+    "第四十九条 股东应当按期足额缴纳公司章程规定的各自所认缴的出资额。股东未按期足额缴纳出资的，除应当向公司足额缴纳外，还应当对给公司造成的损失承担赔偿责任。",
+    "第一百四十条 上市公司应当依法披露股东、实际控制人的信息，相关信息应当真实、准确、完整。",
+    "第十条 劳动者与用人单位建立劳动关系，应当订立劳动合同。",
+]
+
+# 一致性阈值: (fp32, int8)
+EMBEDDING_MIN_COSINE = (0.9999, 0.99)
+RERANKER_MAX_ABS_DIFF = (1e-3, 0.5)
+
+
+def export(task: str, model_path: str, quantize: bool) -> str:
+    """导出（并可选量化）指定任务的模型"""
+    fp32_path = get_onnx_model_path(task, quantized=False)
+    export_to_onnx(model_path, fp32_path, task)
+    if not quantize:
+        return fp32_path
+    return quantize_onnx(fp32_path, get_onnx_model_path(task, quantized=True))
+
+
+def check_embedding(onnx_path: str, quantize: bool) -> bool:
+    """对比嵌入模型CLS向量（L2归一化后）的余弦相似度"""
+    import torch
+    from transformers import AutoTokenizer, AutoModel
+
+    tokenizer = AutoTokenizer.from_pretrained(settings.EMBEDDING_MODEL_PATH, local_files_only=True)
+    model = AutoModel.from_pretrained(settings.EMBEDDING_MODEL_PATH, local_files_only=True).eval()
+    texts = SAMPLE_QUERIES + SAMPLE_DOCS
+    inputs = tokenizer(texts, padding=True, truncation=True, max_length=512, return_tensors="pt")
+
+    with torch.no_grad():
+        torch_out = model(**inputs).last_hidden_state[:, 0].numpy()
+    onnx_out = OnnxModelSession(onnx_path).run(inputs)
+
+    torch_out = torch_out / np.linalg.norm(torch_out, axis=1, keepdims=True)
+    onnx_out = onnx_out / np.linalg.norm(onnx_out, axis=1, keepdims=True)
+    cosines = np.sum(torch_out * onnx_out, axis=1)
+    threshold = EMBEDDING_MIN_COSINE[1 if quantize else 0]
+    logger.info(f"嵌入模型一致性: 最小余弦相似度 {cosines.min():.6f}，平均 {cosines.mean():.6f}，阈值 {threshold}")
+    return bool(cosines.min() >= threshold)
+
+
+def check_reranker(onnx_path: str, quantize: bool) -> bool:
+    """对比重排序logits的最大绝对误差，以及每个查询下文档排序是否一致"""
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    tokenizer = AutoTokenizer.from_pretrained(settings.RERANKER_MODEL_PATH, local_files_only=True)
+    model = AutoModelForSequenceClassification.from_pretrained(settings.RERANKER_MODEL_PATH, local_files_only=True).eval()
+    pairs = [[query, doc] for query in SAMPLE_QUERIES for doc in SAMPLE_DOCS]
+    inputs = tokenizer(pairs, padding=True, truncation=True, max_length=512, return_tensors="pt")
+
+    with torch.no_grad():
+        torch_scores = model(**inputs).logits.view(-1).numpy()
+    onnx_scores = OnnxModelSession(onnx_path).run(inputs).reshape(-1)
+
+    max_diff = float(np.max(np.abs(torch_scores - onnx_scores)))
+    torch_rank = torch_scores.reshape(len(SAMPLE_QUERIES), -1).argsort(axis=1)
+    onnx_rank = onnx_scores.reshape(len(SAMPLE_QUERIES), -1).argsort(axis=1)
+    same_order = bool(np.array_equal(torch_rank, onnx_rank))
+    threshold = RERANKER_MAX_ABS_DIFF[1 if quantize else 0]
+    logger.info(f"重排序模型一致性: 最大绝对误差 {max_diff:.6f}，阈值 {threshold}，排序一致: {same_order}")
+    return max_diff <= threshold and same_order
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="导出ONNX模型并校验与torch输出的一致性")
+    parser.add_argument("--task", choices=["embedding", "reranker", "all"], default="all")
+    parser.add_argument("--quantize", action="store_true", help="导出后进行int8动态量化")
+    parser.add_argument("--check-only", action="store_true", help="只校验已导出的模型")
+    args = parser.parse_args()
+
+    tasks = ["embedding", "reranker"] if args.task == "all" else [args.task]
+    model_paths = {"embedding": settings.EMBEDDING_MODEL_PATH, "reranker": settings.RERANKER_MODEL_PATH}
+    checks = {"embedding": check_embedding, "reranker": check_reranker}
+
+    all_passed = True
+    for task in tasks:
+        if args.check_only:
+            onnx_path = get_onnx_model_path(task, quantized=args.quantize)
+        else:
+            onnx_path = export(task, model_paths[task], args.quantize)
+        # 来源不一致的模型服务端不会加载，校验输出没有意义
+        passed = onnx_model_matches(onnx_path, model_paths[task]) and checks[task](onnx_path, args.quantize)
+        logger.info(f"{task} 校验{'通过' if passed else '未通过'}: {onnx_path}")
+        all_passed = all_passed and passed
+
+    sys.exit(0 if all_passed else 1)
+
+
+if __name__ == "__main__":
+    main()
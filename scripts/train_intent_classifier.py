@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+意图分类器训练与评估脚本
+用BGE嵌入模型计算各意图的中心向量，按分层k折交叉验证评估准确率，
+并统计不同置信度阈值下本地分类器的覆盖率（无需回退LLM的比例）与准确率，
+以及当前INTENT_CONFIDENCE_THRESHOLD/INTENT_MIN_MARGIN下被误判为闲聊（跳过检索）的问题数；
+无上下文时只在新问题/闲聊两类中选择，与服务端一致单独统计，
+最后用全部样例计算中心向量并保存到INTENT_CENTROIDS_PATH
+
+用法:
+python train_intent_classifier.py                        # 使用intent_examples中的样例
+python train_intent_classifier.py --data intents.jsonl   # 使用标注文件，每行{"context": ..., "label": ...}
+python train_intent_classifier.py --eval-only --folds 5
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+from collections import defaultdict
+import numpy as np
+
+# 添加项目路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../backend')))
+
+from backend.app.core.config import Settings
+from backend.app.models.Embeddings.bge_embedding import BGEEmbedding
+from backend.app.chat_management.intent_classifier import IntentClassifier, CONTEXT_FREE_INTENTS
+from backend.app.chat_management.intent_examples import INTENT_EXAMPLES
+
+# 配置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 初始化配置
+settings = Settings()
+
+# 评估时统计的置信度阈值
+THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.9]
+# 不经过检索直接回答的意图，误判为该意图的法律问题得不到法条依据
+NO_RETRIEVAL_INTENT = "CASUAL_CHAT"
+
+
+def load_examples(data_path: str = None) -> dict:
+    """加载标注样例，返回意图到样例列表的映射"""
+    if not data_path:
+        return {label: list(texts) for label, texts in INTENT_EXAMPLES.items()}
+    examples = defaultdict(list)
+    with open(data_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                examples[item["label"]].append(item["context"])
+    return dict(examples)
+
+
+def cross_validate(classifier: IntentClassifier, examples: dict, folds: int, allowed_labels: tuple = None) -> list:
+    """
+    分层k折交叉验证
+    所有样例只向量化一次，每折用训练部分的向量直接计算中心向量
+    allowed_labels不为None时只评估这些意图的样例，并只在这些意图中选择（对应无上下文的请求）
+
+    Returns:
+        每个样例的(真实意图, 预测意图, 置信度, 差距)
+    """
+    labels = list(examples.keys())
+    vectors = {label: np.asarray(classifier.embedding.encode(texts, normalize=True), dtype=np.float32)
+               for label, texts in examples.items()}
+
+    predictions = []
+    for fold in range(folds):
+        centroids = []
+        for label in labels:
+            train = vectors[label][[i for i in range(len(vectors[label])) if i % folds != fold]]
+            centroid = train.mean(axis=0)
+            centroids.append(centroid / np.linalg.norm(centroid))
+        classifier.labels = labels
+        classifier.centroids = np.stack(centroids)
+
+        for label in labels:
+            if allowed_labels is not None and label not in allowed_labels:
+                continue
+            for i in range(fold, len(vectors[label]), folds):
+                predicted, confidence, margin = classifier.predict_embedding(vectors[label][i], allowed_labels)
+                predictions.append((label, predicted, confidence, margin))
+    return predictions
+
+
+def report(predictions: list, title: str = "交叉验证"):
+    """打印整体/分意图准确率，各置信度阈值下的覆盖率与准确率，以及当前配置下被误判为闲聊的问题"""
+    total = len(predictions)
+    if not total:
+        return
+    correct = sum(1 for label, predicted, _, _ in predictions if label == predicted)
+    print("\n" + "=" * 60)
+    print(f"{title}准确率: {correct / total:.4f} ({correct}/{total})")
+    print("-" * 60)
+
+    per_label = defaultdict(lambda: [0, 0])
+    for label, predicted, _, _ in predictions:
+        per_label[label][1] += 1
+        per_label[label][0] += int(label == predicted)
+    for label, (hit, count) in per_label.items():
+        print(f"{label:20s} 准确率: {hit / count:.4f} ({hit}/{count})")
+
+    print("-" * 60)
+    print("阈值   覆盖率(不回退LLM)   覆盖部分准确率")
+    for threshold in THRESHOLDS:
+        covered = [(label, predicted) for label, predicted, confidence, _ in predictions if confidence >= threshold]
+        coverage = len(covered) / total
+        accuracy = sum(1 for label, predicted in covered if label == predicted) / len(covered) if covered else 0.0
+        marker = " <- INTENT_CONFIDENCE_THRESHOLD" if threshold == settings.INTENT_CONFIDENCE_THRESHOLD else ""
+        print(f"{threshold:.2f}   {coverage:.4f}              {accuracy:.4f}{marker}")
+
+    print("-" * 60)
+    accepted = [(label, predicted) for label, predicted, confidence, margin in predictions
+                if IntentClassifier.accepts(confidence, margin)]
+    accuracy = sum(1 for label, predicted in accepted if label == predicted) / len(accepted) if accepted else 0.0
+    misrouted = sum(1 for label, predicted in accepted if predicted == NO_RETRIEVAL_INTENT and label != NO_RETRIEVAL_INTENT)
+    print(f"当前配置(阈值{settings.INTENT_CONFIDENCE_THRESHOLD}，差距{settings.INTENT_MIN_MARGIN}): "
+          f"覆盖率 {len(accepted) / total:.4f}，准确率 {accuracy:.4f}，误判为{NO_RETRIEVAL_INTENT}(跳过检索) {misrouted} 条")
+    print("=" * 60)
+
+
+def measure_latency(classifier: IntentClassifier, examples: dict, repeat: int = 20):
+    """测量单条输入的分类耗时（向量化 + 中心向量比较）"""
+    texts = [text for texts in examples.values() for text in texts][:repeat]
+    start_time = time.time()
+    for text in texts:
+        classifier.predict(text)
+    elapsed = (time.time() - start_time) / len(texts)
+    print(f"单条分类平均耗时: {elapsed * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="意图分类器训练与评估")
+    parser.add_argument("--data", default=None, help="标注文件(jsonl)，默认使用intent_examples中的样例")
+    parser.add_argument("--folds", type=int, default=4, help="交叉验证折数")
+    parser.add_argument("--output", default=os.path.join("../backend", settings.INTENT_CENTROIDS_PATH), help="中心向量保存路径")
+    parser.add_argument("--eval-only", action="store_true", help="只评估，不保存中心向量")
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    logger.info(f"加载样例: { {label: len(texts) for label, texts in examples.items()} }")
+
+    classifier = IntentClassifier(embedding_model=BGEEmbedding(), centroids_path=args.output)
+    report(cross_validate(classifier, examples, args.folds))
+    report(cross_validate(classifier, examples, args.folds, CONTEXT_FREE_INTENTS), title="无上下文(新问题/闲聊)")
+
+    classifier.fit(examples)
+    measure_latency(classifier, examples)
+    if not args.eval_only:
+        classifier.save(args.output)
+
+
+if __name__ == "__main__":
+    main()
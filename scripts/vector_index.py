@@ -17,9 +17,12 @@ from tqdm import tqdm
 # 添加项目路径
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
 
-from backend.app.db.milvus import VectorStore
+from backend.app.db.milvus import VectorStore, embedding_field, BINARY_INDEX_TYPES, RESCORE_INDEX_TYPES
+from backend.app.db.embedding_store import EmbeddingStore, binarize_embeddings
+from backend.app.models.Embeddings.dim_reduction import EmbeddingProjector, projection_path
 from backend.app.models.Embeddings.bge_embedding import BGEEmbedding
 from backend.app.core.config import Settings
+from backend.app.rag.article_index import ArticleIndex
 from pymilvus import FieldSchema, DataType
 
 # 配置日志
@@ -36,6 +39,15 @@ class VectorIndexer:
         self.vector_store = VectorStore()
         self.collection_name = "finetune_data"
         self.data_dir = Path("../backend/data/chunks/related_laws")
+        # 法条顺序索引，路径相对于backend目录，与服务端读取的位置一致
+        self.article_index_path = Path("../backend") / settings.ARTICLE_INDEX_PATH
+        # 向量索引类型，有损索引同时保存浮点向量用于检索后重排
+        self.index_type = settings.MILVUS_INDEX_TYPE
+        self.embedding_store_path = Path("../backend") / settings.EMBEDDING_STORE_DIR / self.collection_name
+        # 降维配置，启用时Milvus中存储降维后的向量，全维向量保存在浮点向量存储中用于重排
+        self.reduced_dim = settings.EMBEDDING_REDUCED_DIM
+        self.vector_dim = self.reduced_dim or settings.EMBEDDING_DIMENSION
+        self.projection_path = projection_path(str(Path("../backend") / settings.EMBEDDING_PROJECTION_DIR), self.collection_name)
 
         
         # 确保embedding模型初始化成功
@@ -60,7 +72,7 @@ class VectorIndexer:
         fields = [
             FieldSchema(name="uuid", dtype=DataType.VARCHAR, max_length=36, is_primary=True, auto_id=False),
             FieldSchema(name="content", dtype=DataType.VARCHAR, max_length=65535),
-            FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=settings.EMBEDDING_DIMENSION),
+            embedding_field(self.index_type, self.vector_dim),
             FieldSchema(name="document_name", dtype=DataType.VARCHAR, max_length=256),
             FieldSchema(name="chapter", dtype=DataType.VARCHAR, max_length=256),
             FieldSchema(name="section", dtype=DataType.VARCHAR, max_length=256),
@@ -140,32 +152,15 @@ class VectorIndexer:
         contents = [chunk['content'] for chunk in chunks]
         uuids = [chunk['uuid'] for chunk in chunks]
         
-        # 分批向量化，带进度条
-        batch_size = 32
-        total_batches = (len(contents) + batch_size - 1) // batch_size
-        embedding_list = []
-        
-        logger.info(f"对 {len(contents)} 个文本进行批量向量化，分 {total_batches} 批处理...")
-        
-        for i in tqdm(range(0, len(contents), batch_size), desc="向量化进度", unit="batch"):
-            # 获取当前批次的内容
-            batch_contents = contents[i:i + batch_size]
-            
-            # 对当前批次进行向量化
-            batch_embeddings = self.embedding_model.encode(batch_contents, batch_size=len(batch_contents), normalize=True)
-            
-            # 处理embedding格式
-            # 如果是单个向量(一维数组)，reshape为二维
-            if batch_embeddings.ndim == 1:
-                batch_embeddings = batch_embeddings.reshape(1, -1)
-            
-            # 转换当前批次的向量为列表格式
-            for j in range(batch_embeddings.shape[0]):
-                vector = batch_embeddings[j]
-                if isinstance(vector, np.ndarray):
-                    embedding_list.append(vector.astype(np.float32).tolist())
-                else:
-                    embedding_list.append(vector)
+        # 按token长度排序、按token预算分批向量化，减少padding浪费；返回顺序与contents一致
+        logger.info(f"对 {len(contents)} 个文本进行批量向量化(按长度分桶，token预算 {settings.EMBEDDING_TOKEN_BUDGET})...")
+        embeddings = self.embedding_model.encode(
+            contents,
+            normalize=True,
+            sort_by_length=True,
+            show_progress=True
+        )
+        embedding_list = embeddings.astype(np.float32).tolist()
         
         
         # 保存到缓存文件
@@ -336,8 +331,32 @@ class VectorIndexer:
             entities[7].append(metadata.get('is_effective', True))
         
         logger.info(f"准备了 {len(entities[0])} 条实体数据")
+        return self.transform_vectors(entities)
+
+    def transform_vectors(self, entities: List[List[Any]]) -> List[List[Any]]:
+        """
+        按降维配置和索引类型处理实体中的向量列
+        启用降维或使用有损索引时，先把全维浮点向量写入浮点向量存储供检索后重排；
+        启用降维时在语料上拟合投影并保存，向量列替换为降维后的向量；二值索引再把向量列二值化
+        """
+        embeddings = np.asarray(entities[2], dtype=np.float32)
+        if self.reduced_dim or self.index_type in RESCORE_INDEX_TYPES:
+            EmbeddingStore.write(str(self.embedding_store_path), entities[0], embeddings)
+        if self.reduced_dim:
+            projector = EmbeddingProjector.fit(embeddings, self.reduced_dim, settings.EMBEDDING_REDUCTION_METHOD,
+                                               self.embedding_model.model_path)
+            projector.save(self.projection_path)
+            embeddings = projector.transform(embeddings)
+            entities[2] = embeddings.tolist()
+        if self.index_type in BINARY_INDEX_TYPES:
+            entities[2] = binarize_embeddings(embeddings)
+            logger.info(f"向量已二值化，每条 {self.vector_dim // 8} 字节")
         return entities
 
+    def build_article_index(self, chunks: List[Dict[str, Any]]):
+        """按文档记录法条顺序（含条号）并保存，服务端检索后据此在内存中补充相邻法条"""
+        ArticleIndex.build(chunks).save(str(self.article_index_path))
+    
     def create_and_populate_collection(self, chunks: List[Dict[str, Any]]):
         """创建集合并填充数据"""
         # 检查集合是否已存在
@@ -359,7 +378,8 @@ class VectorIndexer:
         collection = self.vector_store.create_collection(
             fields=fields,
             collection_name=self.collection_name,
-            description=description
+            description=description,
+            index_type=self.index_type
         )
         
         if not collection:
@@ -394,6 +414,9 @@ class VectorIndexer:
         # 获取集合统计信息
         stats = self.vector_store.get_collection_stats(self.collection_name)
         logger.info(f"集合统计信息: {stats}")
+        
+        # 构建法条顺序索引，供检索后扩展相邻法条；与集合数据一同生成，任何入口都不会遗漏
+        self.build_article_index(chunks)
     
     def run(self):
         """运行重新索引流程"""
@@ -407,7 +430,7 @@ class VectorIndexer:
                 logger.error("没有找到任何数据")
                 return
             
-            # 创建集合并填充数据
+            # 创建集合、填充数据并构建法条顺序索引
             self.create_and_populate_collection(chunks)
             
             logger.info("重新索引完成！")